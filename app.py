@@ -1,98 +1,304 @@
 import json
 import os
+import shutil
+from functools import wraps
 
-from flask import Flask, request, render_template, jsonify
-from flask_socketio import SocketIO
+from decouple import config
+from flask import Blueprint, Flask, Response, current_app, g, request, render_template, jsonify
+from flask_socketio import SocketIO, join_room
+from werkzeug.local import LocalProxy
 
+# 以下工具模块导入时不加载音频库和云端 SDK，这些依赖在各阶段首次使用时才导入
 from utils.audio_utils import preprocess_audio, split_audio_by_sentences, merge_cloned_audio
-from utils.oss_utils import upload_to_oss
-from utils.transcription import recognize_audio
+from utils.ingest import DuplicateFileFieldError, UploadTooLargeError, discard_uploads, ingest_multipart
+from utils.merge_utils import patch_merged_clips
+from utils.oss_utils import upload_to_oss, upload_patched_to_oss
+from utils.transcription import recognize_audio, get_cached_transcription
+from utils.long_audio import is_long_audio, recognize_long_audio
 from utils.voice_util import process_sentences_with_voice_cloning, regenerate_sentence_audio
 from utils.subtitle_utils import generate_srt
-
-# 初始化 Flask 应用
-app = Flask(__name__)
-socketio = SocketIO(app, cors_allowed_origins="*")
+from utils.job_store import JobStore
+from utils.metrics import registry, stage_scope
+from utils.task_runner import TaskRunner
+from utils.pipeline import run_pipeline
+from utils.warmup import warm_up, warm_up_in_background
 
 BASE_URL = 'D:\Adochew Project/pythonProject/Voice'
 
-app.config['UPLOAD_FOLDER'] = BASE_URL + '/uploads'
-app.config['REFERENCE_FOLDER'] = BASE_URL + '/reference'
-app.config['PROCESSED_FOLDER'] = BASE_URL + '/static/processed'
-app.config['JSON_FOLDER'] = BASE_URL + '/static/json'
-app.config['SPLIT_FOLDER'] = BASE_URL + '/static/split'
-app.config['MERGE_FOLDER'] = BASE_URL + '/static/merge'
-app.config['SUBTITLE_FOLDER'] = BASE_URL + '/static/subtitle'
+# 路由注册在蓝图上，由 create_app 挂载到应用
+bp = Blueprint('voice', __name__)
+socketio = SocketIO()
+
+# 当前应用的任务存储与后台任务执行器，由 create_app 创建
+job_store = LocalProxy(lambda: current_app.extensions['job_store'])
+task_runner = LocalProxy(lambda: current_app.extensions['task_runner'])
+
+# 后台执行的阶段，进度事件推送到以 job_id 命名的 Socket.IO 房间
+BACKGROUND_STAGES = ("recognize", "split_audio", "generate_cloned_audio", "pipeline")
+
+
+def emit_job_event(event, payload):
+    socketio.emit(event, payload, to=payload["job_id"])
+
+
+def create_app(test_config=None):
+    """
+    创建并配置 Flask 应用。启动时不加载音频库和云端 SDK，也不读取云端凭据；
+    WARM_UP 配置为 background 或 blocking 时在启动阶段提前加载。
+    :param test_config: 覆盖默认配置的字典
+    :return: Flask 应用
+    """
+    app = Flask(__name__)
+
+    app.config['UPLOAD_FOLDER'] = BASE_URL + '/uploads'
+    app.config['REFERENCE_FOLDER'] = BASE_URL + '/reference'
+    app.config['PROCESSED_FOLDER'] = BASE_URL + '/static/processed'
+    app.config['JSON_FOLDER'] = BASE_URL + '/static/json'
+    app.config['SPLIT_FOLDER'] = BASE_URL + '/static/split'
+    app.config['MERGE_FOLDER'] = BASE_URL + '/static/merge'
+    app.config['SUBTITLE_FOLDER'] = BASE_URL + '/static/subtitle'
+
+    # 预处理模式：full（整段加载）、stream（逐块处理，适合长音频）或 parallel（多进程分段处理）
+    app.config['PREPROCESS_MODE'] = 'full'
+
+    # parallel 预处理模式的进程数，None 表示使用全部 CPU 核心
+    app.config['PREPROCESS_WORKERS'] = None
+
+    # 变声合成的并发线程数；实际并发由 DashScope 调度器按配额自适应限制，线程数只是上限
+    app.config['CLONE_MAX_WORKERS'] = 16
+
+    # 切割音频时并发写盘和上传的线程数
+    app.config['SPLIT_MAX_WORKERS'] = 8
+
+    # 合并模式：incremental（只重写变化的句子，无可用索引时按 MERGE_FULL_MODE 完整合并）、
+    # buffer（内存中合并）或 stream（流式写入，适合长音频）
+    app.config['MERGE_MODE'] = 'incremental'
+    app.config['MERGE_FULL_MODE'] = 'buffer'
+
+    # 片段长于时间槽时的时间伸缩方式（wsola / speedup）、最大压缩倍率和超长处理方式（gap / trim）
+    app.config['MERGE_STRETCHER'] = 'wsola'
+    app.config['MERGE_MAX_STRETCH_RATIO'] = 2.0
+    app.config['MERGE_OVERFLOW'] = 'gap'
 
-# 全局数据存储
-file_info = {}
+    # 识别模式：single（整段提交）、long（静音处切分后并行识别）或 auto（时长超过阈值时使用 long）
+    app.config['RECOGNIZE_MODE'] = 'auto'
+    app.config['LONG_AUDIO_MIN_SECONDS'] = 900
+    app.config['LONG_AUDIO_CHUNK_SECONDS'] = 300
 
-# 确保目录存在
-os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
-os.makedirs(app.config['REFERENCE_FOLDER'], exist_ok=True)
-os.makedirs(app.config['PROCESSED_FOLDER'], exist_ok=True)
-os.makedirs(app.config['JSON_FOLDER'], exist_ok=True)
-os.makedirs(app.config['SPLIT_FOLDER'], exist_ok=True)
-os.makedirs(app.config['MERGE_FOLDER'], exist_ok=True)
-os.makedirs(app.config['SUBTITLE_FOLDER'], exist_ok=True)
+    # 任务状态数据库
+    app.config['JOB_DB_PATH'] = BASE_URL + '/jobs.sqlite3'
+
+    # 后台阶段任务的最大并发数
+    app.config['BACKGROUND_MAX_WORKERS'] = 4
+
+    # 上传请求体的最大字节数，None 表示不限制
+    app.config['UPLOAD_MAX_BYTES'] = 2 * 1024 * 1024 * 1024
+
+    # 是否把原始上传音频也上传到 OSS（识别只需要预处理后的音频）
+    app.config['UPLOAD_ORIGINAL_TO_OSS'] = config('UPLOAD_ORIGINAL_TO_OSS', default=True, cast=bool)
+
+    # 启动预热：off（各阶段首次使用时加载依赖）、background（后台线程预热，不阻塞启动）或 blocking（预热完成后再启动）
+    app.config['WARM_UP'] = config('WARM_UP', default='off')
+
+    if test_config:
+        app.config.update(test_config)
+
+    # 确保目录存在
+    for folder_key in ('UPLOAD_FOLDER', 'REFERENCE_FOLDER', 'PROCESSED_FOLDER', 'JSON_FOLDER', 'SPLIT_FOLDER',
+                       'MERGE_FOLDER', 'SUBTITLE_FOLDER'):
+        os.makedirs(app.config[folder_key], exist_ok=True)
+
+    # 按任务隔离的状态存储，取代全局 file_info
+    store = JobStore(app.config['JOB_DB_PATH'])
+    app.extensions['job_store'] = store
+    app.extensions['task_runner'] = TaskRunner(store, max_workers=app.config['BACKGROUND_MAX_WORKERS'],
+                                               emit=emit_job_event)
+
+    app.register_blueprint(bp)
+    socketio.init_app(app, cors_allowed_origins="*")
+
+    if app.config['WARM_UP'] == 'background':
+        warm_up_in_background()
+    elif app.config['WARM_UP'] == 'blocking':
+        warm_up()
+    elif app.config['WARM_UP'] != 'off':
+        raise ValueError(f"Unsupported warm-up mode: {app.config['WARM_UP']}")
+    return app
+
+
+def get_job_id():
+    """
+    从 JSON 请求体、表单或查询参数中读取 job_id。
+    """
+    data = request.get_json(silent=True) or {}
+    return data.get("job_id") or request.form.get("job_id") or request.args.get("job_id")
+
+
+def require_job(view):
+    """
+    路由装饰器：校验请求中的 job_id 并作为第一个参数传给视图函数。
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        job_id = get_job_id()
+        if not job_id:
+            return jsonify({"error": "Missing job_id"}), 400
+        if not job_store.job_exists(job_id):
+            return jsonify({"error": f"Job {job_id} not found"}), 404
+        g.job_id = job_id
+        return view(job_id, *args, **kwargs)
+    return wrapper
+
+
+def record_timings(stage):
+    """
+    路由装饰器：记录同步阶段的耗时和阶段内各操作的耗时汇总，保存到请求所属的任务（g.job_id）。
+    后台阶段由 TaskRunner 记录。
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            timings = None
+            try:
+                with stage_scope(stage) as timings:
+                    return view(*args, **kwargs)
+            finally:
+                job_id = g.get("job_id")
+                if timings is not None and job_id:
+                    job_store.set_timings(job_id, stage, timings.summary())
+        return wrapper
+    return decorator
+
+
+def job_folder(folder_key, job_id, *parts):
+    """
+    返回任务专属的输出目录（<配置目录>/<job_id>/...），不同任务的文件互不覆盖。
+    """
+    folder = os.path.join(current_app.config[folder_key], job_id, *parts)
+    os.makedirs(folder, exist_ok=True)
+    return folder
+
+
+def receive_upload(folder_key, oss_fields=()):
+    """
+    流式接收 multipart 上传：文件边接收边写入 <配置目录>/.incoming 并计算内容摘要，
+    oss_fields 中的文件字段同时分片上传到 OSS。请求体超过 UPLOAD_MAX_BYTES 时抛出 UploadTooLargeError。
+    :return: (fields, files)，见 ingest_multipart；请求不是 multipart 时为 ({}, {})
+    """
+    boundary = request.mimetype_params.get("boundary")
+    if request.mimetype != "multipart/form-data" or not boundary:
+        return {}, {}
+
+    max_bytes = current_app.config['UPLOAD_MAX_BYTES']
+    if max_bytes and request.content_length and request.content_length > max_bytes:
+        raise UploadTooLargeError(max_bytes)
+
+    staging_folder = os.path.join(current_app.config[folder_key], '.incoming')
+    os.makedirs(staging_folder, exist_ok=True)
+    return ingest_multipart(request.stream, boundary, staging_folder, max_bytes=max_bytes, oss_fields=oss_fields)
+
+
+def place_upload(uploaded, folder):
+    """
+    把暂存的上传文件移动到任务目录，返回本地路径。
+    """
+    path = os.path.join(folder, uploaded["filename"])
+    shutil.move(uploaded["local_url"], path)
+    return path
+
+
+@bp.errorhandler(UploadTooLargeError)
+def upload_too_large(e):
+    return jsonify({"error": str(e), "max_bytes": e.max_bytes}), 413
+
+
+@bp.errorhandler(DuplicateFileFieldError)
+def duplicate_file_field(e):
+    return jsonify({"error": str(e), "field": e.field}), 400
 
 
 # 路由：主页（文件上传）
-@app.route('/')
+@bp.route('/')
 def index():
     return render_template('index.html')
 
 
 # 路由：处理上传文件
-@app.route('/upload', methods=['POST'])
+@bp.route('/upload', methods=['POST'])
+@record_timings("upload")
 def upload_file():
-    if 'file' not in request.files:
+    # 一次读取请求体：同时写入本地、计算摘要，按配置同时上传原始音频到 OSS
+    upload_original = current_app.config['UPLOAD_ORIGINAL_TO_OSS']
+    fields, files = receive_upload('UPLOAD_FOLDER', oss_fields=("file",) if upload_original else ())
+    if 'file' not in files:
+        discard_uploads(files)
         return "No file uploaded", 400
-    file = request.files['file']
 
-    # 保存上传文件到本地
-    input_filepath = os.path.join(app.config['UPLOAD_FOLDER'], file.filename)
-    file.save(input_filepath)
+    # 每次上传创建新任务，各任务的文件和状态互相隔离
+    job_id = job_store.create_job()
+    g.job_id = job_id
 
-    # 上传原始音频到 OSS
-    original_oss_url = upload_to_oss(input_filepath)
+    input_filepath = place_upload(files['file'], job_folder('UPLOAD_FOLDER', job_id))
+    original_oss_url = files['file']["oss_url"]
 
     # 音频预处理（统一为 WAV 格式，16kHz 单声道）
-    preprocessed_filepath = preprocess_audio(input_filepath, app.config['PROCESSED_FOLDER'])
+    preprocess_mode = fields.get("preprocess_mode", current_app.config['PREPROCESS_MODE'])
+    preprocessed_filepath = preprocess_audio(input_filepath, job_folder('PROCESSED_FOLDER', job_id),
+                                             mode=preprocess_mode, workers=current_app.config['PREPROCESS_WORKERS'])
 
     # 上传预处理后的音频到 OSS
     preprocessed_oss_url = upload_to_oss(preprocessed_filepath)
 
     # 保存文件信息
-    file_info["original_audio"] = {
+    original_audio = {
         "local_url": input_filepath,
         "oss_url": original_oss_url
     }
-    file_info["preprocessed_audio"] = {
+    preprocessed_audio = {
         "local_url": preprocessed_filepath,
         "oss_url": preprocessed_oss_url
     }
+    job_store.set(job_id, "original_audio", original_audio)
+    job_store.set(job_id, "preprocessed_audio", preprocessed_audio)
 
     return jsonify({
         "message": "Upload successful and audio preprocessed!",
-        "original_audio": file_info["original_audio"],
-        "preprocessed_audio": file_info["preprocessed_audio"]
+        "job_id": job_id,
+        "original_audio": original_audio,
+        "preprocessed_audio": preprocessed_audio
     })
 
 
-# 路由：识别音频
-@app.route('/recognize', methods=['POST'])
-def recognize():
-    audio_url = file_info.get("preprocessed_audio", {}).get("oss_url")
-    if not audio_url:
-        return jsonify({"error": "No preprocessed audio URL available"}), 400
+def submit_task(job_id, stage, func):
+    """
+    将耗时阶段提交到后台线程池，立即返回 202 和可轮询的状态地址。
+    """
+    app = current_app._get_current_object()
+
+    def run_in_app_context(task_job_id, tracker):
+        # 后台线程没有请求上下文，推入应用上下文以读取配置和任务存储
+        with app.app_context():
+            return func(task_job_id, tracker)
+
+    state = task_runner.submit(job_id, stage, run_in_app_context)
+    if state is None:
+        return jsonify({"error": f"Stage {stage} is already running for job {job_id}"}), 409
+    return jsonify({
+        "message": f"Stage {stage} queued.",
+        "job_id": job_id,
+        "stage": stage,
+        "status": state["status"],
+        "status_url": f"/jobs/{job_id}/status"
+    }), 202
 
-    # 语音识别
-    transcription_result = recognize_audio(audio_url)
 
+def save_transcription(job_id, audio_url, transcription_result):
+    """
+    保存识别结果 JSON 到本地和 OSS，并记录到任务状态。
+    """
     # 保存识别结果到本地
     json_filename = f"{os.path.basename(audio_url).split('.')[0]}_transcription.json"
-    json_filepath = os.path.join(app.config['JSON_FOLDER'], json_filename)
+    json_filepath = os.path.join(job_folder('JSON_FOLDER', job_id), json_filename)
     with open(json_filepath, 'w', encoding='utf-8') as f:
         json.dump(transcription_result, f, ensure_ascii=False, indent=4)
 
@@ -100,50 +306,125 @@ def recognize():
     json_oss_url = upload_to_oss(json_filepath)
 
     # 保存文件信息
-    file_info["transcription"] = {
+    transcription = {
         "local_url": json_filepath,
         "oss_url": json_oss_url
     }
+    job_store.set(job_id, "transcription", transcription)
+    return transcription
 
-    return jsonify({
-        "transcription": file_info["transcription"],
+
+def run_recognize(job_id, tracker, mode="single"):
+    """
+    后台任务：语音识别并保存识别结果。
+    """
+    preprocessed_audio = job_store.get(job_id, "preprocessed_audio", {})
+    audio_url = preprocessed_audio.get("oss_url")
+    audio_path = preprocessed_audio.get("local_url")
+    tracker.start(1)
+
+    if mode == "long" or (mode == "auto" and is_long_audio(audio_path, current_app.config['LONG_AUDIO_MIN_SECONDS'])):
+        # 长音频：静音处切分，各段并行识别后拼接时间戳
+        transcription_result = recognize_long_audio(audio_path, job_folder('PROCESSED_FOLDER', job_id, 'chunks'),
+                                                    audio_url=audio_url,
+                                                    chunk_seconds=current_app.config['LONG_AUDIO_CHUNK_SECONDS'])
+    else:
+        # 语音识别（按预处理音频内容缓存结果）
+        transcription_result = recognize_audio(audio_url, audio_path=audio_path)
+    if "error" in transcription_result:
+        raise RuntimeError(transcription_result["error"])
+
+    transcription = save_transcription(job_id, audio_url, transcription_result)
+    tracker()
+
+    return {
+        "job_id": job_id,
+        "transcription": transcription,
         "message": "Recognition completed and transcription saved!"
-    })
+    }
 
 
-# 路由：切割音频
-@app.route('/split_audio', methods=['POST'])
-def split_audio():
-    # 从全局变量中获取音频和 JSON 文件路径
-    preprocessed_audio = file_info.get("preprocessed_audio", {}).get("local_url")
-    transcription_json_path = file_info.get("transcription", {}).get("local_url")
+# 路由：识别音频（后台执行）
+@bp.route('/recognize', methods=['POST'])
+@require_job
+def recognize(job_id):
+    preprocessed_audio = job_store.get(job_id, "preprocessed_audio", {})
+    if not preprocessed_audio.get("oss_url"):
+        return jsonify({"error": "No preprocessed audio URL available"}), 400
 
-    if not preprocessed_audio or not transcription_json_path:
-        return jsonify({"error": "Required audio or JSON file is missing"}), 400
+    # 相同音频已识别过时直接返回缓存结果，不再提交后台任务
+    cached_result = get_cached_transcription(preprocessed_audio.get("local_url"))
+    if cached_result is not None:
+        transcription = save_transcription(job_id, preprocessed_audio["oss_url"], cached_result)
+        return jsonify({
+            "job_id": job_id,
+            "transcription": transcription,
+            "cache_hit": True,
+            "message": "Recognition completed and transcription saved!"
+        }), 200
+
+    data = request.get_json(silent=True) or {}
+    mode = data.get("mode", current_app.config['RECOGNIZE_MODE'])
+    if mode not in ("single", "long", "auto"):
+        return jsonify({"error": f"Unknown recognize mode: {mode}"}), 400
+    return submit_task(job_id, "recognize", lambda task_job_id, tracker: run_recognize(task_job_id, tracker, mode))
+
+
+def run_split_audio(job_id, tracker):
+    """
+    后台任务：按句子切割音频并上传。
+    """
+    preprocessed_audio = job_store.get(job_id, "preprocessed_audio", {}).get("local_url")
+    transcription_json_path = job_store.get(job_id, "transcription", {}).get("local_url")
 
     # 加载 JSON 数据
     with open(transcription_json_path, 'r', encoding='utf-8') as f:
         transcription_json = json.load(f)
+    tracker.start(len(transcription_json.get("transcripts", [])[0].get("sentences", [])))
 
     # 输出目录
-    output_folder = os.path.join(app.config['SPLIT_FOLDER'], 'sentences')
-    os.makedirs(output_folder, exist_ok=True)
+    output_folder = job_folder('SPLIT_FOLDER', job_id, 'sentences')
 
     # 调用切割函数
-    sentence_audio_info = split_audio_by_sentences(preprocessed_audio, transcription_json, output_folder)
+    sentence_audio_info = split_audio_by_sentences(preprocessed_audio, transcription_json, output_folder,
+                                                   max_workers=current_app.config['SPLIT_MAX_WORKERS'],
+                                                   progress_callback=tracker)
+
+    # 保存结果到任务状态
+    job_store.set_sentences(job_id, "sentence_audio", sentence_audio_info)
+
+    failed_sentences = [
+        {"sentence_id": info["sentence_id"], "error": info["error"]}
+        for info in sentence_audio_info if "error" in info
+    ]
+
+    return {
+        "message": "Audio split by sentences successfully!" if not failed_sentences
+        else f"Audio split with {len(failed_sentences)} failed sentence(s).",
+        "job_id": job_id,
+        "sentence_audio_info": sentence_audio_info,
+        "failed_sentences": failed_sentences
+    }
 
-    # 保存结果到全局变量
-    file_info["sentence_audio"] = sentence_audio_info
 
-    return jsonify({
-        "message": "Audio split by sentences successfully!",
-        "sentence_audio_info": sentence_audio_info
-    })
+# 路由：切割音频（后台执行）
+@bp.route('/split_audio', methods=['POST'])
+@require_job
+def split_audio(job_id):
+    # 从任务状态中获取音频和 JSON 文件路径
+    preprocessed_audio = job_store.get(job_id, "preprocessed_audio", {}).get("local_url")
+    transcription_json_path = job_store.get(job_id, "transcription", {}).get("local_url")
+
+    if not preprocessed_audio or not transcription_json_path:
+        return jsonify({"error": "Required audio or JSON file is missing"}), 400
+
+    return submit_task(job_id, "split_audio", run_split_audio)
 
 
 # 路由：更新句子编辑结果
-@app.route('/update_transcription', methods=['POST'])
-def update_transcription():
+@bp.route('/update_transcription', methods=['POST'])
+@require_job
+def update_transcription(job_id):
     try:
         # 获取前端传递的数据
         data = request.json
@@ -152,30 +433,26 @@ def update_transcription():
 
         updated_sentences = data["updated_sentences"]
 
-        # 检查全局变量是否包含 sentence_audio 信息
-        if "sentence_audio" not in file_info:
-            return jsonify({"error": "Sentence audio data not found in file_info"}), 400
+        # 检查任务是否包含 sentence_audio 信息
+        if not job_store.get_sentences(job_id, "sentence_audio"):
+            return jsonify({"error": "Sentence audio data not found for this job"}), 400
 
-        # 遍历更新的句子，匹配并更新全局变量中的对应内容
+        # 按 sentence_id 索引直接更新对应句子的文本
+        missing_ids = []
         for updated_sentence in updated_sentences:
             sentence_id = int(updated_sentence.get("sentence_id"))
             new_text = updated_sentence.get("text")
+            if job_store.update_sentence(job_id, "sentence_audio", sentence_id, {"text": new_text}) is None:
+                missing_ids.append(sentence_id)
 
-            # 查找匹配的 sentence_id 并更新 text
-            for sentence in file_info["sentence_audio"]:
-                if sentence["sentence_id"] == sentence_id:
-                    sentence["text"] = new_text  # 更新句子文本
-                    break
-
-        print(jsonify({
-            "message": "Sentence audio information updated successfully!",
-            "updated_sentence_audio": file_info["sentence_audio"]
-        }))
+        sentence_audio = job_store.get_sentences(job_id, "sentence_audio")
 
         # 返回成功信息
         return jsonify({
             "message": "Sentence audio information updated successfully!",
-            "updated_sentence_audio": file_info["sentence_audio"]
+            "job_id": job_id,
+            "updated_sentence_audio": sentence_audio,
+            "missing_sentence_ids": missing_ids
         })
 
     except Exception as e:
@@ -183,68 +460,114 @@ def update_transcription():
         return jsonify({"error": "An error occurred while updating the sentence audio.", "details": str(e)}), 500
 
 
-@app.route('/upload_reference', methods=['POST'])
+@bp.route('/upload_reference', methods=['POST'])
+@record_timings("upload_reference")
 def upload_reference():
+    # 查询参数中带 job_id 时先校验任务，再接收请求体
+    job_id = request.args.get("job_id")
+    if job_id and not job_store.job_exists(job_id):
+        return jsonify({"error": f"Job {job_id} not found"}), 404
+
     try:
-        if 'file' not in request.files or 'text' not in request.form:
+        # 一次读取请求体：参考音频同时写入本地、计算摘要并上传到 OSS
+        fields, files = receive_upload('REFERENCE_FOLDER', oss_fields=("file",))
+
+        # job_id 也可以作为表单字段提交（位于文件之后时，文件已接收完才能校验）
+        job_id = job_id or fields.get("job_id")
+        if not job_id:
+            discard_uploads(files)
+            return jsonify({"error": "Missing job_id"}), 400
+        if not job_store.job_exists(job_id):
+            discard_uploads(files)
+            return jsonify({"error": f"Job {job_id} not found"}), 404
+        g.job_id = job_id
+
+        if 'file' not in files or 'text' not in fields:
+            discard_uploads(files)
             return jsonify({"error": "Audio file and text are required"}), 400
 
-        # 获取音频文件和文本信息
-        file = request.files['file']
-        reference_text = request.form['text']
-
-        # 保存音频文件到本地 reference 文件夹
-        reference_audio_path = os.path.join(app.config['REFERENCE_FOLDER'], file.filename)
-        file.save(reference_audio_path)
-
-        # 上传音频文件到 OSS
-        reference_audio_oss_url = upload_to_oss(reference_audio_path)
+        # 获取文本信息，音频文件移动到本地 reference 文件夹
+        reference_text = fields['text']
+        reference_audio_path = place_upload(files['file'], job_folder('REFERENCE_FOLDER', job_id))
+        reference_audio_oss_url = files['file']["oss_url"]
 
-        # 保存信息到全局变量
-        file_info["reference_audio"] = {
+        # 保存信息到任务状态
+        reference_audio = {
             "local_url": reference_audio_path,
             "oss_url": reference_audio_oss_url,
             "text": reference_text
         }
+        job_store.set(job_id, "reference_audio", reference_audio)
 
         # 返回成功信息
         return jsonify({
             "message": "Reference audio and text uploaded successfully!",
-            "reference_audio": file_info["reference_audio"]
+            "job_id": job_id,
+            "reference_audio": reference_audio
         })
 
+    except (UploadTooLargeError, DuplicateFileFieldError):
+        raise
     except Exception as e:
         return jsonify({"error": "An error occurred while uploading reference audio.", "details": str(e)}), 500
 
 
-@app.route('/generate_cloned_audio', methods=['POST'])
-def generate_cloned_audio():
-    # 检查必要的文件信息是否存在
-    sentences = file_info.get("sentence_audio")
-    reference_audio = file_info.get("reference_audio", {}).get("oss_url")
-
-    if not sentences or not reference_audio:
-        return jsonify({"error": "Missing required data (sentences or reference audio)"}), 400
+def run_generate_cloned_audio(job_id, tracker, max_workers, resume=True):
+    """
+    后台任务：批量生成变声音频。
+    """
+    sentences = job_store.get_sentences(job_id, "sentence_audio")
+    reference_audio = job_store.get(job_id, "reference_audio", {})
+    tracker.start(len(sentences))
+
+    # 调用变声处理函数
+    output_folder = job_folder('SPLIT_FOLDER', job_id, 'cloned_audio')
+    cloned_audio_info, stats = process_sentences_with_voice_cloning(
+        sentences, reference_audio["oss_url"], output_folder, max_workers=max_workers,
+        reference_audio_path=reference_audio.get("local_url"), progress_callback=tracker, resume=resume
+    )
+
+    # 保存变声音频信息到任务状态
+    job_store.set_sentences(job_id, "cloned_audio", cloned_audio_info)
+
+    failed_sentences = [
+        {"sentence_id": info["sentence_id"], "error": info["error"]}
+        for info in cloned_audio_info if "error" in info
+    ]
+
+    return {
+        "message": "Voice cloning completed successfully!" if not failed_sentences
+        else f"Voice cloning completed with {len(failed_sentences)} failed sentence(s).",
+        "job_id": job_id,
+        "cloned_audio_info": cloned_audio_info,
+        "failed_sentences": failed_sentences,
+        "stats": stats
+    }
 
-    try:
-        # 调用变声处理函数
-        output_folder = os.path.join(app.config['SPLIT_FOLDER'], 'cloned_audio')
-        cloned_audio_info = process_sentences_with_voice_cloning(sentences, reference_audio, output_folder)
 
-        # 保存变声音频信息到全局变量
-        file_info["cloned_audio"] = cloned_audio_info
+@bp.route('/generate_cloned_audio', methods=['POST'])
+@require_job
+def generate_cloned_audio(job_id):
+    # 检查必要的文件信息是否存在
+    sentences = job_store.get_sentences(job_id, "sentence_audio")
+    reference_audio = job_store.get(job_id, "reference_audio", {})
 
-        return jsonify({
-            "message": "Voice cloning completed successfully!",
-            "cloned_audio_info": cloned_audio_info
-        })
+    if not sentences or not reference_audio.get("oss_url"):
+        return jsonify({"error": "Missing required data (sentences or reference audio)"}), 400
 
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
+    data = request.get_json(silent=True) or {}
+    max_workers = int(data.get("max_workers", current_app.config['CLONE_MAX_WORKERS']))
+    # 默认从检查点续跑，resume=false 时全部重新合成
+    resume = bool(data.get("resume", True))
+    return submit_task(job_id, "generate_cloned_audio",
+                       lambda task_job_id, tracker: run_generate_cloned_audio(task_job_id, tracker, max_workers,
+                                                                              resume))
 
 
-@app.route('/regenerate_cloned_audio', methods=['POST'])
-def regenerate_cloned_audio():
+@bp.route('/regenerate_cloned_audio', methods=['POST'])
+@record_timings("regenerate_cloned_audio")
+@require_job
+def regenerate_cloned_audio(job_id):
     """
     重新生成单句变声音频。
     """
@@ -257,9 +580,8 @@ def regenerate_cloned_audio():
         if not sentence_id or not new_text:
             return jsonify({"error": "Missing required parameters (sentence_id or text)"}), 400
 
-        # 检查句子是否存在于全局变量中
-        cloned_audio = file_info.get("cloned_audio", [])
-        sentence = next((s for s in cloned_audio if s["sentence_id"] == sentence_id), None)
+        # 按 sentence_id 索引查找句子
+        sentence = job_store.get_sentence(job_id, "cloned_audio", sentence_id)
         if not sentence:
             return jsonify({"error": f"Sentence with ID {sentence_id} not found"}), 404
 
@@ -267,31 +589,30 @@ def regenerate_cloned_audio():
         sentence["text"] = new_text
 
         # 获取参考音频的 URL
-        reference_audio_url = file_info.get("reference_audio", {}).get("oss_url")
+        reference_audio = job_store.get(job_id, "reference_audio", {})
+        reference_audio_url = reference_audio.get("oss_url")
         if not reference_audio_url:
             return jsonify({"error": "Reference audio URL not found"}), 400
 
         # 获取原音频的本地文件路径
-        output_folder = os.path.join(app.config['SPLIT_FOLDER'], 'cloned_audio')
-        output_file = os.path.join(output_folder, f"cloned_sentence_{sentence_id}.mp3")
+        output_folder = job_folder('SPLIT_FOLDER', job_id, 'cloned_audio')
+        output_file = os.path.join(output_folder, f"cloned_sentence_{sentence_id}.wav")
 
         # 调用工具方法重新生成音频
-        updated_audio = regenerate_sentence_audio(sentence, reference_audio_url, output_file)
+        updated_audio = regenerate_sentence_audio(
+            sentence, reference_audio_url, output_file,
+            reference_audio_path=reference_audio.get("local_url")
+        )
 
+        # 写回任务状态（清除上次失败留下的 error 字段）
+        sentence.pop("error", None)
         sentence["local_url"] = updated_audio["local_url"]
         sentence["oss_url"] = updated_audio["oss_url"]
-
-        # 找到并更新相应的句子
-        for idx, s in enumerate(cloned_audio):
-            if s["sentence_id"] == sentence_id:
-                cloned_audio[idx] = sentence
-                break
-
-        # 确保更新后的 cloned_audio 被写回 file_info
-        file_info["cloned_audio"] = cloned_audio
+        job_store.put_sentence(job_id, "cloned_audio", sentence)
 
         return jsonify({
             "message": f"Audio for sentence {sentence_id} regenerated successfully!",
+            "job_id": job_id,
             "updated_sentence": sentence,
         })
 
@@ -300,38 +621,67 @@ def regenerate_cloned_audio():
 
 
 
-@app.route('/merge_cloned_audio', methods=['POST'])
-def merge_cloned_audio_route():
+@bp.route('/merge_cloned_audio', methods=['POST'])
+@record_timings("merge_cloned_audio")
+@require_job
+def merge_cloned_audio_route(job_id):
     """
     合并 cloned_audio 中的音频文件，并保存到本地和 OSS。
     """
     try:
         # 获取 cloned_audio 信息
-        cloned_audio = file_info.get("cloned_audio")
+        cloned_audio = job_store.get_sentences(job_id, "cloned_audio")
         if not cloned_audio:
-            return jsonify({"error": "No cloned audio data found in file_info"}), 400
+            return jsonify({"error": "No cloned audio data found for this job"}), 400
 
         # 定义合并后的音频文件路径
-        output_file = os.path.join(app.config['MERGE_FOLDER'], 'merged_audio.wav')
-
-        # 调用合并函数
-        merged_audio_path = merge_cloned_audio(cloned_audio, output_file)
-
-        if not merged_audio_path:
-            return jsonify({"error": "Failed to merge audio files"}), 500
-
-        # 上传合并后的文件到 OSS
-        merged_audio_oss_url = upload_to_oss(merged_audio_path)
+        output_file = os.path.join(job_folder('MERGE_FOLDER', job_id), 'merged_audio.wav')
+
+        data = request.get_json(silent=True) or {}
+        merge_mode = data.get("mode", current_app.config['MERGE_MODE'])
+        merge_options = {
+            "stretcher": data.get("stretcher", current_app.config['MERGE_STRETCHER']),
+            "max_stretch_ratio": float(data.get("max_stretch_ratio", current_app.config['MERGE_MAX_STRETCH_RATIO'])),
+            "overflow": data.get("overflow", current_app.config['MERGE_OVERFLOW']),
+        }
 
-        # 保存合并音频信息到全局变量
-        file_info["merged_audio"] = {
-            "local_url": merged_audio_path,
+        # 上传成功前本地合并文件与 OSS 上的对象不一致，先清除旧的 oss_url
+        previous_oss_url = job_store.get(job_id, "merged_audio", {}).get("oss_url")
+        job_store.set(job_id, "merged_audio", {"local_url": output_file})
+
+        # 增量模式：只重写来源文件发生变化的句子；没有可用的时间槽索引时退回完整合并
+        dirty_ranges = None
+        if merge_mode == "incremental":
+            dirty_ranges = patch_merged_clips(cloned_audio, output_file, **merge_options)
+
+        if dirty_ranges is None:
+            full_mode = current_app.config['MERGE_FULL_MODE'] if merge_mode == "incremental" else merge_mode
+            merged_audio_path = merge_cloned_audio(cloned_audio, output_file, mode=full_mode, **merge_options)
+            if not merged_audio_path:
+                return jsonify({"error": "Failed to merge audio files"}), 500
+
+            # 上传合并后的文件到 OSS
+            merged_audio_oss_url = upload_to_oss(merged_audio_path)
+        elif previous_oss_url:
+            # 未修改的分片在 OSS 服务端复制，只上传改写过的分片
+            merged_audio_oss_url = upload_patched_to_oss(output_file, previous_oss_url, dirty_ranges,
+                                                         target_key=f"audio/jobs/{job_id}/merged_audio.wav")
+        else:
+            merged_audio_oss_url = upload_to_oss(output_file)
+
+        # 保存合并音频信息到任务状态
+        merged_audio = {
+            "local_url": output_file,
             "oss_url": merged_audio_oss_url
         }
+        job_store.set(job_id, "merged_audio", merged_audio)
 
         return jsonify({
             "message": "Cloned audio files merged successfully!",
-            "merged_audio": file_info["merged_audio"]
+            "job_id": job_id,
+            "merged_audio": merged_audio,
+            "incremental": dirty_ranges is not None,
+            "patched_sentences": len(dirty_ranges) if dirty_ranges is not None else None
         }), 200
 
     except Exception as e:
@@ -339,49 +689,134 @@ def merge_cloned_audio_route():
 
 
 # 路由：生成 SRT 字幕
-@app.route('/generate_srt', methods=['POST'])
-def generate_srt_route():
+@bp.route('/generate_srt', methods=['POST'])
+@record_timings("generate_srt")
+@require_job
+def generate_srt_route(job_id):
     """
     根据音频的句子信息生成 SRT 字幕文件并上传到 OSS。
     """
     try:
         # 获取切割后的句子音频信息
-        sentences = file_info.get("sentence_audio")
+        sentences = job_store.get_sentences(job_id, "sentence_audio")
         if not sentences:
-            return jsonify({"error": "No sentence audio data found in file_info"}), 400
+            return jsonify({"error": "No sentence audio data found for this job"}), 400
 
         # 生成 SRT 字幕文件
-        output_srt_file = os.path.join(app.config['SUBTITLE_FOLDER'], 'generated_subtitles.srt')
+        output_srt_file = os.path.join(job_folder('SUBTITLE_FOLDER', job_id), 'generated_subtitles.srt')
         generate_srt(sentences, output_srt_file)
 
         # 上传字幕文件到 OSS
         srt_oss_url = upload_to_oss(output_srt_file)
 
-        # 保存字幕文件信息到全局变量
-        file_info["generated_srt"] = {
+        # 保存字幕文件信息到任务状态
+        generated_srt = {
             "local_url": output_srt_file,
             "oss_url": srt_oss_url
         }
+        job_store.set(job_id, "generated_srt", generated_srt)
 
         return jsonify({
             "message": "SRT subtitles generated successfully!",
-            "generated_srt": file_info["generated_srt"]
+            "job_id": job_id,
+            "generated_srt": generated_srt
         }), 200
 
     except Exception as e:
         return jsonify({"error": "An error occurred while generating SRT subtitles.", "details": str(e)}), 500
 
 
-# 路由：查看全局 file_info
-@app.route('/get_info', methods=['GET'])
+# 路由：一键流水线（上传、识别、切割、变声、合并、字幕以流式 DAG 并行执行）
+@bp.route('/pipeline', methods=['POST'])
+def pipeline():
+    # 流式接收上传文件，OSS 上传留给流水线与预处理并行执行
+    fields, files = receive_upload('UPLOAD_FOLDER')
+    if 'file' not in files or 'reference_file' not in files or 'reference_text' not in fields:
+        discard_uploads(files)
+        return jsonify({"error": "Audio file, reference audio file and reference text are required"}), 400
+
+    job_id = job_store.create_job()
+
+    # 保存上传文件到本地
+    input_filepath = place_upload(files['file'], job_folder('UPLOAD_FOLDER', job_id))
+    reference_audio_path = place_upload(files['reference_file'], job_folder('REFERENCE_FOLDER', job_id))
+    reference_text = fields['reference_text']
+
+    folders = {
+        "processed": job_folder('PROCESSED_FOLDER', job_id),
+        "json": job_folder('JSON_FOLDER', job_id),
+        "sentences": job_folder('SPLIT_FOLDER', job_id, 'sentences'),
+        "cloned_audio": job_folder('SPLIT_FOLDER', job_id, 'cloned_audio'),
+        "merge": job_folder('MERGE_FOLDER', job_id),
+        "subtitle": job_folder('SUBTITLE_FOLDER', job_id),
+    }
+    options = {
+        "preprocess_mode": fields.get("preprocess_mode", current_app.config['PREPROCESS_MODE']),
+        "preprocess_workers": current_app.config['PREPROCESS_WORKERS'],
+        "split_max_workers": current_app.config['SPLIT_MAX_WORKERS'],
+        "clone_max_workers": int(fields.get("max_workers", current_app.config['CLONE_MAX_WORKERS'])),
+        "upload_original": current_app.config['UPLOAD_ORIGINAL_TO_OSS'],
+        "long_audio_min_seconds": current_app.config['LONG_AUDIO_MIN_SECONDS'],
+        "long_audio_chunk_seconds": current_app.config['LONG_AUDIO_CHUNK_SECONDS'],
+        "merge_options": {
+            "stretcher": current_app.config['MERGE_STRETCHER'],
+            "max_stretch_ratio": current_app.config['MERGE_MAX_STRETCH_RATIO'],
+            "overflow": current_app.config['MERGE_OVERFLOW'],
+        },
+    }
+
+    store = current_app.extensions['job_store']
+    return submit_task(job_id, "pipeline", lambda task_job_id, tracker: run_pipeline(
+        task_job_id, store, input_filepath, reference_audio_path, reference_text, folders, options,
+        progress_callback=tracker
+    ))
+
+
+# 路由：轮询后台阶段的状态与进度（供无法使用 WebSocket 的客户端）
+@bp.route('/jobs/<job_id>/status', methods=['GET'])
+def job_status(job_id):
+    if not job_store.job_exists(job_id):
+        return jsonify({"error": f"Job {job_id} not found"}), 404
+    return jsonify({
+        "job_id": job_id,
+        "stages": task_runner.status(job_id, BACKGROUND_STAGES),
+        "timings": job_store.get_timings(job_id)
+    }), 200
+
+
+# 路由：Prometheus 格式的运行指标（各阶段与操作的耗时直方图、计数器、DashScope 调度通道状态）
+@bp.route('/metrics', methods=['GET'])
+def metrics():
+    return Response(registry.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+# Socket.IO：客户端加入任务房间后接收该任务的进度事件
+@socketio.on('join_job')
+def on_join_job(data):
+    job_id = (data or {}).get("job_id")
+    if job_id:
+        join_room(job_id)
+
+
+# 路由：查看任务信息
+@bp.route('/get_info', methods=['GET'])
 def get_info():
     """
-    返回当前全局变量 file_info 的内容
+    返回指定任务的全部状态；未指定 job_id 时返回任务列表。
     """
     try:
+        job_id = request.args.get("job_id")
+        if not job_id:
+            return jsonify({
+                "message": "Job list retrieved successfully!",
+                "jobs": job_store.list_jobs()
+            }), 200
+        if not job_store.job_exists(job_id):
+            return jsonify({"error": f"Job {job_id} not found"}), 404
         return jsonify({
             "message": "File info retrieved successfully!",
-            "file_info": file_info
+            "job_id": job_id,
+            "file_info": job_store.get_info(job_id)
         }), 200
     except Exception as e:
         return jsonify({
@@ -391,4 +826,5 @@ def get_info():
 
 
 if __name__ == "__main__":
+    app = create_app()
     socketio.run(app, debug=True, host="127.0.0.1", port=5000)
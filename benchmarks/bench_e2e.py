@@ -0,0 +1,357 @@
+"""
+端到端基准测试：启动本地云服务替身（benchmarks/fake_services.py），用生成的测试音频驱动 app.py 的真实路由，
+记录各阶段的耗时、峰值 RSS 和吞吐量，以 JSON 输出，便于发现性能回退。
+
+每个时长在独立的子进程中运行（缓存为空、RSS 互不影响），各阶段依次为：
+upload（上传 + 预处理）→ recognize → split_audio → upload_reference → generate_cloned_audio
+→ merge_cloned_audio → generate_srt；--mode pipeline 时改为调用一键流水线 /pipeline。
+
+用法：python benchmarks/bench_e2e.py --minutes 1,10,60 --output e2e.json
+      python benchmarks/bench_e2e.py --minutes 1 --latency-ms 50 --profile synthesis:error_rate=0.05
+"""
+import argparse
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+
+import numpy as np
+import soundfile as sf
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FAKE_SERVICES = os.path.join(REPO_ROOT, "benchmarks", "fake_services.py")
+
+
+class RssSampler:
+    """
+    后台线程定期采样当前进程的 RSS，记录每个阶段内的峰值。
+    没有 /proc 的平台退化为 getrusage 的进程级峰值。
+    """
+
+    def __init__(self, interval=0.02):
+        self.interval = interval
+        self.peak = 0
+        self._page_size = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="rss-sampler", daemon=True)
+
+    def current(self):
+        try:
+            with open("/proc/self/statm") as f:
+                return int(f.read().split()[1]) * self._page_size
+        except OSError:
+            return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, self.current())
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def reset(self):
+        self.peak = self.current()
+
+
+def make_input(path, seconds, sample_rate=16000, speech_seconds=3.5, pause_seconds=0.5, seed=0):
+    """
+    分块生成带句间停顿和背景噪声的测试音频，1 小时的音频也不必整段驻留内存。
+    """
+    rng = np.random.default_rng(seed)
+    period = speech_seconds + pause_seconds
+    block = 60 * sample_rate
+    total = int(seconds * sample_rate)
+    with sf.SoundFile(path, mode="w", samplerate=sample_rate, channels=1, subtype="PCM_16") as output:
+        for start in range(0, total, block):
+            t = np.arange(start, min(start + block, total)) / sample_rate
+            gate = (t % period) < speech_seconds
+            syllables = 0.5 + 0.5 * np.abs(np.sin(np.pi * 4 * t))
+            voiced = sum(np.sin(2 * np.pi * 150 * h * t) / h for h in range(1, 5))
+            output.write((0.3 * voiced * syllables * gate + 0.02 * rng.standard_normal(len(t))).astype(np.float32))
+
+
+class Harness:
+    """
+    通过 Flask 测试客户端依次调用各阶段路由，后台阶段轮询 /jobs/<job_id>/status 直至结束。
+    """
+
+    def __init__(self, client, sampler, audio_seconds, poll_interval=0.1):
+        self.client = client
+        self.sampler = sampler
+        self.audio_seconds = audio_seconds
+        self.poll_interval = poll_interval
+        self.stages = {}
+
+    def measure(self, name, func):
+        """
+        执行一个阶段并记录耗时和阶段内的峰值 RSS；阶段失败时抛出 RuntimeError。
+        """
+        self.sampler.reset()
+        start = time.perf_counter()
+        result = func()
+        seconds = time.perf_counter() - start
+        self.stages[name] = {
+            "seconds": round(seconds, 3),
+            "peak_rss_mb": round(self.sampler.peak / 1024 / 1024, 1),
+            "audio_seconds_per_second": round(self.audio_seconds / seconds, 2) if seconds > 0 else None,
+        }
+        return result
+
+    def post(self, path, **kwargs):
+        response = self.client.post(path, **kwargs)
+        body = response.get_json(silent=True) or {}
+        if response.status_code >= 400:
+            raise RuntimeError(f"{path} returned {response.status_code}: {body}")
+        return response.status_code, body
+
+    def wait(self, job_id, stage):
+        while True:
+            state = self.client.get(f"/jobs/{job_id}/status").get_json()["stages"].get(stage, {})
+            if state.get("status") == "completed":
+                return state["result"]
+            if state.get("status") == "failed":
+                raise RuntimeError(f"Stage {stage} failed: {state.get('error')}")
+            time.sleep(self.poll_interval)
+
+    def job_timings(self, job_id):
+        """
+        应用记录的各阶段操作耗时汇总（/jobs/<job_id>/status 中的 timings）。
+        """
+        return self.client.get(f"/jobs/{job_id}/status").get_json().get("timings")
+
+    def run_background(self, job_id, stage, payload=None):
+        status_code, body = self.post(f"/{stage}", json=dict(payload or {}, job_id=job_id))
+        return body if status_code == 200 else self.wait(job_id, stage)
+
+    def run_stages(self, input_path, reference_path):
+        def upload():
+            with open(input_path, "rb") as f:
+                return self.post("/upload", data={"file": (f, os.path.basename(input_path))},
+                                 content_type="multipart/form-data")[1]
+
+        def upload_reference():
+            with open(reference_path, "rb") as f:
+                return self.post("/upload_reference", data={"job_id": job_id, "text": "参考音频文本",
+                                                            "file": (f, os.path.basename(reference_path))},
+                                 content_type="multipart/form-data")[1]
+
+        job_id = self.measure("upload", upload)["job_id"]
+        self.measure("recognize", lambda: self.run_background(job_id, "recognize"))
+        split = self.measure("split_audio", lambda: self.run_background(job_id, "split_audio"))
+        self.measure("upload_reference", upload_reference)
+        cloned = self.measure("generate_cloned_audio", lambda: self.run_background(job_id, "generate_cloned_audio"))
+        self.measure("merge_cloned_audio", lambda: self.post("/merge_cloned_audio", json={"job_id": job_id})[1])
+        self.measure("generate_srt", lambda: self.post("/generate_srt", json={"job_id": job_id})[1])
+
+        sentence_count = len(split["sentence_audio_info"])
+        for stage in ("split_audio", "generate_cloned_audio"):
+            self.stages[stage]["sentences_per_second"] = round(sentence_count / self.stages[stage]["seconds"], 2)
+        return {
+            "job_id": job_id,
+            "sentences": sentence_count,
+            "failed_sentences": len(split["failed_sentences"]) + len(cloned["failed_sentences"]),
+            "clone_stats": cloned.get("stats"),
+            "job_timings": self.job_timings(job_id),
+        }
+
+    def run_pipeline(self, input_path, reference_path):
+        def pipeline():
+            with open(input_path, "rb") as f, open(reference_path, "rb") as reference:
+                _, body = self.post("/pipeline", data={
+                    "file": (f, os.path.basename(input_path)),
+                    "reference_file": (reference, os.path.basename(reference_path)),
+                    "reference_text": "参考音频文本",
+                }, content_type="multipart/form-data")
+            return self.wait(body["job_id"], "pipeline")
+
+        result = self.measure("pipeline", pipeline)
+        return {
+            "job_id": result["job_id"],
+            "failed_sentences": len(result["failed_sentences"]),
+            "pipeline_timings": result.get("timings"),
+            "job_timings": self.job_timings(result["job_id"]),
+        }
+
+
+def run_worker(args):
+    """
+    子进程入口：生成测试音频，导入应用并驱动各阶段路由，结果写入 --result-file。
+    """
+    workdir = tempfile.mkdtemp(prefix="bench_e2e_")
+    os.environ["CACHE_FOLDER"] = os.path.join(workdir, ".cache")
+    sys.path.insert(0, REPO_ROOT)
+    # app.py 的数据目录是相对路径，切换到临时目录后导入
+    os.chdir(workdir)
+
+    audio_seconds = args.minutes * 60
+    input_path = os.path.join(workdir, "input.wav")
+    reference_path = os.path.join(workdir, "reference.wav")
+    make_input(input_path, audio_seconds, sample_rate=args.sample_rate)
+    make_input(reference_path, 10, sample_rate=args.sample_rate, seed=1)
+
+    sampler = RssSampler().start()
+    report = {"minutes": args.minutes, "audio_seconds": audio_seconds, "mode": args.mode,
+              "input_bytes": os.path.getsize(input_path)}
+    try:
+        start = time.perf_counter()
+        from app import create_app
+        # blocking 预热时依赖的加载计入 import_seconds，否则计入首个用到它的阶段
+        overrides = {'WARM_UP': args.warm_up}
+        if args.preprocess_mode:
+            overrides['PREPROCESS_MODE'] = args.preprocess_mode
+        flask_app = create_app(overrides)
+        report["import_seconds"] = round(time.perf_counter() - start, 3)
+
+        harness = Harness(flask_app.test_client(), sampler, audio_seconds)
+        total_start = time.perf_counter()
+        try:
+            if args.mode == "pipeline":
+                report.update(harness.run_pipeline(input_path, reference_path))
+            else:
+                report.update(harness.run_stages(input_path, reference_path))
+            report["status"] = "completed"
+        except RuntimeError as e:
+            report["status"] = "failed"
+            report["error"] = str(e)
+        total_seconds = time.perf_counter() - total_start
+        report["stages"] = harness.stages
+        report["total_seconds"] = round(total_seconds, 3)
+        report["audio_seconds_per_second"] = round(audio_seconds / total_seconds, 2)
+    finally:
+        sampler.stop()
+        report["peak_rss_mb"] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+        with open(args.result_file, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False)
+        if not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+def start_fake_services(args):
+    """
+    在独立进程中启动云服务替身，替身的内存和 CPU 不计入被测进程。
+    """
+    command = [sys.executable, FAKE_SERVICES, "--latency-ms", str(args.latency_ms), "--jitter-ms",
+               str(args.jitter_ms), "--error-rate", str(args.error_rate), "--synthesis-speed",
+               str(args.synthesis_speed), "--transcription-speed", str(args.transcription_speed),
+               "--seed", str(args.seed)]
+    for profile in args.profile:
+        command += ["--profile", profile]
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+    address = json.loads(process.stdout.readline())
+    return process, f"http://{address['host']}:{address['port']}"
+
+
+def fake_stats(base_url, reset=False):
+    request = urllib.request.Request(f"{base_url}/_stats/reset" if reset else f"{base_url}/_stats",
+                                     method="POST" if reset else "GET")
+    with urllib.request.urlopen(request) as response:
+        return json.load(response)
+
+
+def worker_env(base_url):
+    """
+    被测进程的环境变量：OSS 与 DashScope 全部指向本地替身。
+    """
+    env = dict(os.environ)
+    host = base_url.split("://", 1)[1]
+    env.update({
+        "OSS_ENDPOINT": base_url,
+        "OSS_ACCESS_KEY_ID": "benchmark",
+        "OSS_ACCESS_KEY_SECRET": "benchmark",
+        "OSS_BUCKET_NAME": "voice-soa-benchmark",
+        "DASHSCOPE_API_KEY": "benchmark",
+        "DASHSCOPE_HTTP_BASE_URL": f"{base_url}/api/v1",
+        "DASHSCOPE_WEBSOCKET_BASE_URL": f"ws://{host}/api-ws/v1/inference",
+    })
+    return env
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--minutes", default="1,10,60", help="测试音频时长（分钟），逗号分隔")
+    parser.add_argument("--mode", choices=("stages", "pipeline"), default="stages")
+    parser.add_argument("--preprocess-mode", choices=("full", "stream", "parallel"), default=None,
+                        help="覆盖 app.config['PREPROCESS_MODE']")
+    parser.add_argument("--warm-up", choices=("off", "blocking"), default="off",
+                        help="覆盖 app.config['WARM_UP']")
+    parser.add_argument("--sample-rate", type=int, default=16000)
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--jitter-ms", type=float, default=10.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--profile", action="append", default=[],
+                        help="按服务覆盖替身的故障配置，例如 synthesis:latency_ms=200,error_rate=0.02")
+    parser.add_argument("--synthesis-speed", type=float, default=20.0)
+    parser.add_argument("--transcription-speed", type=float, default=50.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="结果 JSON 的输出路径，默认打印到标准输出")
+    parser.add_argument("--verbose", action="store_true", help="显示被测进程的日志输出")
+    parser.add_argument("--keep", action="store_true", help="保留被测进程的临时目录")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--result-file", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        args.minutes = float(args.minutes)
+        run_worker(args)
+        return
+
+    fake_process, base_url = start_fake_services(args)
+    runs = []
+    try:
+        for minutes in (float(value) for value in args.minutes.split(",")):
+            fake_stats(base_url, reset=True)
+            with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as result_file:
+                result_path = result_file.name
+            command = [sys.executable, os.path.abspath(__file__), "--worker", "--minutes", str(minutes),
+                       "--mode", args.mode, "--warm-up", args.warm_up, "--sample-rate", str(args.sample_rate),
+                       "--result-file", result_path]
+            if args.preprocess_mode:
+                command += ["--preprocess-mode", args.preprocess_mode]
+            if args.keep:
+                command.append("--keep")
+            completed = subprocess.run(command, env=worker_env(base_url),
+                                       stdout=None if args.verbose else subprocess.DEVNULL)
+            try:
+                with open(result_path, encoding="utf-8") as f:
+                    run = json.load(f)
+            except (OSError, ValueError):
+                run = {"minutes": minutes, "status": "crashed", "exit_code": completed.returncode}
+            finally:
+                if os.path.exists(result_path):
+                    os.remove(result_path)
+            stats = fake_stats(base_url)
+            run["fake_services"] = stats["services"]
+            runs.append(run)
+            print(f"[INFO] {minutes} min: {run.get('status')} in {run.get('total_seconds')}s", file=sys.stderr)
+        profiles = stats["profiles"] if runs else None
+    finally:
+        fake_process.terminate()
+        fake_process.wait()
+
+    report = json.dumps({
+        "cpu_count": os.cpu_count(),
+        "fake_profiles": profiles,
+        "synthesis_speed": args.synthesis_speed,
+        "transcription_speed": args.transcription_speed,
+        "runs": runs,
+    }, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(report)
+    else:
+        print(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+启动耗时基准测试：在全新的子进程中测量导入 app 并调用 create_app() 的耗时和加载的模块，
+再执行 warm_up() 测量各阶段首次使用时才加载的依赖的耗时。
+对照组在另一个全新的子进程中先导入改为按需加载之前 app.py 的模块图在顶层导入的第三方库，
+再调用 create_app()，直接测量按需加载之前每次启动的耗时。
+
+用法：python benchmarks/bench_import.py --repeat 5
+"""
+import argparse
+import importlib
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 按需加载的重量级依赖，启动后不应出现在 sys.modules 中
+HEAVY_MODULES = ("noisereduce", "scipy.signal", "numba", "librosa.core", "pydub", "dashscope", "oss2")
+
+# 改为按需加载之前 app.py 导入时经 utils/ 各模块在顶层加载的第三方库
+EAGER_IMPORTS = (
+    "librosa",  # audio_utils、preprocess_utils
+    "noisereduce",  # audio_utils、preprocess_utils
+    "pydub",  # audio_utils、preprocess_utils、merge_utils、time_stretch
+    "dashscope",  # voice_util
+    "dashscope.audio.tts_v2",  # voice_util
+    "oss2",  # oss_utils
+)
+
+
+def worker(mode):
+    """
+    子进程：测量一次启动（lazy 模式下再测量预热），结果以 JSON 输出到标准输出。
+    :param mode: "lazy" 按需加载；"eager" 先导入 EAGER_IMPORTS，模拟改为按需加载之前的启动
+    """
+    sys.path.insert(0, ROOT)
+    start = time.perf_counter()
+    if mode == "eager":
+        for name in EAGER_IMPORTS:
+            importlib.import_module(name)
+    from app import create_app
+    create_app()
+    startup_seconds = time.perf_counter() - start
+    result = {
+        "startup_seconds": startup_seconds,
+        "modules_loaded": len(sys.modules),
+        "heavy_modules_loaded": [name for name in HEAVY_MODULES if name in sys.modules],
+    }
+
+    if mode == "lazy":
+        from utils.warmup import warm_up
+        result["warm_up_seconds"] = warm_up()
+        result["modules_after_warm_up"] = len(sys.modules)
+    print(json.dumps(result))
+
+
+def run_once(workdir, mode):
+    env = dict(os.environ, CACHE_FOLDER=os.path.join(workdir, "cache"))
+    # 预热会创建云端客户端（不发出请求），填充占位凭证
+    for key in ("DASHSCOPE_API_KEY", "OSS_ACCESS_KEY_ID", "OSS_ACCESS_KEY_SECRET"):
+        env.setdefault(key, "benchmark")
+    output = subprocess.run([sys.executable, os.path.abspath(__file__), "--worker", mode], cwd=workdir, env=env,
+                            capture_output=True, text=True, check=True).stdout
+    # 预热过程中的日志在 JSON 之前输出
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5, help="子进程重复次数，结果取中位数")
+    parser.add_argument("--worker", choices=("lazy", "eager"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        worker(args.worker)
+        return
+
+    with tempfile.TemporaryDirectory() as workdir:
+        # 交替运行两组，避免磁盘缓存等因素只偏向其中一组
+        runs, eager_runs = [], []
+        for _ in range(args.repeat):
+            runs.append(run_once(workdir, "lazy"))
+            eager_runs.append(run_once(workdir, "eager"))
+
+    startup = statistics.median(run["startup_seconds"] for run in runs)
+    warm_up_seconds = {
+        step: round(statistics.median(run["warm_up_seconds"][step] or 0.0 for run in runs), 3)
+        for step in runs[0]["warm_up_seconds"]
+    }
+    eager = statistics.median(run["startup_seconds"] for run in eager_runs)
+    print(json.dumps({
+        "repeat": args.repeat,
+        "startup_seconds": round(startup, 3),
+        "startup_seconds_min": round(min(run["startup_seconds"] for run in runs), 3),
+        "modules_loaded": runs[0]["modules_loaded"],
+        "heavy_modules_loaded": runs[0]["heavy_modules_loaded"],
+        "warm_up_seconds": warm_up_seconds,
+        "modules_after_warm_up": runs[0]["modules_after_warm_up"],
+        "eager_startup_seconds": round(eager, 3),
+        "eager_startup_seconds_min": round(min(run["startup_seconds"] for run in eager_runs), 3),
+        "eager_modules_loaded": eager_runs[0]["modules_loaded"],
+        "eager_heavy_modules_loaded": eager_runs[0]["heavy_modules_loaded"],
+        "speedup": round(eager / startup, 2) if startup else None,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+合并引擎基准测试：对比 AudioSegment 逐句拼接（merge_cloned_audio_pydub）
+与 NumPy 预分配缓冲区引擎（merge_cloned_audio）的耗时和输出时长。
+
+用法：python benchmarks/bench_merge.py --clips 1000
+      python benchmarks/bench_merge.py --clips 1000 --clip-format wav   # 流式合成输出的 PCM WAV 片段
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# 基准测试不访问云服务，填充占位凭证以便导入工具模块
+os.environ.setdefault('OSS_ACCESS_KEY_ID', 'benchmark')
+os.environ.setdefault('OSS_ACCESS_KEY_SECRET', 'benchmark')
+
+from pydub import AudioSegment  # noqa: E402
+from pydub.generators import Sine  # noqa: E402
+
+from utils.audio_utils import merge_cloned_audio, merge_cloned_audio_pydub  # noqa: E402
+
+
+def generate_clips(folder, count, seed=0, clip_format="mp3"):
+    """
+    生成 count 个 MP3/WAV 片段及对应时间槽，约三分之一的片段长于时间槽以触发加速路径。
+    """
+    rng = random.Random(seed)
+    cloned_audio = []
+    cursor = 0
+    for i in range(count):
+        duration_ms = rng.randint(800, 2500)
+        clip = Sine(220 + 20 * (i % 20)).to_audio_segment(duration=duration_ms).set_frame_rate(22050)
+        path = os.path.join(folder, f"cloned_sentence_{i + 1}.{clip_format}")
+        clip.export(path, format=clip_format)
+
+        cursor += rng.randint(0, 400)
+        slot_ms = int(duration_ms * rng.choice([0.8, 1.0, 1.3]))
+        cloned_audio.append({
+            "sentence_id": i + 1,
+            "begin_time": cursor,
+            "end_time": cursor + slot_ms,
+            "local_url": path,
+        })
+        cursor += slot_ms
+    return cloned_audio
+
+
+def run(label, merge_func, cloned_audio, output_file):
+    start = time.perf_counter()
+    merge_func(cloned_audio, output_file)
+    elapsed = time.perf_counter() - start
+    duration_ms = len(AudioSegment.from_wav(output_file))
+    return {"engine": label, "seconds": round(elapsed, 3), "output_ms": duration_ms}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--clips", type=int, default=1000)
+    parser.add_argument("--clip-format", choices=("mp3", "wav"), default="mp3",
+                        help="片段格式；wav 片段无需解码，原始实现只支持 mp3")
+    parser.add_argument("--skip-legacy", action="store_true", help="跳过耗时较长的原始实现")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        print(f"[INFO] Generating {args.clips} {args.clip_format} clips...")
+        cloned_audio = generate_clips(folder, args.clips, clip_format=args.clip_format)
+        expected_ms = cloned_audio[-1]["end_time"]
+
+        results = [run("numpy", merge_cloned_audio, cloned_audio, os.path.join(folder, "merged_numpy.wav"))]
+        if not args.skip_legacy and args.clip_format == "mp3":
+            results.append(run("pydub", merge_cloned_audio_pydub, cloned_audio,
+                               os.path.join(folder, "merged_pydub.wav")))
+
+    print(json.dumps({"clips": args.clips, "clip_format": args.clip_format, "expected_ms": expected_ms,
+                      "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+预处理基准测试：对比串行路径（preprocess_audio mode="full"）与多进程路径（mode="parallel"）
+在不同进程数下的耗时、加速比，以及输出是否与串行路径逐点对齐。
+
+librosa / noisereduce 的导入和 numba JIT 只在进程内第一次调用时发生（约 2~3 秒），
+每种模式计时前先用一段短音频不计时地运行一次，避免这部分一次性开销计入先运行的模式。
+
+用法：python benchmarks/bench_preprocess.py --minutes 5
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# 基准测试不访问云服务，填充占位凭证以便导入工具模块
+os.environ.setdefault('OSS_ACCESS_KEY_ID', 'benchmark')
+os.environ.setdefault('OSS_ACCESS_KEY_SECRET', 'benchmark')
+
+import numpy as np  # noqa: E402
+import soundfile as sf  # noqa: E402
+
+from utils.audio_utils import preprocess_audio  # noqa: E402
+
+
+def make_input(path, minutes, sample_rate=44100, seed=0):
+    """
+    生成带停顿和背景噪声的测试音频。
+    """
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(minutes * 60 * sample_rate)) / sample_rate
+    gate = (np.floor(t / 2.0) % 2 == 0)
+    voiced = sum(np.sin(2 * np.pi * 150 * h * t) / h for h in range(1, 5))
+    signal = 0.3 * voiced * gate + 0.02 * rng.standard_normal(len(t))
+    sf.write(path, signal.astype(np.float32), sample_rate)
+
+
+def run(input_path, output_folder, mode, workers=None, warm_up_path=None):
+    folder = os.path.join(output_folder, f"{mode}_{workers}")
+    os.makedirs(folder, exist_ok=True)
+    if warm_up_path is not None:
+        preprocess_audio(warm_up_path, folder, mode=mode, workers=workers)
+    start = time.perf_counter()
+    output_path = preprocess_audio(input_path, folder, mode=mode, workers=workers)
+    return time.perf_counter() - start, sf.read(output_path, dtype="float32")[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--minutes", type=float, default=5.0)
+    parser.add_argument("--warm-up-seconds", type=float, default=20.0, help="计时前预热用的音频时长，0 表示不预热")
+    args = parser.parse_args()
+
+    cpu_count = os.cpu_count() or 1
+    worker_counts = sorted({1, 2, 4, 8, cpu_count} & set(range(1, cpu_count + 1)))
+
+    with tempfile.TemporaryDirectory() as folder:
+        input_path = os.path.join(folder, "input.wav")
+        make_input(input_path, args.minutes)
+        warm_up_path = None
+        if args.warm_up_seconds > 0:
+            warm_up_path = os.path.join(folder, "warm_up.wav")
+            make_input(warm_up_path, args.warm_up_seconds / 60, seed=1)
+
+        serial_seconds, reference = run(input_path, folder, "full", warm_up_path=warm_up_path)
+        results = [{"mode": "full", "workers": 1, "seconds": round(serial_seconds, 3), "speedup": 1.0}]
+
+        for workers in worker_counts:
+            seconds, output = run(input_path, folder, "parallel", workers, warm_up_path=warm_up_path)
+            results.append({
+                "mode": "parallel",
+                "workers": workers,
+                "seconds": round(seconds, 3),
+                "speedup": round(serial_seconds / seconds, 2),
+                "length_matches": len(output) == len(reference),
+                "correlation": round(float(np.corrcoef(output, reference)[0, 1]), 4),
+            })
+
+    print(json.dumps({"minutes": args.minutes, "cpu_count": cpu_count, "warm_up_seconds": args.warm_up_seconds,
+                      "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,732 @@
+"""
+本地云服务替身：在一个 HTTP 端口上模拟端到端基准测试需要的全部云接口，不访问外网。
+
+- OSS（路径风格 /<bucket>/<key>）：PutObject、CopyObject、DeleteObject、HeadObject / GetObjectMeta、GetObject、
+  分片上传（InitiateMultipartUpload、UploadPart、UploadPartCopy、ListParts、CompleteMultipartUpload、
+  AbortMultipartUpload）；
+- DashScope 录音文件识别：提交任务、轮询任务状态、下载识别结果 JSON；识别结果按音频时长每隔
+  sentence_seconds 生成一句；
+- DashScope 音色注册（create_voice / query_voice / delete_voice / list_voice）；
+- DashScope 流式语音合成（WebSocket run-task / continue-task / finish-task），按文本长度返回 22050Hz 16 位 PCM。
+
+每类服务可分别设置延迟、抖动和错误率；GET /_stats 返回各服务的请求数、注入的错误数和收发字节数，
+POST /_stats/reset 清零。对象数据保存在 --storage 目录中，不占用内存。
+
+用法：python benchmarks/fake_services.py --port 8765 --latency-ms 20 --jitter-ms 10 \\
+          --profile synthesis:error_rate=0.02 --profile oss:latency_ms=5
+"""
+import argparse
+import base64
+import hashlib
+import json
+import os
+import random
+import re
+import shutil
+import struct
+import tempfile
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
+
+import numpy as np
+import soundfile as sf
+
+SERVICES = ("oss", "transcription", "enrollment", "synthesis")
+
+WEBSOCKET_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+SYNTHESIS_SAMPLE_RATE = 22050
+
+
+class FaultProfile:
+    """
+    单类服务的故障配置：每个请求先等待 latency_ms ± jitter_ms（均匀分布），再以 error_rate 的概率返回错误。
+    """
+
+    def __init__(self, latency_ms=0.0, jitter_ms=0.0, error_rate=0.0, rng=None):
+        self.latency_ms = float(latency_ms)
+        self.jitter_ms = float(jitter_ms)
+        self.error_rate = float(error_rate)
+        self._rng = rng or random.Random()
+        self._lock = threading.Lock()
+
+    def delay(self):
+        with self._lock:
+            jitter = self._rng.uniform(-self.jitter_ms, self.jitter_ms)
+        seconds = max(0.0, self.latency_ms + jitter) / 1000
+        if seconds:
+            time.sleep(seconds)
+
+    def should_fail(self):
+        if self.error_rate <= 0:
+            return False
+        with self._lock:
+            return self._rng.random() < self.error_rate
+
+    def as_dict(self):
+        return {"latency_ms": self.latency_ms, "jitter_ms": self.jitter_ms, "error_rate": self.error_rate}
+
+
+class ServiceStats:
+    """
+    线程安全的按服务计数器。
+    """
+
+    FIELDS = ("requests", "errors_injected", "bytes_in", "bytes_out")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._counters = {service: dict.fromkeys(self.FIELDS, 0) for service in SERVICES}
+
+    def add(self, service, **increments):
+        with self._lock:
+            for field, value in increments.items():
+                self._counters[service][field] += value
+
+    def snapshot(self):
+        with self._lock:
+            return {service: dict(counters) for service, counters in self._counters.items()}
+
+
+def fake_sentence_text(sentence_id, seconds, chars_per_second):
+    """
+    生成长度与时长成正比的句子文本，合成替身按文本长度决定返回音频的时长。
+    """
+    filler = "这是一段用于端到端基准测试的模拟识别文本"
+    length = max(1, int(round(seconds * chars_per_second)))
+    prefix = f"第{sentence_id}句"
+    return (prefix + filler * (length // len(filler) + 1))[:max(length, len(prefix))]
+
+
+class FakeCloud:
+    """
+    替身服务的共享状态：对象存储目录、识别任务、已注册音色、故障配置和计数器。
+    """
+
+    def __init__(self, storage, profiles, sentence_seconds=4.0, pause_seconds=0.5, chars_per_second=4.0,
+                 transcription_speed=50.0, synthesis_speed=20.0):
+        self.storage = storage
+        self.profiles = profiles
+        self.sentence_seconds = sentence_seconds
+        self.pause_seconds = pause_seconds
+        self.chars_per_second = chars_per_second
+        self.transcription_speed = transcription_speed
+        self.synthesis_speed = synthesis_speed
+        self.stats = ServiceStats()
+        self.lock = threading.Lock()
+        self.tasks = {}
+        self.uploads = {}
+        self.voices = {}
+        os.makedirs(os.path.join(storage, "objects"), exist_ok=True)
+        os.makedirs(os.path.join(storage, "parts"), exist_ok=True)
+
+    # ---------- 对象存储 ----------
+
+    def object_path(self, bucket, key):
+        digest = hashlib.sha256(f"{bucket}/{key}".encode("utf-8")).hexdigest()
+        return os.path.join(self.storage, "objects", digest)
+
+    def object_path_from_url(self, url):
+        """
+        把 get_object_url 生成的路径风格 URL 映射到本地对象文件。
+        """
+        parts = unquote(urlparse(url).path).lstrip("/").split("/", 1)
+        if len(parts) != 2:
+            return None
+        return self.object_path(*parts)
+
+    # ---------- 语音识别 ----------
+
+    def make_transcription(self, file_url):
+        """
+        按音频时长生成识别结果：每 sentence_seconds 一句，句末留 pause_seconds 停顿。
+        """
+        path = self.object_path_from_url(file_url)
+        if path is None or not os.path.exists(path):
+            return None, 0.0
+        duration = sf.info(path).duration
+        sentences = []
+        begin = 0.0
+        while begin < duration - 0.2:
+            end = min(duration, begin + self.sentence_seconds - self.pause_seconds)
+            sentence_id = len(sentences) + 1
+            sentences.append({
+                "sentence_id": sentence_id,
+                "begin_time": int(begin * 1000),
+                "end_time": int(end * 1000),
+                "text": fake_sentence_text(sentence_id, end - begin, self.chars_per_second),
+            })
+            begin += self.sentence_seconds
+        return {
+            "file_url": file_url,
+            "properties": {"audio_format": "wav", "original_duration_in_milliseconds": int(duration * 1000)},
+            "transcripts": [{
+                "channel_id": 0,
+                "content_duration_in_milliseconds": int(duration * 1000),
+                "text": "".join(sentence["text"] for sentence in sentences),
+                "sentences": sentences,
+            }],
+        }, duration
+
+    def create_task(self, file_urls, base_url):
+        task_id = uuid.uuid4().hex
+        results = []
+        longest = 0.0
+        for index, file_url in enumerate(file_urls):
+            transcription, duration = self.make_transcription(file_url)
+            longest = max(longest, duration)
+            if transcription is None:
+                results.append({"file_url": file_url, "subtask_status": "FAILED", "code": "InvalidFile.DownloadFailed",
+                                "message": "The audio file cannot be downloaded."})
+                continue
+            result_path = os.path.join(self.storage, "objects", f"{task_id}_{index}.json")
+            with open(result_path, "w", encoding="utf-8") as f:
+                json.dump(transcription, f, ensure_ascii=False)
+            results.append({"file_url": file_url, "subtask_status": "SUCCEEDED",
+                            "transcription_url": f"{base_url}/_results/{task_id}_{index}.json"})
+        with self.lock:
+            # 任务在“音频时长 / 识别速度”秒后完成，同一任务中的文件并行识别
+            self.tasks[task_id] = {"ready_at": time.monotonic() + longest / self.transcription_speed,
+                                   "results": results}
+        return task_id
+
+    def task_status(self, task_id):
+        with self.lock:
+            task = self.tasks.get(task_id)
+        if task is None:
+            return None
+        if time.monotonic() < task["ready_at"]:
+            return {"task_id": task_id, "task_status": "RUNNING"}
+        return {"task_id": task_id, "task_status": "SUCCEEDED", "results": task["results"]}
+
+    # ---------- 语音合成 ----------
+
+    def synthesize_pcm(self, text):
+        """
+        按文本长度生成合成音频（带音节起伏的谐波），返回 16 位 PCM 字节。
+        """
+        seconds = len(text) / self.chars_per_second
+        t = np.arange(int(seconds * SYNTHESIS_SAMPLE_RATE)) / SYNTHESIS_SAMPLE_RATE
+        envelope = 0.5 + 0.5 * np.abs(np.sin(np.pi * self.chars_per_second * t))
+        voiced = sum(np.sin(2 * np.pi * 180 * h * t) / h for h in range(1, 4))
+        return (0.25 * envelope * voiced * 32767).astype("<i2").tobytes()
+
+
+class FakeCloudHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "FakeCloud/1.0"
+    cloud = None
+
+    def log_message(self, format, *args):
+        pass
+
+    # ---------- 通用工具 ----------
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def read_body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if length:
+            return self.rfile.read(length)
+        if self.headers.get("Transfer-Encoding", "").lower() == "chunked":
+            chunks = []
+            while True:
+                size = int(self.rfile.readline().strip().split(b";")[0], 16)
+                if size == 0:
+                    self.rfile.readline()
+                    return b"".join(chunks)
+                chunks.append(self.rfile.read(size))
+                self.rfile.readline()
+        return b""
+
+    def read_body_to(self, path):
+        """
+        把请求体流式写入文件，返回字节数。
+        """
+        remaining = int(self.headers.get("Content-Length") or 0)
+        if not remaining and self.headers.get("Transfer-Encoding", "").lower() == "chunked":
+            body = self.read_body()
+            with open(path, "wb") as f:
+                f.write(body)
+            return len(body)
+        written = 0
+        with open(path, "wb") as f:
+            while remaining > 0:
+                chunk = self.rfile.read(min(remaining, 1024 * 1024))
+                if not chunk:
+                    break
+                f.write(chunk)
+                remaining -= len(chunk)
+                written += len(chunk)
+        return written
+
+    def respond(self, service, status, body=b"", content_type="application/json", headers=None):
+        if isinstance(body, (dict, list)):
+            body = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        elif isinstance(body, str):
+            body = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("x-oss-request-id" if service == "oss" else "X-Request-Id", uuid.uuid4().hex)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+        if service:
+            self.cloud.stats.add(service, bytes_out=len(body))
+
+    def begin(self, service):
+        """
+        记录一次请求并按故障配置等待；需要注入错误时返回 True。
+        """
+        profile = self.cloud.profiles[service]
+        self.cloud.stats.add(service, requests=1)
+        profile.delay()
+        if profile.should_fail():
+            self.cloud.stats.add(service, errors_injected=1)
+            return True
+        return False
+
+    def oss_error(self, status, code, message):
+        body = (f'<?xml version="1.0" encoding="UTF-8"?>\n<Error><Code>{code}</Code><Message>{message}</Message>'
+                f'<RequestId>{uuid.uuid4().hex}</RequestId><HostId>127.0.0.1</HostId></Error>')
+        self.respond("oss", status, body, content_type="application/xml")
+
+    def dashscope_error(self, service, status=429, code="Throttling.RateQuota",
+                        message="Requests rate limit exceeded, please try again later."):
+        self.respond(service, status, {"request_id": uuid.uuid4().hex, "code": code, "message": message})
+
+    # ---------- 路由 ----------
+
+    def route(self):
+        url = urlparse(self.path)
+        path = url.path
+        query = parse_qs(url.query, keep_blank_values=True)
+
+        if path == "/_stats":
+            if self.command == "GET":
+                return self.respond(None, 200, {"profiles": {name: profile.as_dict() for name, profile
+                                                             in self.cloud.profiles.items()},
+                                                "services": self.cloud.stats.snapshot()})
+        if path == "/_stats/reset" and self.command == "POST":
+            self.cloud.stats.reset()
+            return self.respond(None, 200, {"reset": True})
+        if path.startswith("/_results/") and self.command == "GET":
+            return self.handle_transcription_result(os.path.basename(path))
+        if path.startswith("/api-ws/"):
+            return self.handle_synthesis()
+        if path.startswith("/api/v1/"):
+            return self.handle_dashscope(path[len("/api/v1"):])
+        return self.handle_oss(path, query)
+
+    do_GET = do_PUT = do_POST = do_DELETE = do_HEAD = lambda self: self.route()
+
+    # ---------- OSS ----------
+
+    def handle_oss(self, path, query):
+        bucket, _, key = unquote(path).lstrip("/").partition("/")
+        object_path = self.cloud.object_path(bucket, key)
+
+        # 先接收完整请求体再注入故障，出错时连接仍可复用；对象和分片数据直接写盘
+        body = None
+        temp_path = None
+        if self.command == "POST":
+            body = self.read_body()
+            self.cloud.stats.add("oss", bytes_in=len(body))
+        elif self.command == "PUT" and not self.headers.get("x-oss-copy-source"):
+            temp_path = f"{object_path}.{uuid.uuid4().hex}.tmp"
+            self.cloud.stats.add("oss", bytes_in=self.read_body_to(temp_path))
+
+        if self.begin("oss") or not bucket or not key:
+            if temp_path and os.path.exists(temp_path):
+                os.remove(temp_path)
+            if not bucket or not key:
+                return self.oss_error(400, "InvalidArgument", "Bucket and object key are required")
+            return self.oss_error(503, "ServiceUnavailable", "Injected fault")
+
+        if self.command == "PUT" and "partNumber" in query:
+            return self.oss_upload_part(query, temp_path)
+        if self.command == "PUT" and self.headers.get("x-oss-copy-source"):
+            return self.oss_copy_object(object_path)
+        if self.command == "PUT":
+            os.replace(temp_path, object_path)
+            return self.respond("oss", 200, headers={"ETag": f'"{self.file_etag(object_path)}"'})
+        if self.command == "POST" and "uploads" in query:
+            upload_id = uuid.uuid4().hex
+            with self.cloud.lock:
+                self.cloud.uploads[upload_id] = {"path": object_path, "parts": {}}
+            return self.respond("oss", 200, (
+                '<?xml version="1.0" encoding="UTF-8"?>\n<InitiateMultipartUploadResult>'
+                f'<Bucket>{bucket}</Bucket><Key>{key}</Key><UploadId>{upload_id}</UploadId>'
+                '</InitiateMultipartUploadResult>'), content_type="application/xml")
+        if self.command == "POST" and "uploadId" in query:
+            return self.oss_complete_upload(bucket, key, query["uploadId"][0], body)
+        if self.command == "GET" and "uploadId" in query:
+            return self.oss_list_parts(bucket, key, query["uploadId"][0])
+        if self.command == "DELETE" and "uploadId" in query:
+            with self.cloud.lock:
+                upload = self.cloud.uploads.pop(query["uploadId"][0], None)
+            for part_path in (upload or {}).get("parts", {}).values():
+                if os.path.exists(part_path):
+                    os.remove(part_path)
+            return self.respond("oss", 204)
+        if self.command == "DELETE":
+            if os.path.exists(object_path):
+                os.remove(object_path)
+            return self.respond("oss", 204)
+        if self.command in ("GET", "HEAD"):
+            if not os.path.exists(object_path):
+                return self.oss_error(404, "NoSuchKey", "The specified key does not exist.")
+            size = os.path.getsize(object_path)
+            headers = {"ETag": f'"{self.file_etag(object_path)}"'}
+            if self.command == "HEAD" or "objectMeta" in query:
+                headers["Content-Length"] = str(size)
+                self.send_response(200)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                return None
+            with open(object_path, "rb") as f:
+                return self.respond("oss", 200, f.read(), content_type="application/octet-stream",
+                                    headers=headers)
+        return self.oss_error(405, "MethodNotAllowed", "The specified method is not allowed.")
+
+    @staticmethod
+    def file_etag(path):
+        stat = os.stat(path)
+        return hashlib.md5(f"{path}:{stat.st_size}:{stat.st_mtime_ns}".encode("utf-8")).hexdigest().upper()
+
+    def oss_copy_object(self, object_path):
+        source_bucket, _, source_key = unquote(self.headers["x-oss-copy-source"]).lstrip("/").partition("/")
+        source_path = self.cloud.object_path(source_bucket, source_key.split("?")[0])
+        if not os.path.exists(source_path):
+            return self.oss_error(404, "NoSuchKey", "The specified key does not exist.")
+        temp_path = f"{object_path}.{uuid.uuid4().hex}.tmp"
+        shutil.copyfile(source_path, temp_path)
+        os.replace(temp_path, object_path)
+        etag = self.file_etag(object_path)
+        return self.respond("oss", 200, (
+            '<?xml version="1.0" encoding="UTF-8"?>\n<CopyObjectResult>'
+            f'<LastModified>{time.strftime("%Y-%m-%dT%H:%M:%S.000Z", time.gmtime())}</LastModified>'
+            f'<ETag>"{etag}"</ETag></CopyObjectResult>'), content_type="application/xml",
+            headers={"ETag": f'"{etag}"'})
+
+    def oss_upload_part(self, query, temp_path):
+        upload_id = query["uploadId"][0]
+        part_number = int(query["partNumber"][0])
+        with self.cloud.lock:
+            upload = self.cloud.uploads.get(upload_id)
+        if upload is None:
+            if temp_path:
+                os.remove(temp_path)
+            return self.oss_error(404, "NoSuchUpload", "The specified upload does not exist.")
+        part_path = os.path.join(self.cloud.storage, "parts", f"{upload_id}_{part_number}")
+
+        copy_source = self.headers.get("x-oss-copy-source")
+        if copy_source:
+            source_bucket, _, source_key = unquote(copy_source).lstrip("/").partition("/")
+            source_path = self.cloud.object_path(source_bucket, source_key.split("?")[0])
+            if not os.path.exists(source_path):
+                return self.oss_error(404, "NoSuchKey", "The specified key does not exist.")
+            start, end = 0, os.path.getsize(source_path) - 1
+            match = re.match(r"bytes=(\d+)-(\d+)", self.headers.get("x-oss-copy-source-range", ""))
+            if match:
+                start, end = int(match.group(1)), int(match.group(2))
+            with open(source_path, "rb") as source, open(part_path, "wb") as target:
+                source.seek(start)
+                target.write(source.read(end - start + 1))
+        else:
+            os.replace(temp_path, part_path)
+
+        with self.cloud.lock:
+            upload["parts"][part_number] = part_path
+        etag = self.file_etag(part_path)
+        if copy_source:
+            return self.respond("oss", 200, (
+                '<?xml version="1.0" encoding="UTF-8"?>\n<CopyPartResult>'
+                f'<LastModified>{time.strftime("%Y-%m-%dT%H:%M:%S.000Z", time.gmtime())}</LastModified>'
+                f'<ETag>"{etag}"</ETag></CopyPartResult>'), content_type="application/xml",
+                headers={"ETag": f'"{etag}"'})
+        return self.respond("oss", 200, headers={"ETag": f'"{etag}"'})
+
+    def oss_list_parts(self, bucket, key, upload_id):
+        with self.cloud.lock:
+            upload = self.cloud.uploads.get(upload_id)
+            parts = sorted((upload or {}).get("parts", {}).items())
+        if upload is None:
+            return self.oss_error(404, "NoSuchUpload", "The specified upload does not exist.")
+        last_modified = time.strftime("%Y-%m-%dT%H:%M:%S.000Z", time.gmtime())
+        entries = "".join(
+            f'<Part><PartNumber>{number}</PartNumber><LastModified>{last_modified}</LastModified>'
+            f'<ETag>"{self.file_etag(path)}"</ETag><Size>{os.path.getsize(path)}</Size></Part>'
+            for number, path in parts
+        )
+        return self.respond("oss", 200, (
+            '<?xml version="1.0" encoding="UTF-8"?>\n<ListPartsResult>'
+            f'<Bucket>{bucket}</Bucket><Key>{key}</Key><UploadId>{upload_id}</UploadId>'
+            f'<PartNumberMarker>0</PartNumberMarker><NextPartNumberMarker>{parts[-1][0] if parts else 0}'
+            f'</NextPartNumberMarker><MaxParts>1000</MaxParts><IsTruncated>false</IsTruncated>{entries}'
+            '</ListPartsResult>'), content_type="application/xml")
+
+    def oss_complete_upload(self, bucket, key, upload_id, body):
+        with self.cloud.lock:
+            upload = self.cloud.uploads.pop(upload_id, None)
+        if upload is None:
+            return self.oss_error(404, "NoSuchUpload", "The specified upload does not exist.")
+        part_numbers = [int(number) for number in re.findall(rb"<PartNumber>(\d+)</PartNumber>", body or b"")]
+        part_numbers = part_numbers or sorted(upload["parts"])
+        temp_path = f"{upload['path']}.{upload_id}.tmp"
+        with open(temp_path, "wb") as target:
+            for part_number in part_numbers:
+                part_path = upload["parts"][part_number]
+                with open(part_path, "rb") as part:
+                    shutil.copyfileobj(part, target, 1024 * 1024)
+        for part_path in upload["parts"].values():
+            os.remove(part_path)
+        os.replace(temp_path, upload["path"])
+        etag = self.file_etag(upload["path"])
+        return self.respond("oss", 200, (
+            '<?xml version="1.0" encoding="UTF-8"?>\n<CompleteMultipartUploadResult>'
+            f'<Location>{self.base_url}/{bucket}/{key}</Location><Bucket>{bucket}</Bucket><Key>{key}</Key>'
+            f'<ETag>"{etag}"</ETag></CompleteMultipartUploadResult>'), content_type="application/xml",
+            headers={"ETag": f'"{etag}"'})
+
+    # ---------- DashScope HTTP ----------
+
+    def handle_dashscope(self, path):
+        body = self.read_body() if self.command == "POST" else b""
+        if path == "/services/audio/asr/transcription" or path.startswith("/tasks/"):
+            service = "transcription"
+        elif path == "/services/audio/tts/customization":
+            service = "enrollment"
+        else:
+            return self.dashscope_error(None, 404, "NotFound", f"Unknown path {path}")
+        self.cloud.stats.add(service, bytes_in=len(body))
+        if self.begin(service):
+            return self.dashscope_error(service)
+
+        request_id = uuid.uuid4().hex
+        payload = json.loads(body or b"{}")
+        if service == "transcription" and self.command == "POST":
+            file_urls = payload.get("input", {}).get("file_urls", [])
+            task_id = self.cloud.create_task(file_urls, self.base_url)
+            return self.respond(service, 200, {"request_id": request_id,
+                                               "output": {"task_id": task_id, "task_status": "PENDING"}})
+        if service == "transcription":
+            output = self.cloud.task_status(path.rsplit("/", 1)[-1])
+            if output is None:
+                return self.dashscope_error(service, 404, "InvalidParameter", "task not found")
+            return self.respond(service, 200, {"request_id": request_id, "output": output})
+
+        return self.handle_enrollment(payload.get("input", {}), request_id)
+
+    def handle_transcription_result(self, name):
+        self.cloud.stats.add("transcription", requests=1)
+        path = os.path.join(self.cloud.storage, "objects", name)
+        if not os.path.exists(path):
+            return self.respond("transcription", 404, {"code": "NotFound"})
+        with open(path, "rb") as f:
+            return self.respond("transcription", 200, f.read())
+
+    def handle_enrollment(self, request_input, request_id):
+        action = request_input.get("action")
+        voice_id = request_input.get("voice_id")
+        if action == "create_voice":
+            # 与 DashScope 一致：prefix 只能包含小写字母和数字，且少于 10 个字符
+            if not re.fullmatch(r"[a-z0-9]{1,9}", str(request_input.get("prefix") or "")):
+                return self.dashscope_error("enrollment", 400, "InvalidParameter",
+                                            f"Invalid prefix {request_input.get('prefix')!r}")
+            voice_id = f"{request_input.get('target_model')}-{request_input.get('prefix')}-{uuid.uuid4().hex[:12]}"
+            with self.cloud.lock:
+                self.cloud.voices[voice_id] = {"voice_id": voice_id, "status": "OK",
+                                               "target_model": request_input.get("target_model"),
+                                               "resource_link": request_input.get("url")}
+            output = {"voice_id": voice_id}
+        elif action == "query_voice":
+            with self.cloud.lock:
+                voice = self.cloud.voices.get(voice_id)
+            if voice is None:
+                return self.dashscope_error("enrollment", 400, "InvalidParameter", f"voice {voice_id} not found")
+            output = dict(voice)
+        elif action == "delete_voice":
+            with self.cloud.lock:
+                self.cloud.voices.pop(voice_id, None)
+            output = {}
+        elif action == "list_voice":
+            with self.cloud.lock:
+                output = {"voice_list": list(self.cloud.voices.values())}
+        else:
+            return self.dashscope_error("enrollment", 400, "InvalidParameter", f"unknown action {action}")
+        return self.respond("enrollment", 200, {"request_id": request_id, "output": output, "usage": {}})
+
+    # ---------- DashScope WebSocket（流式合成） ----------
+
+    def handle_synthesis(self):
+        key = self.headers.get("Sec-WebSocket-Key")
+        if self.headers.get("Upgrade", "").lower() != "websocket" or not key:
+            return self.dashscope_error(None, 400, "InvalidParameter", "WebSocket upgrade required")
+        accept = base64.b64encode(hashlib.sha1((key + WEBSOCKET_GUID).encode("ascii")).digest()).decode("ascii")
+        self.send_response(101, "Switching Protocols")
+        self.send_header("Upgrade", "websocket")
+        self.send_header("Connection", "Upgrade")
+        self.send_header("Sec-WebSocket-Accept", accept)
+        self.end_headers()
+        self.close_connection = True
+
+        task_id = None
+        text = []
+        try:
+            while True:
+                opcode, payload = self.ws_read()
+                if opcode == 0x8:
+                    self.ws_send(0x8, payload[:2])
+                    return
+                if opcode == 0x9:
+                    self.ws_send(0xA, payload)
+                    continue
+                if opcode != 0x1:
+                    continue
+                message = json.loads(payload)
+                header = message.get("header", {})
+                action = header.get("action")
+                task_id = header.get("task_id", task_id)
+                if action == "run-task":
+                    if self.begin("synthesis"):
+                        self.ws_event(task_id, "task-failed", error_code="Throttling.RateQuota",
+                                      error_message="Requests rate limit exceeded, please try again later.")
+                        return
+                    self.ws_event(task_id, "task-started")
+                elif action == "continue-task":
+                    text.append(message.get("payload", {}).get("input", {}).get("text", ""))
+                elif action == "finish-task":
+                    self.stream_audio("".join(text), task_id)
+                    self.ws_event(task_id, "task-finished", usage={"characters": len("".join(text))})
+        except (ConnectionError, OSError, ValueError):
+            return
+
+    def stream_audio(self, text, task_id):
+        """
+        按合成速度分块发送 PCM 数据（每块 0.1 秒音频）。
+        """
+        pcm = self.cloud.synthesize_pcm(text)
+        chunk_bytes = SYNTHESIS_SAMPLE_RATE // 10 * 2
+        pace = 0.1 / self.cloud.synthesis_speed if self.cloud.synthesis_speed > 0 else 0
+        for start in range(0, len(pcm), chunk_bytes):
+            self.ws_send(0x2, pcm[start:start + chunk_bytes])
+            self.cloud.stats.add("synthesis", bytes_out=min(chunk_bytes, len(pcm) - start))
+            if pace:
+                time.sleep(pace)
+        self.ws_event(task_id, "result-generated")
+
+    def ws_event(self, task_id, event, usage=None, **fields):
+        self.ws_send(0x1, json.dumps({
+            "header": dict({"task_id": task_id, "event": event}, **fields),
+            "payload": {"output": {}, "usage": usage},
+        }).encode("utf-8"))
+
+    def ws_read(self):
+        """
+        读取一个（客户端带掩码的）WebSocket 帧，返回 (opcode, payload)。
+        """
+        header = self.rfile.read(2)
+        if len(header) < 2:
+            raise ConnectionError("WebSocket closed")
+        opcode = header[0] & 0x0F
+        masked = header[1] & 0x80
+        length = header[1] & 0x7F
+        if length == 126:
+            length = struct.unpack("!H", self.rfile.read(2))[0]
+        elif length == 127:
+            length = struct.unpack("!Q", self.rfile.read(8))[0]
+        mask = self.rfile.read(4) if masked else b""
+        payload = self.rfile.read(length)
+        if masked:
+            payload = (np.frombuffer(payload, dtype=np.uint8)
+                       ^ np.resize(np.frombuffer(mask, dtype=np.uint8), length)).tobytes()
+        self.cloud.stats.add("synthesis", bytes_in=length)
+        return opcode, payload
+
+    def ws_send(self, opcode, payload):
+        length = len(payload)
+        if length < 126:
+            header = struct.pack("!BB", 0x80 | opcode, length)
+        elif length < 1 << 16:
+            header = struct.pack("!BBH", 0x80 | opcode, 126, length)
+        else:
+            header = struct.pack("!BBQ", 0x80 | opcode, 127, length)
+        self.wfile.write(header + payload)
+        self.wfile.flush()
+
+
+def parse_profile(text, profiles):
+    """
+    解析 --profile 参数，例如 "synthesis:latency_ms=200,jitter_ms=50,error_rate=0.02"。
+    """
+    service, _, assignments = text.partition(":")
+    if service not in profiles:
+        raise argparse.ArgumentTypeError(f"Unknown service {service!r}, expected one of {', '.join(SERVICES)}")
+    for assignment in filter(None, assignments.split(",")):
+        name, _, value = assignment.partition("=")
+        if name not in ("latency_ms", "jitter_ms", "error_rate"):
+            raise argparse.ArgumentTypeError(f"Unknown profile field {name!r}")
+        setattr(profiles[service], name, float(value))
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=0, help="0 表示自动选择空闲端口")
+    parser.add_argument("--storage", default=None, help="对象数据目录，默认使用临时目录")
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="所有服务的默认延迟")
+    parser.add_argument("--jitter-ms", type=float, default=10.0, help="所有服务的默认抖动")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="所有服务的默认错误率")
+    parser.add_argument("--profile", action="append", default=[],
+                        help="按服务覆盖故障配置，例如 synthesis:latency_ms=200,error_rate=0.02")
+    parser.add_argument("--sentence-seconds", type=float, default=4.0, help="识别结果中每句的时长（含停顿）")
+    parser.add_argument("--transcription-speed", type=float, default=50.0, help="识别速度（音频秒数/秒）")
+    parser.add_argument("--synthesis-speed", type=float, default=20.0, help="合成速度（音频秒数/秒）")
+    parser.add_argument("--seed", type=int, default=0)
+    return parser
+
+
+def serve(args):
+    """
+    启动替身服务并阻塞运行；启动后在标准输出打印一行 JSON，包含实际监听的地址。
+    """
+    rng = random.Random(args.seed)
+    profiles = {service: FaultProfile(args.latency_ms, args.jitter_ms, args.error_rate,
+                                      rng=random.Random(rng.random())) for service in SERVICES}
+    for text in args.profile:
+        parse_profile(text, profiles)
+
+    storage = args.storage or tempfile.mkdtemp(prefix="fake_cloud_")
+    cloud = FakeCloud(storage, profiles, sentence_seconds=args.sentence_seconds,
+                      transcription_speed=args.transcription_speed, synthesis_speed=args.synthesis_speed)
+    handler = type("Handler", (FakeCloudHandler,), {"cloud": cloud})
+    server = ThreadingHTTPServer((args.host, args.port), handler)
+    server.daemon_threads = True
+    host, port = server.server_address[:2]
+    print(json.dumps({"host": host, "port": port, "storage": storage}), flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if args.storage is None:
+            shutil.rmtree(storage, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    serve(build_parser().parse_args())
@@ -1,5 +1,73 @@
 let fileInfo = {};
 let currentSentenceId = null;
+let jobId = null; // 当前任务 ID，由 /upload 返回，后续所有请求都需携带
+
+// Socket.IO 连接，用于接收后台阶段的实时进度
+const socket = typeof io !== "undefined" ? io() : null;
+const progressHandlers = {};
+
+if (socket) {
+    socket.on("progress", (event) => {
+        const handler = progressHandlers[event.stage];
+        if (handler) handler(event);
+    });
+}
+
+/**
+ * 将进度事件格式化为提示文本
+ * @param {Object} progress - 进度事件（completed / total / throughput / eta_seconds）
+ */
+function formatProgress(progress) {
+    if (!progress || progress.total === null || progress.total === undefined) return "";
+    let text = `${progress.completed}/${progress.total}`;
+    if (progress.throughput) text += `, ${progress.throughput} items/s`;
+    if (progress.eta_seconds !== null && progress.eta_seconds !== undefined) text += `, ETA ${progress.eta_seconds}s`;
+    return ` (${text})`;
+}
+
+/**
+ * 提交后台阶段并等待其完成：通过 Socket.IO 显示实时进度，同时轮询状态接口作为兜底
+ * @param {string} stage - 阶段名称，同时也是接口路径
+ * @param {HTMLElement} preElement - 显示进度的元素
+ * @param {string} message - 加载提示
+ * @param {Object} payload - 请求体
+ * @return {Object} 阶段结果；失败时返回 { error }
+ */
+async function runStage(stage, preElement, message, payload = {}) {
+    const response = await postJson(`/${stage}`, payload);
+    const submitted = await response.json();
+    if (response.status !== 202) return submitted;
+
+    const showProgress = (progress) => addLoadingSpinner(preElement, `${message}${formatProgress(progress)}`);
+    progressHandlers[stage] = showProgress;
+
+    try {
+        while (true) {
+            await new Promise((resolve) => setTimeout(resolve, 1000));
+            const statusResponse = await fetch(submitted.status_url);
+            const state = (await statusResponse.json()).stages[stage];
+            if (!state) continue;
+            if (state.status === "completed") return state.result;
+            if (state.status === "failed" || state.status === "interrupted") return { error: state.error };
+            if (!socket || !socket.connected) showProgress(state.progress);
+        }
+    } finally {
+        delete progressHandlers[stage];
+    }
+}
+
+/**
+ * 以 JSON 形式 POST 请求，并自动附带当前任务 ID
+ * @param {string} url - 请求地址
+ * @param {Object} payload - 请求体
+ */
+function postJson(url, payload = {}) {
+    return fetch(url, {
+        method: "POST",
+        headers: { "Content-Type": "application/json" },
+        body: JSON.stringify({ job_id: jobId, ...payload })
+    });
+}
 
 /**
  * 在指定的 pre 元素中插入加载圈
@@ -51,6 +119,8 @@ document.getElementById("uploadForm").onsubmit = async function (event) {
 
     if (result.preprocessed_audio) {
         fileInfo = result;
+        jobId = result.job_id;
+        if (socket) socket.emit("join_job", { job_id: jobId }); // 加入任务房间以接收进度事件
         document.getElementById("recognizeBtn").disabled = false; // 启用识别按钮
         resetSteps("upload");
     }
@@ -86,9 +156,7 @@ document.getElementById("recognizeBtn").onclick = async function () {
     const recognizeResultContent = document.getElementById("recognitionResultContent");
     addLoadingSpinner(recognizeResultContent, "Processing... Please wait.");
 
-    const response = await fetch("/recognize", { method: "POST" });
-
-    const result = await response.json();
+    const result = await runStage("recognize", recognizeResultContent, "Processing... Please wait.");
     const message = JSON.stringify(result, null, 2);
     addSuccessCheckmark(recognizeResultContent, message);
 
@@ -103,8 +171,7 @@ document.getElementById("splitAudioBtn").onclick = async function () {
     const sentencePlaceholder = document.getElementById("sentencePlaceholder");
     addLoadingSpinner(sentencePlaceholder, "Splitting audio... Please wait.");
 
-    const response = await fetch("/split_audio", { method: "POST" });
-    const result = await response.json();
+    const result = await runStage("split_audio", sentencePlaceholder, "Splitting audio... Please wait.");
 
     if (result.sentence_audio_info) {
         document.getElementById("sentenceList").innerHTML = "<h3>Sentences and Audio:</h3>";
@@ -139,11 +206,7 @@ document.getElementById("submitEditsBtn").onclick = async function () {
     resultMessage.style.display = "block";
     addLoadingSpinner(resultMessage, "Submitting edits... Please wait.");
 
-    const response = await fetch("/update_transcription", {
-        method: "POST",
-        headers: { "Content-Type": "application/json" },
-        body: JSON.stringify({ updated_sentences: updatedSentences })
-    });
+    const response = await postJson("/update_transcription", { updated_sentences: updatedSentences });
 
     const result = await response.json();
     const message = result.message || `Error: ${result.error}`;
@@ -155,10 +218,12 @@ document.getElementById("referenceForm").onsubmit = async function (event) {
     event.preventDefault();
 
     const formData = new FormData(this);
+    formData.append("job_id", jobId);
     const referenceResultContent = document.getElementById("referenceResultContent");
     addLoadingSpinner(referenceResultContent, "Uploading reference... Please wait.");
 
-    const response = await fetch("/upload_reference", {
+    // job_id 放在查询参数中，服务端可在接收文件之前校验任务
+    const response = await fetch(`/upload_reference?job_id=${encodeURIComponent(jobId)}`, {
         method: "POST",
         body: formData
     });
@@ -204,8 +269,8 @@ document.getElementById("cloneVoiceBtn").onclick = async function () {
     const clonedAudioResultContent = document.getElementById("clonedAudioResultContent");
     addLoadingSpinner(clonedAudioResultContent, "Generating cloned audio... Please wait.");
 
-    const response = await fetch("/generate_cloned_audio", { method: "POST" });
-    const result = await response.json();
+    const result = await runStage("generate_cloned_audio", clonedAudioResultContent,
+        "Generating cloned audio... Please wait.");
 
     if (result.cloned_audio_info) {
         renderClonedAudio(result.cloned_audio_info); // 调用渲染方法
@@ -263,11 +328,7 @@ document.getElementById("confirmRegenerate").onclick = async function () {
     const clonedAudioResultContent = document.getElementById("clonedAudioResultContent");
     addLoadingSpinner(clonedAudioResultContent, `Regenerating sentence ${currentSentenceId}...`);
 
-    const response = await fetch("/regenerate_cloned_audio", {
-        method: "POST",
-        headers: { "Content-Type": "application/json" },
-        body: JSON.stringify({ sentence_id: currentSentenceId, text: newText })
-    });
+    const response = await postJson("/regenerate_cloned_audio", { sentence_id: currentSentenceId, text: newText });
 
     const result = await response.json();
 
@@ -292,7 +353,7 @@ document.getElementById("mergeAudioBtn").onclick = async function () {
     const mergedAudioMessage = document.getElementById("mergedAudioMessage");
     addLoadingSpinner(mergedAudioMessage, "Merging cloned audio... Please wait.");
 
-    const response = await fetch("/merge_cloned_audio", { method: "POST" });
+    const response = await postJson("/merge_cloned_audio");
     const result = await response.json();
 
     if (result.merged_audio) {
@@ -314,7 +375,7 @@ document.getElementById("generateSubtitleBtn").onclick = async function () {
     const subtitleResultContent = document.getElementById("subtitleResultContent")
     addLoadingSpinner(subtitleResultContent, "Generating subtitles... Please wait.")
 
-    const response = await fetch("/generate_srt", { method: "POST" });
+    const response = await postJson("/generate_srt");
     const result = await response.json();
 
     if (result.generated_srt) {
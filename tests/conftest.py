@@ -0,0 +1,53 @@
+"""
+测试共用的夹具：在后台线程中启动本地云服务替身（benchmarks/fake_services.py），不访问外网。
+"""
+import os
+import sys
+import threading
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.fake_services import SERVICES, FakeCloud, FakeCloudHandler, FaultProfile  # noqa: E402
+
+
+@pytest.fixture
+def fake_cloud(tmp_path):
+    """
+    启动一个无延迟、无故障注入的云服务替身。
+    :return: (FakeCloud, base_url)；可修改 cloud.profiles 注入延迟或错误
+    """
+    cloud = FakeCloud(str(tmp_path / "fake_cloud"), {service: FaultProfile() for service in SERVICES})
+    handler = type("Handler", (FakeCloudHandler,), {"cloud": cloud})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    host, port = server.server_address[:2]
+    try:
+        yield cloud, f"http://{host}:{port}"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture
+def fake_oss(fake_cloud, tmp_path, monkeypatch):
+    """
+    让 utils.oss_utils 指向云服务替身：重置共享 Bucket，上传索引和断点续传记录写入临时目录。
+    :return: (oss_utils 模块, FakeCloud)
+    """
+    from utils import oss_utils
+
+    cloud, base_url = fake_cloud
+    monkeypatch.setenv("OSS_ACCESS_KEY_ID", "test")
+    monkeypatch.setenv("OSS_ACCESS_KEY_SECRET", "test")
+    monkeypatch.setattr(oss_utils, "OSS_ENDPOINT", base_url)
+    monkeypatch.setattr(oss_utils, "CACHE_FOLDER", str(tmp_path / "cache"))
+    monkeypatch.setattr(oss_utils, "OSS_UPLOAD_INDEX_FOLDER", str(tmp_path / "cache" / "oss_index"))
+    monkeypatch.setattr(oss_utils, "_bucket", None)
+    yield oss_utils, cloud
+    monkeypatch.setattr(oss_utils, "_bucket", None)
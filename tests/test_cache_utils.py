@@ -0,0 +1,88 @@
+"""
+utils.cache_utils 的测试：DiskLRUCache 的命中复制、淘汰与并发写入，以及缓存的延迟加载。
+"""
+import os
+import threading
+
+from utils.cache_utils import DiskLRUCache, VoiceCache
+
+
+def test_copy_to_copies_hits_and_reports_misses(tmp_path):
+    cache = DiskLRUCache(str(tmp_path / "cache"), suffix=".wav")
+    cache.put_bytes("a" * 64, b"cached audio")
+    destination = str(tmp_path / "out.wav")
+
+    assert cache.copy_to("a" * 64, destination)
+    with open(destination, "rb") as f:
+        assert f.read() == b"cached audio"
+    assert not cache.copy_to("b" * 64, str(tmp_path / "missing.wav"))
+    assert not os.path.exists(tmp_path / "missing.wav")
+
+
+def test_copy_to_treats_a_deleted_file_as_a_miss(tmp_path):
+    cache = DiskLRUCache(str(tmp_path / "cache"))
+    os.remove(cache.put_bytes("a" * 64, b"data"))
+
+    assert not cache.copy_to("a" * 64, str(tmp_path / "out"))
+    assert cache.total_bytes == 0
+
+
+def test_copy_to_never_fails_while_other_threads_evict(tmp_path):
+    # 容量只够两个条目，写线程不断触发淘汰
+    cache = DiskLRUCache(str(tmp_path / "cache"), max_bytes=2 * 1024)
+    payload = b"x" * 1024
+    keys = [f"{index:064x}" for index in range(20)]
+    errors = []
+    stop = threading.Event()
+
+    def writer():
+        while not stop.is_set():
+            for key in keys:
+                cache.put_bytes(key, payload)
+
+    def reader(index):
+        destination = str(tmp_path / f"out_{index}")
+        try:
+            for _ in range(200):
+                for key in keys:
+                    if cache.copy_to(key, destination):
+                        with open(destination, "rb") as f:
+                            assert f.read() == payload
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=writer) for _ in range(2)]
+    readers = [threading.Thread(target=reader, args=(index,)) for index in range(4)]
+    for thread in threads + readers:
+        thread.start()
+    for thread in readers:
+        thread.join()
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+
+
+def test_cache_folder_is_scanned_on_first_use(tmp_path):
+    folder = tmp_path / "cache"
+    DiskLRUCache(str(folder)).put_bytes("a" * 64, b"data")
+
+    cache = DiskLRUCache(str(folder))
+    assert cache._loaded_index is None
+    assert cache.load() == 1
+    assert cache.copy_to("a" * 64, str(tmp_path / "out"))
+
+
+def test_voice_cache_file_is_read_on_first_use(tmp_path, monkeypatch):
+    path = str(tmp_path / "voice_cache.json")
+    VoiceCache(path=path).put("model:hash", "voice-1")
+    reads = []
+    load = VoiceCache._load
+    monkeypatch.setattr(VoiceCache, "_load", lambda self: reads.append(self.path) or load(self))
+
+    cache = VoiceCache(path=path)
+    assert reads == []
+    assert cache.get("model:hash") == "voice-1"
+    assert cache.load() == 1
+    assert reads == [path]
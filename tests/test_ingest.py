@@ -0,0 +1,103 @@
+"""
+utils.ingest.ingest_multipart 针对本地 OSS 替身的测试：单次读取写盘、计算摘要并上传，出错时清理已接收的文件。
+"""
+import hashlib
+import io
+import os
+
+import pytest
+
+from utils.ingest import DuplicateFileFieldError, UploadTooLargeError, ingest_multipart
+
+BOUNDARY = "test-boundary"
+
+
+def multipart_body(parts):
+    """
+    构造 multipart/form-data 请求体；parts 为 (字段名, 文件名或 None, 字节串) 列表。
+    """
+    body = b""
+    for name, filename, data in parts:
+        disposition = f'form-data; name="{name}"'
+        if filename:
+            disposition += f'; filename="{filename}"'
+        body += f"--{BOUNDARY}\r\nContent-Disposition: {disposition}\r\n\r\n".encode("latin-1") + data + b"\r\n"
+    return body + f"--{BOUNDARY}--\r\n".encode("latin-1")
+
+
+def stored_objects(cloud):
+    return sorted(os.listdir(os.path.join(cloud.storage, "objects")))
+
+
+def test_files_are_staged_hashed_and_uploaded(fake_oss, tmp_path):
+    oss_utils, cloud = fake_oss
+    audio = os.urandom(300 * 1024)
+    reference = os.urandom(10 * 1024)
+    body = multipart_body([("preprocess_mode", None, b"streaming"), ("file", "input.wav", audio),
+                           ("reference", "voice.wav", reference)])
+
+    fields, files = ingest_multipart(io.BytesIO(body), BOUNDARY, str(tmp_path), oss_fields=("file",),
+                                     chunk_size=64 * 1024)
+
+    assert fields == {"preprocess_mode": "streaming"}
+    assert files["file"]["sha256"] == hashlib.sha256(audio).hexdigest()
+    with open(files["file"]["local_url"], "rb") as f:
+        assert f.read() == audio
+    assert files["file"]["oss_url"].endswith(f"audio/{files['file']['sha256']}.wav")
+    key = oss_utils.object_key_from_url(files["file"]["oss_url"])
+    assert oss_utils.get_bucket().get_object(key).read() == audio
+    assert files["reference"]["oss_url"] is None
+
+
+def test_failure_after_a_finished_file_removes_it_locally_and_in_oss(fake_oss, tmp_path, monkeypatch):
+    oss_utils, cloud = fake_oss
+    monkeypatch.setattr("utils.ingest.INGEST_MAX_FIELD_BYTES", 1024)
+    staging = tmp_path / "staging"
+    staging.mkdir()
+    audio = os.urandom(200 * 1024)
+    # 文件之后的普通字段超过大小限制
+    body = multipart_body([("file", "input.wav", audio), ("notes", None, b"x" * 4096)])
+
+    with pytest.raises(UploadTooLargeError):
+        ingest_multipart(io.BytesIO(body), BOUNDARY, str(staging), oss_fields=("file",), chunk_size=64 * 1024)
+
+    assert os.listdir(staging) == []
+    assert stored_objects(cloud) == []
+    assert not oss_utils._object_uploaded(oss_utils.get_bucket(),
+                                          f"audio/{hashlib.sha256(audio).hexdigest()}.wav")
+
+
+def test_failure_keeps_objects_that_already_existed(fake_oss, tmp_path, monkeypatch):
+    oss_utils, cloud = fake_oss
+    monkeypatch.setattr("utils.ingest.INGEST_MAX_FIELD_BYTES", 1024)
+    audio = os.urandom(20 * 1024)
+    existing = tmp_path / "existing.wav"
+    existing.write_bytes(audio)
+    url = oss_utils.upload_to_oss(str(existing))
+    staging = tmp_path / "staging"
+    staging.mkdir()
+    body = multipart_body([("file", "input.wav", audio), ("notes", None, b"x" * 4096)])
+
+    with pytest.raises(UploadTooLargeError):
+        ingest_multipart(io.BytesIO(body), BOUNDARY, str(staging), oss_fields=("file",))
+
+    assert os.listdir(staging) == []
+    # 去重命中的已有对象属于其他上传，不能删除
+    assert oss_utils.get_bucket().get_object(oss_utils.object_key_from_url(url)).read() == audio
+
+
+def test_duplicate_file_field_is_rejected_and_cleaned_up(fake_oss, tmp_path):
+    oss_utils, cloud = fake_oss
+    staging = tmp_path / "staging"
+    staging.mkdir()
+    first = os.urandom(100 * 1024)
+    second = os.urandom(100 * 1024)
+    body = multipart_body([("file", "first.wav", first), ("file", "second.wav", second)])
+
+    with pytest.raises(DuplicateFileFieldError) as excinfo:
+        ingest_multipart(io.BytesIO(body), BOUNDARY, str(staging), oss_fields=("file",), chunk_size=64 * 1024)
+
+    assert excinfo.value.field == "file"
+    # 第一个文件的暂存文件和 OSS 对象都已删除，第二个文件没有开始接收
+    assert os.listdir(staging) == []
+    assert stored_objects(cloud) == []
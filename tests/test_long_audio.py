@@ -0,0 +1,79 @@
+"""
+utils.long_audio.recognize_long_audio 的测试：分段识别与拼接结果按整段音频内容缓存。
+"""
+import numpy as np
+import pytest
+import soundfile as sf
+
+from utils import long_audio, transcription
+from utils.cache_utils import DiskLRUCache
+
+SAMPLE_RATE = 8000
+
+
+def write_speech_like(path, seconds=30, pause_every=4):
+    """
+    写入一段“语音 + 静音”交替的音频：每 pause_every 秒末尾有 0.5 秒静音。
+    """
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    audio = 0.3 * np.sin(2 * np.pi * 220 * t)
+    audio[(t % pause_every) > pause_every - 0.5] = 0
+    sf.write(path, audio.astype("float32"), SAMPLE_RATE)
+
+
+@pytest.fixture
+def fake_backends(tmp_path, monkeypatch):
+    """
+    替换上传和批量识别，记录调用次数；识别结果缓存写入临时目录。
+    """
+    calls = {"uploads": 0, "transcriptions": 0}
+
+    def upload_many(file_paths):
+        calls["uploads"] += 1
+        return [{"local_url": path, "oss_url": f"http://oss/{index}.wav"} for index, path in enumerate(file_paths)]
+
+    def recognize_batch(audio_urls, audio_paths=None):
+        calls["transcriptions"] += 1
+        return [{
+            "file_url": url,
+            "transcripts": [{"channel_id": 0, "text": "句子", "sentences": [
+                {"sentence_id": 1, "begin_time": 0, "end_time": 1000, "text": "句子"}
+            ]}],
+        } for url in audio_urls]
+
+    monkeypatch.setattr(long_audio, "upload_many_to_oss", upload_many)
+    monkeypatch.setattr(long_audio, "recognize_audio_batch", recognize_batch)
+    monkeypatch.setattr(transcription, "transcription_cache", DiskLRUCache(str(tmp_path / "transcription"),
+                                                                           suffix=".json"))
+    return calls
+
+
+def test_stitched_result_is_cached_under_the_whole_file(fake_backends, tmp_path):
+    audio_file = str(tmp_path / "long.wav")
+    write_speech_like(audio_file)
+
+    first = long_audio.recognize_long_audio(audio_file, str(tmp_path / "chunks"), audio_url="http://oss/long.wav",
+                                            chunk_seconds=10, search_seconds=3)
+
+    assert "error" not in first
+    assert len(first["transcripts"][0]["sentences"]) > 1
+    assert transcription.get_cached_transcription(audio_file) == first
+
+    second = long_audio.recognize_long_audio(audio_file, str(tmp_path / "chunks"), audio_url="http://oss/long.wav",
+                                             chunk_seconds=10, search_seconds=3)
+
+    assert second == first
+    assert fake_backends == {"uploads": 1, "transcriptions": 1}
+
+
+def test_failed_recognition_is_not_cached(fake_backends, tmp_path, monkeypatch):
+    audio_file = str(tmp_path / "long.wav")
+    write_speech_like(audio_file)
+    monkeypatch.setattr(long_audio, "recognize_audio_batch",
+                        lambda audio_urls, audio_paths=None: [{"error": "boom"} for _ in audio_urls])
+
+    result = long_audio.recognize_long_audio(audio_file, str(tmp_path / "chunks"), chunk_seconds=10,
+                                             search_seconds=3)
+
+    assert "boom" in result["error"]
+    assert transcription.get_cached_transcription(audio_file) is None
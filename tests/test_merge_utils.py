@@ -0,0 +1,142 @@
+"""
+utils.merge_utils 合并引擎的一致性测试：用合成的 WAV 片段对比 NumPy 缓冲区合并、流式合并
+与原始 AudioSegment 逐句拼接（merge_cloned_audio_pydub）的时间槽起点、增益和总时长。
+"""
+import json
+
+import numpy as np
+import pytest
+import soundfile as sf
+
+from utils.audio_utils import merge_cloned_audio_pydub
+from utils.merge_utils import merge_clips_streaming, merge_clips_to_buffer, ms_to_samples, slot_index_path
+
+SAMPLE_RATE = 11025
+
+# (begin_time, end_time, 片段时长) 毫秒，全部取 40 毫秒的整数倍：AudioSegment.silent 默认 11025Hz，
+# 40 毫秒恰好是整数个采样点，原始实现补的静音没有取整误差
+SLOTS = [
+    (0, 400, 400),  # 与时间槽等长
+    (400, 1000, 360),  # 短于时间槽，补静音；与上一句首尾相接
+    (1400, 2000, 600),  # 前面有 400 毫秒空白
+    (2200, 2600, 520),  # 长于时间槽，需要加速
+    (3000, 3800, 800),
+]
+
+
+def write_clip(path, duration_ms, frequency, amplitude):
+    """
+    写入一段余弦波（第一个采样点即为峰值，便于定位片段起点）。
+    """
+    t = np.arange(ms_to_samples(duration_ms, SAMPLE_RATE)) / SAMPLE_RATE
+    samples = amplitude * np.cos(2 * np.pi * frequency * t)
+    sf.write(path, samples.astype("float32"), SAMPLE_RATE, subtype="PCM_16")
+    return sf.read(path, dtype="int16")[0]
+
+
+@pytest.fixture
+def slot_clips(tmp_path):
+    """
+    按 SLOTS 生成单声道 PCM WAV 片段，每个片段的频率和音量不同。
+    :return: (cloned_audio, 各片段写入文件后的 int16 采样点)
+    """
+    cloned_audio, sources = [], []
+    for index, (begin_ms, end_ms, duration_ms) in enumerate(SLOTS):
+        path = str(tmp_path / f"cloned_sentence_{index + 1}.wav")
+        sources.append(write_clip(path, duration_ms, 200 + 70 * index, 0.2 + 0.15 * index))
+        cloned_audio.append({"sentence_id": index + 1, "begin_time": begin_ms, "end_time": end_ms,
+                             "local_url": path})
+    return cloned_audio, sources
+
+
+@pytest.fixture
+def wav_legacy_merge(monkeypatch):
+    """
+    原始实现按 MP3 读取片段（需要 ffmpeg），测试中改为直接读取 WAV，只对比合并逻辑本身。
+    """
+    from pydub import AudioSegment
+
+    monkeypatch.setattr(AudioSegment, "from_mp3", AudioSegment.from_wav)
+    return merge_cloned_audio_pydub
+
+
+def read_pcm(path):
+    samples, sample_rate = sf.read(path, dtype="int16")
+    assert sample_rate == SAMPLE_RATE
+    return samples.astype(np.int32)
+
+
+def slot_ranges(output_file):
+    with open(slot_index_path(output_file), encoding="utf-8") as f:
+        return [(slot["start"], slot["end"]) for slot in json.load(f)["slots"]]
+
+
+def clip_extent(samples, start, end):
+    """
+    [start, end) 范围内片段实际占用的长度（到最后一个非零采样点为止）。
+    """
+    nonzero = np.flatnonzero(samples[start:end])
+    return int(nonzero[-1]) + 1 if len(nonzero) else 0
+
+
+def best_alignment(samples, reference, start):
+    """
+    在 start 前后一个采样点内寻找与 reference 最吻合的位置。
+    :return: (偏移量, 最大差值)
+    """
+    candidates = []
+    for offset in (-1, 0, 1):
+        window = samples[start + offset:start + offset + len(reference)]
+        if len(window) == len(reference):
+            candidates.append((int(np.abs(window - reference).max()), abs(offset), offset))
+    diff, _, offset = min(candidates)
+    return offset, diff
+
+
+def test_buffer_merge_matches_pydub_merge(slot_clips, wav_legacy_merge, tmp_path):
+    cloned_audio, sources = slot_clips
+    legacy = read_pcm(wav_legacy_merge(cloned_audio, str(tmp_path / "merged_pydub.wav")))
+    # 原始实现用 AudioSegment.speedup 压缩超长片段
+    merged = read_pcm(merge_clips_to_buffer(cloned_audio, str(tmp_path / "merged_buffer.wav"), stretcher="speedup"))
+
+    total = ms_to_samples(SLOTS[-1][1], SAMPLE_RATE)
+    assert len(merged) == total
+    assert abs(len(legacy) - total) <= 1
+
+    previous_end = 0
+    for index, ((begin_ms, end_ms, duration_ms), source) in enumerate(zip(SLOTS, sources)):
+        slot_start = ms_to_samples(begin_ms, SAMPLE_RATE)
+        next_start = ms_to_samples(SLOTS[index + 1][0], SAMPLE_RATE) if index + 1 < len(SLOTS) else total
+        # 上一句结束到本句时间槽起点之间是静音，片段之间没有叠加
+        assert not merged[previous_end:slot_start].any()
+
+        if duration_ms <= end_ms - begin_ms:
+            # 放得下的片段原样写入时间槽起点，音量不变：浮点往返最多差 1 个量化级
+            assert np.abs(merged[slot_start:slot_start + len(source)] - source).max() <= 1
+            reference = source
+        else:
+            # 加速后的片段：两边都使用 AudioSegment.speedup，NumPy 引擎多经过两次 int16/浮点转换
+            reference = merged[slot_start:slot_start + clip_extent(merged, slot_start, next_start)]
+            assert len(reference) > ms_to_samples(end_ms, SAMPLE_RATE) - slot_start
+            assert np.abs(reference).max() <= np.abs(source).max() + 1
+
+        # 原始实现按毫秒取整计算补多少静音，片段起点允许相差 1 个采样点
+        offset, diff = best_alignment(legacy, reference, slot_start)
+        assert diff <= (1 if reference is source else 2), f"sentence {index + 1} offset {offset}"
+        previous_end = slot_start + len(reference)
+        assert not merged[previous_end:next_start].any()
+
+
+def test_streaming_merge_is_sample_aligned_with_buffer_merge(slot_clips, tmp_path):
+    cloned_audio, _ = slot_clips
+    for options in ({"stretcher": "speedup"}, {"stretcher": "wsola", "overflow": "trim"}, {}):
+        buffer_file = merge_clips_to_buffer(cloned_audio, str(tmp_path / "merged_buffer.wav"), **options)
+        stream_file = merge_clips_streaming(cloned_audio, str(tmp_path / "merged_stream.wav"), block_seconds=0.1,
+                                            **options)
+
+        assert np.array_equal(read_pcm(stream_file), read_pcm(buffer_file)), options
+        # 两者写出相同的 PCM_16 WAV 文件头，整个文件逐字节一致
+        with open(buffer_file, "rb") as buffer, open(stream_file, "rb") as stream:
+            assert buffer.read() == stream.read()
+        # 增量合并依赖的时间槽索引记录相同的采样点范围
+        assert slot_ranges(stream_file) == slot_ranges(buffer_file)
@@ -0,0 +1,169 @@
+"""
+utils.oss_utils 针对本地 OSS 替身的测试：共享连接池客户端、分片上传阈值切换、批量上传的顺序和逐文件失败、增量上传。
+"""
+import os
+import threading
+
+import oss2
+import pytest
+
+
+def write_file(path, size, seed=0):
+    data = bytes((seed + index * 7) % 251 for index in range(size))
+    with open(path, "wb") as f:
+        f.write(data)
+    return data
+
+
+def read_object(oss_utils, url):
+    return oss_utils.get_bucket().get_object(oss_utils.object_key_from_url(url)).read()
+
+
+@pytest.fixture
+def multipart_spy(monkeypatch):
+    """
+    记录 oss2.resumable_upload 的调用，仍然执行真实的分片上传。
+    """
+    calls = []
+    resumable_upload = oss2.resumable_upload
+
+    def spy(bucket, key, filename, **kwargs):
+        calls.append({"key": key, "filename": filename, **kwargs})
+        return resumable_upload(bucket, key, filename, **kwargs)
+
+    monkeypatch.setattr(oss2, "resumable_upload", spy)
+    return calls
+
+
+def test_get_bucket_is_shared_across_threads(fake_oss):
+    oss_utils, _ = fake_oss
+    buckets = []
+
+    def get():
+        buckets.append(oss_utils.get_bucket())
+
+    threads = [threading.Thread(target=get) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len({id(bucket) for bucket in buckets}) == 1
+    assert buckets[0] is oss_utils.get_bucket()
+    assert buckets[0].session.session.adapters["http://"]._pool_maxsize == oss_utils.OSS_CONNECTION_POOL_SIZE
+
+
+def test_small_file_uses_single_put(fake_oss, multipart_spy, tmp_path, monkeypatch):
+    oss_utils, _ = fake_oss
+    monkeypatch.setattr(oss_utils, "OSS_MULTIPART_THRESHOLD", 512 * 1024)
+    path = tmp_path / "small.wav"
+    data = write_file(path, 100 * 1024)
+
+    url = oss_utils.upload_to_oss(str(path), content_addressed=False)
+
+    assert url == oss_utils.get_object_url("audio/small.wav")
+    assert multipart_spy == []
+    assert read_object(oss_utils, url) == data
+
+
+def test_large_file_switches_to_multipart(fake_oss, multipart_spy, tmp_path, monkeypatch):
+    oss_utils, _ = fake_oss
+    monkeypatch.setattr(oss_utils, "OSS_MULTIPART_THRESHOLD", 512 * 1024)
+    monkeypatch.setattr(oss_utils, "OSS_PART_SIZE", 256 * 1024)
+    path = tmp_path / "large.wav"
+    data = write_file(path, 1200 * 1024)
+
+    url = oss_utils.upload_to_oss(str(path), content_addressed=False)
+
+    assert len(multipart_spy) == 1
+    assert multipart_spy[0]["part_size"] == 256 * 1024
+    assert multipart_spy[0]["multipart_threshold"] == 512 * 1024
+    assert read_object(oss_utils, url) == data
+
+
+def test_content_addressed_upload_is_skipped_when_stored(fake_oss, tmp_path):
+    oss_utils, cloud = fake_oss
+    first = tmp_path / "a" / "clip.wav"
+    second = tmp_path / "b" / "clip.wav"
+    os.makedirs(first.parent)
+    os.makedirs(second.parent)
+    write_file(first, 4096)
+    write_file(second, 4096)
+
+    url = oss_utils.upload_to_oss(str(first))
+    requests = cloud.stats.snapshot()["oss"]["requests"]
+
+    assert oss_utils.upload_to_oss(str(second)) == url
+    assert url.endswith(f"audio/{oss_utils.hash_file(str(first))}.wav")
+    # 本地索引命中，不再访问 OSS
+    assert cloud.stats.snapshot()["oss"]["requests"] == requests
+
+
+def test_upload_many_keeps_order_and_reports_failures(fake_oss, tmp_path):
+    oss_utils, _ = fake_oss
+    paths = []
+    contents = {}
+    for index in range(6):
+        path = str(tmp_path / f"sentence_{index}.wav")
+        contents[path] = write_file(path, 2048 + index, seed=index)
+        paths.append(path)
+    missing = str(tmp_path / "missing.wav")
+    paths.insert(3, missing)
+
+    results = oss_utils.upload_many_to_oss(paths, max_workers=4)
+
+    assert [result["local_url"] for result in results] == paths
+    assert "oss_url" not in results[3] and results[3]["error"]
+    for result in results[:3] + results[4:]:
+        assert "error" not in result
+        assert read_object(oss_utils, result["oss_url"]) == contents[result["local_url"]]
+
+
+def test_upload_many_reports_server_errors_per_file(fake_oss, tmp_path):
+    oss_utils, cloud = fake_oss
+    paths = []
+    for index in range(4):
+        path = str(tmp_path / f"sentence_{index}.wav")
+        write_file(path, 1024, seed=index)
+        paths.append(path)
+    cloud.profiles["oss"].error_rate = 1.0
+
+    results = oss_utils.upload_many_to_oss(paths, max_workers=2)
+
+    assert [result["local_url"] for result in results] == paths
+    assert all("error" in result and "oss_url" not in result for result in results)
+
+
+def test_patched_upload_resends_only_dirty_parts_without_hashing(fake_oss, tmp_path, monkeypatch):
+    oss_utils, _ = fake_oss
+    monkeypatch.setattr(oss_utils, "OSS_MULTIPART_THRESHOLD", 512 * 1024)
+    monkeypatch.setattr(oss_utils, "OSS_PART_SIZE", 256 * 1024)
+    path = tmp_path / "merged_audio.wav"
+    data = bytearray(write_file(path, 1200 * 1024))
+    source_url = oss_utils.upload_to_oss(str(path))
+
+    def no_hash(*args, **kwargs):
+        raise AssertionError("patched upload must not hash the whole file")
+
+    monkeypatch.setattr(oss_utils, "hash_file", no_hash)
+    sent_parts = []
+    bucket = oss_utils.get_bucket()
+    upload_part = bucket.upload_part
+
+    def recording_upload_part(key, upload_id, part_number, data):
+        sent_parts.append(part_number)
+        return upload_part(key, upload_id, part_number, data)
+
+    monkeypatch.setattr(bucket, "upload_part", recording_upload_part)
+
+    target_key = "audio/jobs/job-1/merged_audio.wav"
+    for start in (300 * 1024, 900 * 1024):
+        # 修改一小段字节后原地更新同一个对象
+        data[start:start + 100] = b"\x01" * 100
+        path.write_bytes(bytes(data))
+        url = oss_utils.upload_patched_to_oss(str(path), source_url, [(start, start + 100)], target_key=target_key)
+        assert url == oss_utils.get_object_url(target_key)
+        assert read_object(oss_utils, url) == bytes(data)
+        source_url = url
+
+    assert sent_parts == [2, 4]
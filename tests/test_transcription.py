@@ -0,0 +1,121 @@
+"""
+utils.transcription.AsyncTranscriptionClient 针对本地 DashScope 替身（提交任务、轮询、下载结果）的测试。
+"""
+import asyncio
+
+import numpy as np
+import pytest
+import soundfile as sf
+
+from utils.transcription import AsyncTranscriptionClient, TranscriptionError
+
+BUCKET = "voice-soa"
+
+
+def put_audio(cloud, base_url, key, seconds=1.0, sample_rate=8000):
+    """
+    直接在替身的对象存储中写入一段音频，返回其路径风格 URL。
+    """
+    sf.write(cloud.object_path(BUCKET, key), np.zeros(int(seconds * sample_rate), dtype="float32"), sample_rate,
+             format="WAV")
+    return f"{base_url}/{BUCKET}/{key}"
+
+
+def make_client(base_url, **kwargs):
+    return AsyncTranscriptionClient(api_key="test", base_url=f"{base_url}/api/v1", poll_interval=0.01, **kwargs)
+
+
+def run_transcription(client, file_urls, submitted=None):
+    """
+    在新的事件循环中执行 transcribe_many；submitted 列表记录每次提交的文件数。
+    """
+    if submitted is not None:
+        submit = client.submit
+
+        async def recording_submit(batch):
+            submitted.append(len(batch))
+            return await submit(batch)
+
+        client.submit = recording_submit
+
+    async def transcribe():
+        async with client:
+            return await client.transcribe_many(file_urls)
+
+    return asyncio.run(transcribe())
+
+
+def test_transcribe_many_splits_batches_and_keeps_input_order(fake_cloud):
+    cloud, base_url = fake_cloud
+    file_urls = [put_audio(cloud, base_url, f"audio/clip_{index}.wav") for index in range(205)]
+    # 打乱顺序，确认结果按输入顺序而不是提交或完成顺序返回
+    file_urls = file_urls[::-1]
+    submitted = []
+
+    results = run_transcription(make_client(base_url), file_urls, submitted)
+
+    assert sorted(submitted) == [5, 100, 100]
+    assert len(results) == len(file_urls)
+    assert [result["file_url"] for result in results] == file_urls
+    assert all(result["transcripts"][0]["sentences"] for result in results)
+
+
+def test_failed_files_get_per_file_errors(fake_cloud):
+    cloud, base_url = fake_cloud
+    file_urls = [put_audio(cloud, base_url, f"audio/clip_{index}.wav") for index in range(4)]
+    file_urls.insert(2, f"{base_url}/{BUCKET}/audio/missing.wav")
+
+    results = run_transcription(make_client(base_url, max_files_per_task=2), file_urls)
+
+    assert "error" in results[2]
+    assert "cannot be downloaded" in results[2]["error"]
+    assert [result.get("file_url") for index, result in enumerate(results) if index != 2] == \
+           [url for index, url in enumerate(file_urls) if index != 2]
+
+
+def test_failed_batch_marks_every_file_in_it(fake_cloud):
+    cloud, base_url = fake_cloud
+    file_urls = [put_audio(cloud, base_url, f"audio/clip_{index}.wav") for index in range(3)]
+    # 未知路径返回 404，不可重试，整批失败
+    client = AsyncTranscriptionClient(api_key="test", base_url=f"{base_url}/api/v1/unknown", poll_interval=0.01)
+
+    results = run_transcription(client, file_urls)
+
+    assert len(results) == 3
+    assert all("404" in result["error"] for result in results)
+
+
+def test_poll_backs_off_exponentially_up_to_the_cap(monkeypatch):
+    client = AsyncTranscriptionClient(api_key="test", base_url="http://127.0.0.1:9", poll_interval=0.5,
+                                      max_poll_interval=3.0, poll_backoff=2.0)
+    statuses = ["PENDING", "RUNNING", "RUNNING", "RUNNING", "RUNNING", "RUNNING", "SUCCEEDED"]
+    sleeps = []
+
+    async def fake_call(method, url, **kwargs):
+        status = statuses.pop(0)
+        output = {"task_id": "task", "task_status": status}
+        if status == "SUCCEEDED":
+            output["results"] = [{"file_url": "a", "subtask_status": "SUCCEEDED"}]
+        return {"output": output}
+
+    async def fake_sleep(seconds):
+        sleeps.append(seconds)
+
+    client._call = fake_call
+    monkeypatch.setattr(asyncio, "sleep", fake_sleep)
+
+    results = asyncio.run(client.wait("task"))
+
+    assert results == [{"file_url": "a", "subtask_status": "SUCCEEDED"}]
+    assert sleeps == [0.5, 1.0, 2.0, 3.0, 3.0, 3.0]
+
+
+def test_poll_raises_on_failed_task_without_results():
+    client = AsyncTranscriptionClient(api_key="test", base_url="http://127.0.0.1:9")
+
+    async def fake_call(method, url, **kwargs):
+        return {"output": {"task_id": "task", "task_status": "FAILED", "message": "boom"}}
+
+    client._call = fake_call
+    with pytest.raises(TranscriptionError, match="boom"):
+        asyncio.run(client.wait("task"))
@@ -0,0 +1,113 @@
+"""
+utils.voice_util.process_sentences_with_voice_cloning 的测试：通过 synthesizer_factory 注入本地合成器替身，
+检查并发合成时的句子顺序、逐句失败和统计信息。
+"""
+import threading
+import time
+
+import numpy as np
+import pytest
+import soundfile as sf
+
+from utils import voice_util
+from utils.cache_utils import DiskLRUCache
+
+SENTENCES = [{"text": f"第{index}句测试文本", "begin_time": index * 1000, "end_time": index * 1000 + 800}
+             for index in range(8)]
+SENTENCE_INDEX = {sentence["text"]: index for index, sentence in enumerate(SENTENCES)}
+
+
+class FakeSynthesizer:
+    """
+    SpeechSynthesizer 替身：按文本设定的延迟回调 PCM 数据，文本在 failures 中时回调错误。
+    记录同时在合成的数量，用于确认确实并发执行。
+    """
+
+    delays = {}
+    failures = set()
+    active = 0
+    max_active = 0
+    lock = threading.Lock()
+
+    def __init__(self, model, voice, format, callback):
+        self.callback = callback
+
+    def call(self, text):
+        cls = type(self)
+        with cls.lock:
+            cls.active += 1
+            cls.max_active = max(cls.max_active, cls.active)
+        try:
+            time.sleep(cls.delays.get(text, 0.01))
+            if text in cls.failures:
+                raise ValueError(f"InvalidParameter: cannot synthesize {text}")
+            self.callback.on_open()
+            # 按句子序号生成不同长度的音频，便于核对输出对应的句子
+            pcm = np.full(2205 * (SENTENCE_INDEX[text] + 1), 1000, dtype="<i2").tobytes()
+            # 故意在采样点中间切分数据块
+            self.callback.on_data(pcm[:1001])
+            self.callback.on_data(pcm[1001:])
+            self.callback.on_complete()
+        finally:
+            with cls.lock:
+                cls.active -= 1
+
+
+@pytest.fixture
+def fake_synthesizer(fake_oss, tmp_path, monkeypatch):
+    monkeypatch.setenv("DASHSCOPE_API_KEY", "test")
+    monkeypatch.setattr(voice_util, "synthesis_cache", DiskLRUCache(str(tmp_path / "synthesis"), suffix=".wav"))
+    monkeypatch.setattr(FakeSynthesizer, "delays", {})
+    monkeypatch.setattr(FakeSynthesizer, "failures", set())
+    monkeypatch.setattr(FakeSynthesizer, "max_active", 0)
+    return FakeSynthesizer
+
+
+def test_concurrent_cloning_keeps_order_and_isolates_failures(fake_synthesizer, tmp_path):
+    # 越靠前的句子合成越慢，完成顺序与输入顺序相反
+    fake_synthesizer.delays = {sentence["text"]: 0.02 * (len(SENTENCES) - index)
+                               for index, sentence in enumerate(SENTENCES)}
+    fake_synthesizer.failures = {SENTENCES[3]["text"]}
+
+    results, stats = voice_util.process_sentences_with_voice_cloning(
+        SENTENCES, "http://oss/voice-soa/audio/reference.wav", str(tmp_path / "cloned"), max_workers=4,
+        synthesizer_factory=fake_synthesizer, voice_id="cosyvoice-v1-test-voice", resume=False
+    )
+
+    assert fake_synthesizer.max_active > 1
+    assert [result["sentence_id"] for result in results] == list(range(1, len(SENTENCES) + 1))
+    assert [result["text"] for result in results] == [sentence["text"] for sentence in SENTENCES]
+    assert "cannot synthesize" in results[3]["error"]
+    for index, result in enumerate(results):
+        if index == 3:
+            continue
+        assert "error" not in result and result["oss_url"]
+        audio, sample_rate = sf.read(result["local_url"], dtype="int16")
+        assert sample_rate == voice_util.SYNTHESIS_SAMPLE_RATE
+        assert len(audio) == 2205 * (index + 1)
+
+    assert stats["total"] == len(SENTENCES)
+    assert stats["succeeded"] == len(SENTENCES) - 1
+    assert stats["failed"] == 1
+    assert stats["cache_hits"] == 0
+    assert stats["cache_misses"] == len(SENTENCES) - 1
+    assert stats["max_workers"] == 4
+    assert stats["sentences_per_second"] == pytest.approx(len(SENTENCES) / stats["elapsed_seconds"], rel=0.01)
+    assert stats["ttfb_ms_median"] is not None
+
+
+def test_second_run_is_served_from_the_synthesis_cache(fake_synthesizer, tmp_path):
+    reference_url = "http://oss/voice-soa/audio/reference.wav"
+    voice_util.process_sentences_with_voice_cloning(SENTENCES, reference_url, str(tmp_path / "first"),
+                                                    max_workers=2, synthesizer_factory=fake_synthesizer,
+                                                    voice_id="cosyvoice-v1-test-voice", resume=False)
+    fake_synthesizer.failures = {sentence["text"] for sentence in SENTENCES}
+
+    results, stats = voice_util.process_sentences_with_voice_cloning(
+        SENTENCES, reference_url, str(tmp_path / "second"), max_workers=2, synthesizer_factory=fake_synthesizer,
+        voice_id="cosyvoice-v1-test-voice", resume=False
+    )
+
+    assert stats["failed"] == 0
+    assert stats["cache_hits"] == len(SENTENCES)
+    assert all(result["cache_hit"] for result in results)
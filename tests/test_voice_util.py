@@ -0,0 +1,158 @@
+"""
+utils.voice_util.get_or_create_voice 的音色缓存测试：使用替身注册服务，不访问 DashScope。
+"""
+import re
+import time
+
+import pytest
+
+from utils import voice_util
+from utils.cache_utils import VoiceCache
+
+REFERENCE_URL = "http://127.0.0.1/voice-soa/audio/reference.wav"
+
+
+class FakeEnrollmentService:
+    """
+    记录调用的音色注册服务替身；query_error 不为空时查询抛出该异常。
+    """
+
+    def __init__(self, status="OK", query_error=None):
+        self.status = status
+        self.query_error = query_error
+        self.calls = []
+        self.voices = set()
+
+    def create_voice(self, target_model, prefix, url):
+        # 与 DashScope SDK 的限制一致
+        if not re.fullmatch(r"[a-z0-9]{1,9}", prefix):
+            raise ValueError(f"InvalidParameter: invalid prefix {prefix!r}")
+        voice_id = f"{target_model}-{prefix}-{len(self.calls)}"
+        self.calls.append(("create", voice_id))
+        self.voices.add(voice_id)
+        return voice_id
+
+    def query_voice(self, voice_id):
+        self.calls.append(("query", voice_id))
+        if self.query_error is not None:
+            raise self.query_error
+        if voice_id not in self.voices:
+            raise RuntimeError(f"InvalidParameter: voice {voice_id} not found")
+        return {"voice_id": voice_id, "status": self.status}
+
+    def delete_voice(self, voice_id):
+        self.calls.append(("delete", voice_id))
+        self.voices.discard(voice_id)
+
+    def actions(self):
+        return [action for action, _ in self.calls]
+
+
+class DirectScheduler:
+    """
+    不限速、不重试地直接调用，测试不受共享调度器的配额影响。
+    """
+
+    @staticmethod
+    def call(lane_name, func, *args, **kwargs):
+        return func(*args, **kwargs)
+
+
+@pytest.fixture
+def voice_cache(tmp_path, monkeypatch):
+    cache = VoiceCache(path=str(tmp_path / "voice_cache.json"))
+    monkeypatch.setattr(voice_util, "voice_cache", cache)
+    monkeypatch.setattr(voice_util, "scheduler", DirectScheduler())
+    return cache
+
+
+def age_validation(cache, seconds):
+    for entry in cache._entries.values():
+        entry["validated_at"] = time.time() - seconds
+
+
+def test_recently_validated_voice_is_reused_without_query(voice_cache):
+    service = FakeEnrollmentService()
+    voice_id = voice_util.get_or_create_voice(REFERENCE_URL, service=service)
+
+    assert voice_util.get_or_create_voice(REFERENCE_URL, service=service) == voice_id
+    assert service.actions() == ["create"]
+
+
+def test_stale_voice_is_queried_and_revalidated(voice_cache):
+    service = FakeEnrollmentService()
+    voice_id = voice_util.get_or_create_voice(REFERENCE_URL, service=service)
+    age_validation(voice_cache, voice_util.VOICE_REVALIDATE_SECONDS + 1)
+
+    assert voice_util.get_or_create_voice(REFERENCE_URL, service=service) == voice_id
+    assert voice_util.get_or_create_voice(REFERENCE_URL, service=service) == voice_id
+    assert service.actions() == ["create", "query"]
+
+
+@pytest.mark.parametrize("service", [
+    FakeEnrollmentService(status="DEPLOYING"),
+    FakeEnrollmentService(query_error=ConnectionError("connection reset")),
+])
+def test_deploying_voice_or_query_error_keeps_cached_voice(voice_cache, service):
+    voice_id = voice_util.get_or_create_voice(REFERENCE_URL, service=service)
+    service.calls.clear()
+    age_validation(voice_cache, voice_util.VOICE_REVALIDATE_SECONDS + 1)
+
+    assert voice_util.get_or_create_voice(REFERENCE_URL, service=service) == voice_id
+    assert service.actions() == ["query"]
+
+
+def test_undeployed_voice_is_replaced_and_deleted(voice_cache):
+    service = FakeEnrollmentService()
+    old_voice_id = voice_util.get_or_create_voice(REFERENCE_URL, service=service)
+    age_validation(voice_cache, voice_util.VOICE_REVALIDATE_SECONDS + 1)
+    service.status = "UNDEPLOYED"
+
+    new_voice_id = voice_util.get_or_create_voice(REFERENCE_URL, service=service)
+
+    assert new_voice_id != old_voice_id
+    assert service.calls[1:] == [("query", old_voice_id), ("create", new_voice_id), ("delete", old_voice_id)]
+    assert voice_cache.get_entry(VoiceCache.make_key(voice_util.TARGET_MODEL, voice_util.hash_bytes(
+        REFERENCE_URL.encode("utf-8"))))["voice_id"] == new_voice_id
+
+
+def test_missing_voice_is_replaced_without_delete(voice_cache):
+    service = FakeEnrollmentService()
+    old_voice_id = voice_util.get_or_create_voice(REFERENCE_URL, service=service)
+    age_validation(voice_cache, voice_util.VOICE_REVALIDATE_SECONDS + 1)
+    service.voices.clear()
+
+    new_voice_id = voice_util.get_or_create_voice(REFERENCE_URL, service=service)
+
+    assert new_voice_id != old_voice_id
+    assert service.actions() == ["create", "query", "create"]
+
+
+@pytest.mark.parametrize("url, prefix", [
+    (f"http://oss/voice-soa/audio/{'ab12' * 16}.wav", "ab12ab12a"),
+    ("http://oss/voice-soa/audio/My_Voice-01.WAV", "myvoice01"),
+    ("http://oss/voice-soa/audio/参考音频.wav", "clone"),
+])
+def test_voice_prefix_follows_the_enrollment_rules(url, prefix):
+    assert voice_util.voice_prefix(url) == prefix
+
+
+def test_content_addressed_reference_enrolls_with_a_valid_prefix(voice_cache):
+    service = FakeEnrollmentService()
+    url = f"http://oss/voice-soa/audio/{'0f' * 32}.wav"
+
+    voice_id = voice_util.get_or_create_voice(url, service=service)
+
+    assert voice_id.split("-")[-2] == "0f0f0f0f0"
+
+
+def test_cache_hits_do_not_rewrite_the_cache_file(voice_cache, monkeypatch):
+    service = FakeEnrollmentService()
+    voice_util.get_or_create_voice(REFERENCE_URL, service=service)
+    writes = []
+    monkeypatch.setattr("utils.cache_utils.atomic_write_json", lambda path, data: writes.append(path))
+
+    for _ in range(5):
+        voice_util.get_or_create_voice(REFERENCE_URL, service=service)
+
+    assert writes == []
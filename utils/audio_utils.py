@@ -1,13 +1,21 @@
-import librosa
+import librosa  # librosa 的子模块在首次访问时才加载
 import soundfile as sf
-from pydub import AudioSegment
-import noisereduce as nr  # 降噪库
+from utils.merge_utils import merge_clips_streaming, merge_clips_to_buffer
+from utils.metrics import ContextThreadPoolExecutor, timed
 from utils.oss_utils import upload_to_oss
+from utils.preprocess_utils import preprocess_audio_parallel, preprocess_audio_streaming
 import os
 
-def preprocess_audio(input_filepath, output_folder):
+@timed("preprocess")
+def preprocess_audio(input_filepath, output_folder, mode="full", workers=None):
     """
     处理音频文件：确保统一为 WAV 格式，16kHz 单声道，并进行降噪。
+    :param input_filepath: 输入音频文件路径
+    :param output_folder: 输出目录
+    :param mode: "full" 整段加载后降噪；"stream" 逐块解码、重采样和降噪，内存占用与输入时长无关；
+                 "parallel" 分段后在多进程中重采样和降噪
+    :param workers: "parallel" 模式下的进程数，默认使用全部 CPU 核心
+    :return: 预处理后的 WAV 文件路径
     """
     try:
         # 获取文件名和输出路径
@@ -17,9 +25,26 @@ def preprocess_audio(input_filepath, output_folder):
 
         print(f"[INFO] Starting audio preprocessing for: {input_filepath}")
 
+        if mode == "stream":
+            print("[INFO] Using streaming preprocessing...")
+            preprocess_audio_streaming(input_filepath, output_filepath)
+            print("[INFO] Audio preprocessing completed successfully.")
+            return output_filepath
+        if mode == "parallel":
+            print("[INFO] Using parallel preprocessing...")
+            preprocess_audio_parallel(input_filepath, output_filepath, workers=workers)
+            print("[INFO] Audio preprocessing completed successfully.")
+            return output_filepath
+        if mode != "full":
+            raise ValueError(f"Unsupported preprocessing mode: {mode}")
+
+        # 降噪库依赖 scipy.signal，导入较慢，只在预处理时加载
+        import noisereduce as nr
+
         # 检查文件格式，若为 MP3 则转换为临时 WAV 文件
         if input_filepath.lower().endswith('.mp3'):
             print("[INFO] Input file is in MP3 format, converting to WAV...")
+            from pydub import AudioSegment
             audio = AudioSegment.from_file(input_filepath, format="mp3")
             audio.export(temp_filepath, format="wav")
         else:
@@ -50,58 +75,90 @@ def preprocess_audio(input_filepath, output_folder):
         print(f"[ERROR] Error during audio preprocessing: {e}")
         raise
 
-def split_audio_by_sentences(audio_file, transcription_json, output_folder):
+@timed("split_sentence")
+def export_sentence(sentence, audio, sample_rate, subtype, output_folder):
+    """
+    保存并上传单个句子的音频切片，失败时返回带 error 字段的结果而不是抛出异常。
+    """
+    sentence_id = sentence.get("sentence_id")
+    begin_time = sentence.get("begin_time")
+    end_time = sentence.get("end_time")
+    text = sentence.get("text")
+
+    result = {
+        "sentence_id": sentence_id,
+        "begin_time": begin_time,
+        "end_time": end_time,
+        "text": text,
+    }
+
+    try:
+        # 毫秒换算为采样点（与 pydub 切片一致向下取整），切片是原数组的视图，不产生拷贝
+        start = min(int(int(begin_time) * sample_rate / 1000), len(audio))
+        end = min(int(int(end_time) * sample_rate / 1000), len(audio))
+        sliced_audio = audio[start:end]
+
+        # 保存到本地
+        output_filepath = os.path.join(output_folder, f"sentence_{sentence_id}.wav")
+        sf.write(output_filepath, sliced_audio, sample_rate, subtype=subtype)
+        print(f"[INFO] Sentence {sentence_id} audio saved to: {output_filepath}")
+
+        # 上传到 OSS
+        oss_url = upload_to_oss(output_filepath)
+        print(f"[INFO] Sentence {sentence_id} audio uploaded to OSS: {oss_url}")
+
+        result["local_url"] = output_filepath
+        result["oss_url"] = oss_url
+    except Exception as e:
+        print(f"[ERROR] Failed to export sentence {sentence_id}: {e}")
+        result["error"] = str(e)
+
+    return result
+
+
+@timed("split_decode")
+def read_audio_for_split(audio_file):
+    """
+    一次性解码待切割的音频；16 位 PCM 按整数读取，保证切片写回时采样值不变。
+    :return: (audio, sample_rate, subtype)
+    """
+    info = sf.info(audio_file)
+    dtype = "int16" if info.subtype == "PCM_16" else "float32"
+    audio, sample_rate = sf.read(audio_file, dtype=dtype)
+    return audio, sample_rate, info.subtype
+
+
+@timed("split")
+def split_audio_by_sentences(audio_file, transcription_json, output_folder, max_workers=8, progress_callback=None):
     """
     根据句子的时间戳切割音频，并保存本地和上传 OSS。
+    音频只解码一次，各句子的写盘和上传在线程池中并发执行。
     :param audio_file: 原始音频文件路径
     :param transcription_json: 识别结果的 JSON 数据
     :param output_folder: 本地切割音频保存的文件夹
-    :return: 包含切割音频信息的列表
+    :param max_workers: 并发写盘/上传的线程数
+    :param progress_callback: 每完成一个句子调用一次，参数为 sentence_id（在工作线程中调用）
+    :return: 包含切割音频信息的列表，按句子顺序排列，失败的句子带有 error 字段
     """
-    # 加载音频文件
-    audio = AudioSegment.from_wav(audio_file)
+    # 一次性解码音频
+    audio, sample_rate, subtype = read_audio_for_split(audio_file)
 
     # 确保输出目录存在
     os.makedirs(output_folder, exist_ok=True)
 
-    sentence_audio_info = []
-
-    # 遍历 JSON 文件中的 sentences
-    for sentence in transcription_json.get("transcripts", [])[0].get("sentences", []):
-        sentence_id = sentence.get("sentence_id")
-        begin_time = sentence.get("begin_time")
-        end_time = sentence.get("end_time")
-        text = sentence.get("text")
-
-        # 转换时间戳为毫秒（因为 pydub 的切割单位是毫秒）
-        start_ms = int(begin_time)
-        end_ms = int(end_time)
-
-        # 切割音频
-        sliced_audio = audio[start_ms:end_ms]
-
-        # 保存本地文件名
-        output_filename = f"sentence_{sentence_id}.wav"
-        output_filepath = os.path.join(output_folder, output_filename)
+    sentences = transcription_json.get("transcripts", [])[0].get("sentences", [])
 
-        # 保存到本地
-        sliced_audio.export(output_filepath, format="wav")
-        print(f"[INFO] Sentence {sentence_id} audio saved to: {output_filepath}")
-
-        # 上传到 OSS
-        oss_url = upload_to_oss(output_filepath)
-        print(f"[INFO] Sentence {sentence_id} audio uploaded to OSS: {oss_url}")
+    def export(sentence):
+        result = export_sentence(sentence, audio, sample_rate, subtype, output_folder)
+        if progress_callback:
+            progress_callback(result["sentence_id"])
+        return result
 
-        # 保存当前句子的音频信息
-        sentence_audio_info.append({
-            "sentence_id": sentence_id,
-            "begin_time": begin_time,
-            "end_time": end_time,
-            "text": text,
-            "local_url": output_filepath,
-            "oss_url": oss_url
-        })
+    with ContextThreadPoolExecutor(max_workers=max(1, int(max_workers)), thread_name_prefix="split-audio") as executor:
+        sentence_audio_info = list(executor.map(export, sentences))
 
+    failed = sum(1 for item in sentence_audio_info if "error" in item)
+    print(f"[INFO] Split {len(sentence_audio_info) - failed}/{len(sentence_audio_info)} sentences successfully.")
     return sentence_audio_info
 
 
@@ -109,14 +166,39 @@ def time_to_milliseconds(time_str):
     return int(time_str)
 
 
-def merge_cloned_audio(cloned_audio, output_file):
+@timed("merge")
+def merge_cloned_audio(cloned_audio, output_file, mode="buffer", stretcher="wsola", max_stretch_ratio=2.0,
+                       overflow="gap"):
     """
     合并 cloned_audio 中的音频文件，按照时间戳排列，填充空白或加速处理。
 
+    :param cloned_audio: 包含音频信息的列表。
+    :param output_file: 合并后音频的输出路径。
+    :param mode: "buffer" 预分配整条时间轴后一次性写出；
+                 "stream" 按时间轴顺序流式写入文件，内存占用与节目时长无关，适合长音频。
+    :param stretcher: 片段长于时间槽时使用的时间伸缩实现，"wsola"（保持音高）或 "speedup"（AudioSegment.speedup）。
+    :param max_stretch_ratio: 最大压缩倍率，超过后不再继续压缩。
+    :param overflow: 压缩后仍超长时的处理方式，"gap" 溢出到下一句之前的空白，"trim" 截断到时间槽内。
+    :return: 合并后的音频文件路径。
+    """
+    fit_options = {"stretcher": stretcher, "max_stretch_ratio": max_stretch_ratio, "overflow": overflow}
+    if mode == "stream":
+        return merge_clips_streaming(cloned_audio, output_file, **fit_options)
+    if mode != "buffer":
+        raise ValueError(f"Unsupported merge mode: {mode}")
+    return merge_clips_to_buffer(cloned_audio, output_file, **fit_options)
+
+
+def merge_cloned_audio_pydub(cloned_audio, output_file):
+    """
+    基于 AudioSegment 逐句拼接的原始合并实现，保留用于对比基准测试。
+
     :param cloned_audio: 包含音频信息的列表。
     :param output_file: 合并后音频的输出路径。
     :return: 合并后的音频文件路径。
     """
+    from pydub import AudioSegment
+
     # 确保输出目录存在
     os.makedirs(os.path.dirname(output_file), exist_ok=True)
 
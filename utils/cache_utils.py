@@ -0,0 +1,286 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+
+from decouple import config
+
+# 本地缓存根目录，默认位于项目根目录下的 .cache
+CACHE_FOLDER = config(
+    'CACHE_FOLDER',
+    default=os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '.cache')
+)
+
+
+def hash_bytes(data):
+    """
+    计算字节串的 SHA-256 摘要。
+    """
+    return hashlib.sha256(data).hexdigest()
+
+
+def hash_file(file_path, chunk_size=1024 * 1024):
+    """
+    分块计算文件内容的 SHA-256 摘要，避免一次性读入大文件。
+    :param file_path: 本地文件路径
+    :param chunk_size: 每次读取的字节数
+    :return: 十六进制摘要字符串
+    """
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def atomic_write_json(path, data):
+    """
+    先写临时文件再替换，避免进程中途退出留下损坏的 JSON。
+    """
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(temp_path, path)
+
+
+class VoiceCache:
+    """
+    音色 ID 的持久化缓存：以“参考音频内容摘要 + 目标模型”为键，保存在本地 JSON 文件中，
+    支持过期时间和按最近使用时间淘汰。
+
+    命中时只在内存中刷新最近使用时间，不写文件；条目发生变化（put / remove / mark_validated / 过期）时
+    才整体写回，顺带保存最近使用时间。创建实例时不读取文件，首次使用（或调用 load）时才加载。
+    """
+
+    def __init__(self, path=None, ttl_seconds=7 * 24 * 3600, max_entries=50):
+        self.path = path or os.path.join(CACHE_FOLDER, 'voice_cache.json')
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._loaded_entries = None
+
+    @property
+    def _entries(self):
+        # 首次使用时才读取缓存文件，导入模块时不访问磁盘；调用方需持有 self._lock
+        if self._loaded_entries is None:
+            self._loaded_entries = self._load()
+        return self._loaded_entries
+
+    def load(self):
+        """
+        提前读取缓存文件（例如在预热时）。
+        :return: 条目数
+        """
+        with self._lock:
+            return len(self._entries)
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"[WARNING] Voice cache is unreadable, starting empty: {e}")
+            return {}
+
+    @staticmethod
+    def make_key(target_model, content_hash):
+        return f"{target_model}:{content_hash}"
+
+    def get(self, key):
+        """
+        返回未过期的音色 ID，并刷新其最近使用时间；不存在或已过期时返回 None。
+        """
+        entry = self.get_entry(key)
+        return entry["voice_id"] if entry else None
+
+    def get_entry(self, key):
+        """
+        返回未过期条目的副本（含 voice_id、created_at、validated_at 等字段），并刷新其最近使用时间；
+        不存在或已过期时返回 None。
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            now = time.time()
+            if self.ttl_seconds and now - entry["created_at"] > self.ttl_seconds:
+                del self._entries[key]
+                atomic_write_json(self.path, self._entries)
+                return None
+            # 最近使用时间只用于淘汰顺序，随下一次写入保存
+            entry["last_used"] = now
+            return dict(entry)
+
+    def mark_validated(self, key, voice_id):
+        """
+        记录音色刚刚在服务端确认可用的时间；条目已被替换为其他音色时忽略。
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry["voice_id"] != voice_id:
+                return
+            entry["validated_at"] = time.time()
+            atomic_write_json(self.path, self._entries)
+
+    def put(self, key, voice_id):
+        """
+        写入刚注册的音色 ID，超出容量时淘汰最久未使用的条目。
+        :return: 被替换或淘汰的音色 ID 列表，调用方可据此在服务端删除对应音色
+        """
+        with self._lock:
+            now = time.time()
+            replaced = self._entries.get(key)
+            self._entries[key] = {"voice_id": voice_id, "created_at": now, "last_used": now, "validated_at": now}
+
+            evicted = []
+            if replaced is not None and replaced["voice_id"] != voice_id:
+                evicted.append(replaced["voice_id"])
+            while self.max_entries and len(self._entries) > self.max_entries:
+                oldest_key = min(self._entries, key=lambda k: self._entries[k]["last_used"])
+                evicted.append(self._entries.pop(oldest_key)["voice_id"])
+
+            atomic_write_json(self.path, self._entries)
+            return evicted
+
+    def remove(self, key):
+        with self._lock:
+            if self._entries.pop(key, None) is not None:
+                atomic_write_json(self.path, self._entries)
+
+
+class DiskLRUCache:
+    """
+    基于内容寻址的本地文件缓存：每个键对应缓存目录下的一个文件，
+    总大小超过上限时按最近访问时间淘汰最旧的文件。
+    创建实例时不访问磁盘，首次读写（或调用 load）时才扫描缓存目录建立索引。
+    """
+
+    def __init__(self, folder, max_bytes=1024 * 1024 * 1024, suffix=""):
+        self.folder = folder
+        self.max_bytes = max_bytes
+        self.suffix = suffix
+        self._lock = threading.Lock()
+        self._loaded_index = None
+
+    @property
+    def _index(self):
+        # 首次使用时才扫描缓存目录，导入模块、启动应用的耗时与缓存大小无关；调用方需持有 self._lock
+        if self._loaded_index is None:
+            self._loaded_index = self._scan()
+        return self._loaded_index
+
+    def _scan(self):
+        """
+        扫描缓存目录，按修改时间（即最近访问时间）建立 LRU 索引。
+        """
+        os.makedirs(self.folder, exist_ok=True)
+        entries = []
+        for root, _, files in os.walk(self.folder):
+            for name in files:
+                if name.endswith(".tmp"):
+                    continue
+                path = os.path.join(root, name)
+                stat = os.stat(path)
+                entries.append((stat.st_mtime, path, stat.st_size))
+        entries.sort()
+        return {path: size for _, path, size in entries}
+
+    def load(self):
+        """
+        提前扫描缓存目录（例如在预热时），之后的首次读写不再承担扫描开销。
+        """
+        with self._lock:
+            return len(self._index)
+
+    def path_for(self, key):
+        return os.path.join(self.folder, key[:2], f"{key}{self.suffix}")
+
+    @property
+    def total_bytes(self):
+        with self._lock:
+            return sum(self._index.values())
+
+    def get_path(self, key):
+        """
+        命中时刷新访问时间并返回缓存文件路径，未命中返回 None。
+        """
+        path = self.path_for(key)
+        with self._lock:
+            if path not in self._index:
+                return None
+            if not os.path.exists(path):
+                del self._index[path]
+                return None
+            os.utime(path)
+            # 移到索引末尾，表示最近使用
+            self._index[path] = self._index.pop(path)
+            return path
+
+    def copy_to(self, key, destination):
+        """
+        命中时把缓存文件复制到 destination 并刷新访问时间。复制在锁内完成，
+        其他线程写入新条目触发的淘汰不会在复制途中删除该文件。
+        :return: 是否命中
+        """
+        path = self.path_for(key)
+        with self._lock:
+            if path not in self._index:
+                return False
+            try:
+                shutil.copyfile(path, destination)
+            except FileNotFoundError:
+                del self._index[path]
+                return False
+            os.utime(path)
+            self._index[path] = self._index.pop(path)
+            return True
+
+    def put_bytes(self, key, data):
+        path = self.path_for(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, 'wb') as f:
+            f.write(data)
+        return self._commit(temp_path, path)
+
+    def put_file(self, key, file_path):
+        with open(file_path, 'rb') as f:
+            return self.put_bytes(key, f.read())
+
+    def get_json(self, key):
+        path = self.get_path(key)
+        if path is None:
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            # 读取前被其他线程的淘汰删除，按未命中处理
+            return None
+
+    def put_json(self, key, data):
+        return self.put_bytes(key, json.dumps(data, ensure_ascii=False).encode('utf-8'))
+
+    def _commit(self, temp_path, path):
+        # 替换与登记索引在同一把锁内，避免其他线程的淘汰在两步之间删除该文件
+        with self._lock:
+            os.replace(temp_path, path)
+            self._index.pop(path, None)
+            self._index[path] = os.path.getsize(path)
+            self._evict()
+        return path
+
+    def _evict(self):
+        total = sum(self._index.values())
+        while total > self.max_bytes and len(self._index) > 1:
+            oldest_path = next(iter(self._index))
+            total -= self._index.pop(oldest_path)
+            try:
+                os.remove(oldest_path)
+            except OSError:
+                pass
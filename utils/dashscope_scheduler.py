@@ -0,0 +1,243 @@
+import asyncio
+import random
+import threading
+import time
+
+from decouple import config
+
+from utils.metrics import LatencyHistogram, histogram_samples, registry
+
+# 限流类错误（需要降低并发）与瞬时错误（可直接重试）的特征
+THROTTLE_MARKERS = ("throttling", "ratequota", "rate limit", "too many requests", "429")
+TRANSIENT_MARKERS = ("internalerror", "serviceunavailable", "timeout", "timed out", "connection", "cannot connect",
+                     "disconnected", "502", "503", "504")
+
+
+def classify_error(error):
+    """
+    判断异常是否值得重试。
+    :return: "throttled"（被限流）、"transient"（瞬时错误）或 None（不可重试）
+    """
+    status_code = getattr(error, "status_code", None)
+    if status_code == 429:
+        return "throttled"
+    if status_code in (500, 502, 503, 504):
+        return "transient"
+
+    message = str(error).lower()
+    if any(marker in message for marker in THROTTLE_MARKERS):
+        return "throttled"
+    if isinstance(error, (TimeoutError, ConnectionError)) or any(marker in message for marker in TRANSIENT_MARKERS):
+        return "transient"
+    return None
+
+
+class Lane:
+    """
+    单类调用的调度通道：令牌桶限制请求速率，AIMD 自适应并发上限——
+    成功时并发上限缓慢增加（每轮约 +1），被限流时乘以 decrease_factor；在上次下调之前发出的请求再被限流
+    不会重复下调，避免同一波拥塞把并发上限压到最低。
+    """
+
+    def __init__(self, name, rate, burst, initial_concurrency, min_concurrency=1, max_concurrency=32,
+                 decrease_factor=0.7, max_retries=4, backoff_base=0.5, backoff_cap=20.0):
+        self.name = name
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self.limit = float(initial_concurrency)
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.decrease_factor = decrease_factor
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+
+        self._lock = threading.Lock()
+        self._tokens = self.burst
+        self._refilled_at = time.monotonic()
+        self._last_decrease = 0.0
+        self.in_flight = 0
+        self.histogram = LatencyHistogram()
+        self.counters = {"calls": 0, "successes": 0, "failures": 0, "retries": 0, "throttled": 0}
+
+    def _try_acquire(self):
+        """
+        尝试占用一个并发槽位和一个令牌。
+        :return: 0 表示成功；否则为建议的等待秒数
+        """
+        with self._lock:
+            if self.in_flight >= int(self.limit):
+                return 0.01
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._refilled_at) * self.rate)
+            self._refilled_at = now
+            if self._tokens < 1:
+                return (1 - self._tokens) / self.rate
+            self._tokens -= 1
+            self.in_flight += 1
+            return 0
+
+    def acquire(self):
+        while (wait := self._try_acquire()) > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self):
+        while (wait := self._try_acquire()) > 0:
+            await asyncio.sleep(wait)
+
+    def release(self, started_at, outcome):
+        """
+        释放槽位，记录延迟并根据结果调整并发上限。
+        :param started_at: 调用开始时间（time.monotonic()）
+        :param outcome: "success"、"throttled"、"transient" 或 "failure"
+        """
+        with self._lock:
+            saturated = self.in_flight >= int(self.limit)
+            self.in_flight -= 1
+            self.histogram.observe(time.monotonic() - started_at)
+            if outcome == "success":
+                self.counters["successes"] += 1
+                # 只有并发槽位用满时才上调，空闲时上限不会无限增长
+                if saturated:
+                    self.limit = min(self.max_concurrency, self.limit + 1 / self.limit)
+            elif outcome == "throttled":
+                self.counters["throttled"] += 1
+                if started_at >= self._last_decrease:
+                    self.limit = max(self.min_concurrency, self.limit * self.decrease_factor)
+                    self._last_decrease = time.monotonic()
+
+    def backoff(self, attempt):
+        """
+        带完全抖动的指数退避时间。
+        """
+        return random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt))
+
+    def _record(self, counter):
+        with self._lock:
+            self.counters[counter] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.counters, concurrency_limit=round(self.limit, 2), in_flight=self.in_flight,
+                        rate_per_second=self.rate, latency=self.histogram.snapshot())
+
+
+class DashScopeScheduler:
+    """
+    DashScope 调用的共享调度器：音色注册、语音合成和语音识别各有一个通道，
+    所有调用经过限速、自适应并发控制和重试，并记录每次调用的延迟。
+    """
+
+    def __init__(self, lanes):
+        self.lanes = {name: Lane(name, **options) for name, options in lanes.items()}
+
+    def _retry_delay(self, lane, error, attempt, started_at):
+        """
+        记录一次失败的调用。
+        :return: 重试前的等待秒数；不可重试或重试次数用尽时返回 None
+        """
+        kind = classify_error(error)
+        lane.release(started_at, kind or "failure")
+        if kind is None or attempt >= lane.max_retries:
+            lane._record("failures")
+            return None
+        delay = lane.backoff(attempt)
+        print(f"[WARNING] DashScope {lane.name} call {kind}, retrying in {delay:.2f}s: {error}")
+        lane._record("retries")
+        return delay
+
+    def call(self, lane_name, func, *args, **kwargs):
+        """
+        在指定通道中同步调用 func，限流和瞬时错误按抖动退避重试，其余异常直接抛出。
+        """
+        lane = self.lanes[lane_name]
+        lane._record("calls")
+        for attempt in range(lane.max_retries + 1):
+            lane.acquire()
+            started_at = time.monotonic()
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
+                delay = self._retry_delay(lane, e, attempt, started_at)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                continue
+            lane.release(started_at, "success")
+            return result
+
+    async def call_async(self, lane_name, coroutine_factory):
+        """
+        call 的协程版本：coroutine_factory 每次重试都会被调用以创建新的协程。
+        """
+        lane = self.lanes[lane_name]
+        lane._record("calls")
+        for attempt in range(lane.max_retries + 1):
+            await lane.acquire_async()
+            started_at = time.monotonic()
+            try:
+                result = await coroutine_factory()
+            except Exception as e:
+                delay = self._retry_delay(lane, e, attempt, started_at)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                continue
+            lane.release(started_at, "success")
+            return result
+
+    def snapshot(self, lane_name=None):
+        if lane_name is not None:
+            return self.lanes[lane_name].snapshot()
+        return {name: lane.snapshot() for name, lane in self.lanes.items()}
+
+    def collect(self):
+        """
+        各通道状态的 Prometheus 指标族，供 /metrics 输出。
+        """
+        snapshots = self.snapshot()
+        counters = {
+            "calls": "DashScope calls submitted to the scheduler.",
+            "successes": "DashScope call attempts that succeeded.",
+            "failures": "DashScope calls that failed after all retries.",
+            "retries": "DashScope call attempts retried after a throttled or transient error.",
+            "throttled": "DashScope call attempts rejected by rate limiting.",
+        }
+        families = [
+            (f"dashscope_{counter}_total", "counter", description,
+             [("", {"lane": lane}, snapshot[counter]) for lane, snapshot in snapshots.items()])
+            for counter, description in counters.items()
+        ]
+        families.append(("dashscope_concurrency_limit", "gauge", "Adaptive concurrency limit of a DashScope lane.",
+                         [("", {"lane": lane}, snapshot["concurrency_limit"]) for lane, snapshot in snapshots.items()]))
+        families.append(("dashscope_in_flight", "gauge", "DashScope calls currently in flight.",
+                         [("", {"lane": lane}, snapshot["in_flight"]) for lane, snapshot in snapshots.items()]))
+        families.append(("dashscope_call_duration_seconds", "histogram", "Latency of individual DashScope calls.",
+                         [sample for lane, snapshot in snapshots.items()
+                          for sample in histogram_samples({"lane": lane}, snapshot["latency"])]))
+        return families
+
+
+# 各通道的默认配额，可通过环境变量按账号的实际配额调整
+scheduler = DashScopeScheduler({
+    "enrollment": {
+        "rate": config('DASHSCOPE_ENROLLMENT_RPS', default=1.0, cast=float),
+        "burst": 2,
+        "initial_concurrency": 2,
+        "max_concurrency": 4,
+    },
+    "synthesis": {
+        "rate": config('DASHSCOPE_SYNTHESIS_RPS', default=10.0, cast=float),
+        "burst": 10,
+        "initial_concurrency": 4,
+        "max_concurrency": config('DASHSCOPE_SYNTHESIS_MAX_CONCURRENCY', default=32, cast=int),
+    },
+    "transcription": {
+        "rate": config('DASHSCOPE_TRANSCRIPTION_RPS', default=10.0, cast=float),
+        "burst": 20,
+        "initial_concurrency": 16,
+        "max_concurrency": 64,
+    },
+})
+
+registry.add_collector(scheduler.collect)
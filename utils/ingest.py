@@ -0,0 +1,175 @@
+import hashlib
+import os
+import uuid
+
+from decouple import config
+from werkzeug.sansio.multipart import Data, Epilogue, Field, File, MultipartDecoder, NeedData
+
+from utils.metrics import count, timed
+from utils.oss_utils import StreamingUpload
+
+# 每次从请求体读取的字节数
+INGEST_CHUNK_SIZE = config('INGEST_CHUNK_SIZE', default=1024 * 1024, cast=int)
+# 普通表单字段（非文件）的最大字节数
+INGEST_MAX_FIELD_BYTES = config('INGEST_MAX_FIELD_BYTES', default=1024 * 1024, cast=int)
+
+
+class UploadTooLargeError(Exception):
+    def __init__(self, max_bytes):
+        super().__init__(f"Upload exceeds the size limit of {max_bytes} bytes")
+        self.max_bytes = max_bytes
+
+
+class DuplicateFileFieldError(Exception):
+    def __init__(self, field):
+        super().__init__(f"File field '{field}' was uploaded more than once")
+        self.field = field
+
+
+class _FileSink:
+    """
+    单个文件字段的数据同时写入三处：本地暂存文件、SHA-256 摘要和（可选的）OSS 流式上传。
+    """
+
+    def __init__(self, field, filename, folder, upload_to_oss):
+        self.field = field
+        self.filename = os.path.basename(filename)
+        self.path = os.path.join(folder, f"{uuid.uuid4().hex}{os.path.splitext(self.filename)[-1]}")
+        self.temp_path = f"{self.path}.part"
+        self.file = open(self.temp_path, 'wb')
+        self.digest = hashlib.sha256()
+        self.upload = StreamingUpload(self.filename) if upload_to_oss else None
+        self.size = 0
+
+    def write(self, data):
+        self.file.write(data)
+        self.digest.update(data)
+        self.size += len(data)
+        if self.upload is not None:
+            self.upload.write(data)
+
+    def finish(self):
+        self.file.close()
+        content_hash = self.digest.hexdigest()
+        oss_url = self.upload.finish(content_hash) if self.upload is not None else None
+        os.replace(self.temp_path, self.path)
+        count("ingested_bytes", self.size)
+        return {
+            "field": self.field,
+            "filename": self.filename,
+            "local_url": self.path,
+            "oss_url": oss_url,
+            "size": self.size,
+            "sha256": content_hash,
+        }
+
+    def abort(self):
+        self.file.close()
+        if os.path.exists(self.temp_path):
+            os.remove(self.temp_path)
+        if self.upload is not None:
+            self.upload.abort()
+
+    def discard(self):
+        """
+        撤销已完成的文件：删除暂存文件和本次上传到 OSS 的对象。
+        """
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        if self.upload is not None:
+            self.upload.delete()
+
+
+def ingest_multipart(stream, boundary, staging_folder, max_bytes=None, oss_fields=(),
+                     chunk_size=INGEST_CHUNK_SIZE):
+    """
+    单次读取 multipart/form-data 请求体：文件字段的数据块边接收边写入暂存目录、计算 SHA-256，
+    oss_fields 中的文件字段同时分片上传到 OSS，上传文件不再落盘后重新读取。
+
+    :param stream: 请求体流（如 flask.request.stream），调用前不能访问 request.form / request.files
+    :param boundary: multipart 分隔符
+    :param staging_folder: 暂存目录，文件以随机名称保存，由调用方移动到最终位置
+    :param max_bytes: 请求体的最大字节数，超过时中止接收并抛出 UploadTooLargeError
+    :param oss_fields: 需要同时上传到 OSS 的文件字段名
+    :param chunk_size: 每次读取的字节数
+    :return: (fields, files)；fields 为 {字段名: 字符串}，files 为 {字段名: {"filename", "local_url",
+             "oss_url", "size", "sha256", ...}}，未上传 OSS 的文件 oss_url 为 None
+    同一文件字段出现多次时在接收第二个文件之前抛出 DuplicateFileFieldError，不会静默覆盖前一个文件。
+    中途出错（包括后面的字段超过大小限制）时，已接收完的文件连同其 OSS 对象一并删除后再抛出异常。
+    """
+    # 解码器自带的 max_form_memory_size 按内部缓冲区检查，会误伤大块读取的文件数据，字段大小在下面单独检查
+    decoder = MultipartDecoder(boundary.encode("latin-1"))
+    fields = {}
+    files = {}
+    part = None
+    sink = None
+    finished = []
+    value = []
+    value_size = 0
+    received = 0
+
+    try:
+        with timed("ingest"):
+            for data in _read_chunks(stream, chunk_size):
+                received += len(data or b"")
+                if max_bytes and received > max_bytes:
+                    raise UploadTooLargeError(max_bytes)
+
+                decoder.receive_data(data)
+                event = decoder.next_event()
+                while not isinstance(event, (Epilogue, NeedData)):
+                    if isinstance(event, File):
+                        if event.filename and event.name in files:
+                            raise DuplicateFileFieldError(event.name)
+                        part = event
+                        # 未选择文件的字段没有文件名，数据直接丢弃
+                        sink = _FileSink(event.name, event.filename, staging_folder,
+                                         event.name in oss_fields) if event.filename else None
+                    elif isinstance(event, Field):
+                        part = event
+                        value = []
+                        value_size = 0
+                    elif isinstance(event, Data):
+                        if isinstance(part, File):
+                            if sink is not None:
+                                sink.write(event.data)
+                                if not event.more_data:
+                                    files[part.name] = sink.finish()
+                                    finished.append(sink)
+                                    sink = None
+                        else:
+                            value.append(event.data)
+                            value_size += len(event.data)
+                            if value_size > INGEST_MAX_FIELD_BYTES:
+                                raise UploadTooLargeError(INGEST_MAX_FIELD_BYTES)
+                            if not event.more_data:
+                                fields[part.name] = b"".join(value).decode("utf-8", "replace")
+                    event = decoder.next_event()
+    except BaseException:
+        if sink is not None:
+            sink.abort()
+        for finished_sink in finished:
+            finished_sink.discard()
+        raise
+    return fields, files
+
+
+def _read_chunks(stream, chunk_size):
+    """
+    按块读取流，结束时再产出一个 None，通知解码器数据已全部到达。
+    """
+    while True:
+        data = stream.read(chunk_size)
+        if not data:
+            break
+        yield data
+    yield None
+
+
+def discard_uploads(files):
+    """
+    删除 ingest_multipart 暂存的文件（例如校验失败时）。
+    """
+    for uploaded in files.values():
+        if os.path.exists(uploaded["local_url"]):
+            os.remove(uploaded["local_url"])
@@ -0,0 +1,209 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS job_items (
+    job_id TEXT NOT NULL REFERENCES jobs(job_id) ON DELETE CASCADE,
+    name TEXT NOT NULL,
+    value TEXT NOT NULL,
+    PRIMARY KEY (job_id, name)
+);
+CREATE TABLE IF NOT EXISTS sentences (
+    job_id TEXT NOT NULL REFERENCES jobs(job_id) ON DELETE CASCADE,
+    kind TEXT NOT NULL,
+    sentence_id INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (job_id, kind, sentence_id)
+);
+CREATE INDEX IF NOT EXISTS idx_sentences_position ON sentences (job_id, kind, position);
+"""
+
+# 阶段耗时汇总在 job_items 中的条目名前缀
+TIMINGS_PREFIX = "timings_"
+
+
+class JobStore:
+    """
+    基于 SQLite 的任务状态存储：每个任务（job）拥有独立的文件信息和句子记录，
+    句子按 (job_id, kind, sentence_id) 建立主键索引，进程重启后状态仍然保留。
+
+    kind 取值与原 file_info 中的句子列表一致："sentence_audio"（切割结果）和 "cloned_audio"（变声结果）。
+    """
+
+    def __init__(self, db_path):
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self._connection = sqlite3.connect(db_path, check_same_thread=False)
+        self._connection.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock, self._connection:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("PRAGMA foreign_keys=ON")
+            self._connection.executescript(SCHEMA)
+
+    def _touch(self, job_id):
+        self._connection.execute("UPDATE jobs SET updated_at = ? WHERE job_id = ?", (time.time(), job_id))
+
+    def create_job(self, job_id=None):
+        """
+        创建新任务。
+        :param job_id: 指定任务 ID，默认生成随机 ID
+        :return: 任务 ID
+        """
+        job_id = job_id or uuid.uuid4().hex
+        now = time.time()
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR IGNORE INTO jobs (job_id, created_at, updated_at) VALUES (?, ?, ?)",
+                (job_id, now, now)
+            )
+        return job_id
+
+    def job_exists(self, job_id):
+        with self._lock:
+            row = self._connection.execute("SELECT 1 FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return row is not None
+
+    def list_jobs(self):
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT job_id, created_at, updated_at FROM jobs ORDER BY updated_at DESC"
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def get(self, job_id, name, default=None):
+        """
+        读取任务的文件信息条目（如 "preprocessed_audio"、"reference_audio"）。
+        """
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT value FROM job_items WHERE job_id = ? AND name = ?", (job_id, name)
+            ).fetchone()
+        return json.loads(row["value"]) if row else default
+
+    def set(self, job_id, name, value):
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO job_items (job_id, name, value) VALUES (?, ?, ?)",
+                (job_id, name, json.dumps(value, ensure_ascii=False))
+            )
+            self._touch(job_id)
+
+    def find_items(self, name_prefix):
+        """
+        查找所有任务中名称以 name_prefix 开头的条目。
+        :return: [(job_id, name, value)]
+        """
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT job_id, name, value FROM job_items WHERE substr(name, 1, ?) = ?",
+                (len(name_prefix), name_prefix)
+            ).fetchall()
+        return [(row["job_id"], row["name"], json.loads(row["value"])) for row in rows]
+
+    def set_timings(self, job_id, stage, summary):
+        """
+        保存某个阶段的耗时汇总（见 utils.metrics.JobTimings.summary）。
+        """
+        self.set(job_id, f"{TIMINGS_PREFIX}{stage}", summary)
+
+    def get_timings(self, job_id):
+        """
+        读取任务各阶段的耗时汇总。
+        :return: {stage: summary}
+        """
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT name, value FROM job_items WHERE job_id = ? AND substr(name, 1, ?) = ?",
+                (job_id, len(TIMINGS_PREFIX), TIMINGS_PREFIX)
+            ).fetchall()
+        return {row["name"][len(TIMINGS_PREFIX):]: json.loads(row["value"]) for row in rows}
+
+    def set_sentences(self, job_id, kind, sentences):
+        """
+        整体替换某类句子记录，保留列表顺序。
+        """
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM sentences WHERE job_id = ? AND kind = ?", (job_id, kind))
+            self._connection.executemany(
+                "INSERT INTO sentences (job_id, kind, sentence_id, position, data) VALUES (?, ?, ?, ?, ?)",
+                [
+                    (job_id, kind, int(sentence["sentence_id"]), position, json.dumps(sentence, ensure_ascii=False))
+                    for position, sentence in enumerate(sentences)
+                ]
+            )
+            self._touch(job_id)
+
+    def get_sentences(self, job_id, kind):
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT data FROM sentences WHERE job_id = ? AND kind = ? ORDER BY position", (job_id, kind)
+            ).fetchall()
+        return [json.loads(row["data"]) for row in rows]
+
+    def get_sentence(self, job_id, kind, sentence_id):
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT data FROM sentences WHERE job_id = ? AND kind = ? AND sentence_id = ?",
+                (job_id, kind, int(sentence_id))
+            ).fetchone()
+        return json.loads(row["data"]) if row else None
+
+    def update_sentence(self, job_id, kind, sentence_id, fields):
+        """
+        按主键更新单个句子的字段。
+        :return: 更新后的句子记录，不存在时返回 None
+        """
+        with self._lock, self._connection:
+            row = self._connection.execute(
+                "SELECT data FROM sentences WHERE job_id = ? AND kind = ? AND sentence_id = ?",
+                (job_id, kind, int(sentence_id))
+            ).fetchone()
+            if row is None:
+                return None
+            sentence = json.loads(row["data"])
+            sentence.update(fields)
+            self._connection.execute(
+                "UPDATE sentences SET data = ? WHERE job_id = ? AND kind = ? AND sentence_id = ?",
+                (json.dumps(sentence, ensure_ascii=False), job_id, kind, int(sentence_id))
+            )
+            self._touch(job_id)
+        return sentence
+
+    def put_sentence(self, job_id, kind, sentence):
+        """
+        按主键整体替换单个已存在的句子记录，保持其原有顺序。
+        :return: 是否找到并替换了记录
+        """
+        with self._lock, self._connection:
+            cursor = self._connection.execute(
+                "UPDATE sentences SET data = ? WHERE job_id = ? AND kind = ? AND sentence_id = ?",
+                (json.dumps(sentence, ensure_ascii=False), job_id, kind, int(sentence["sentence_id"]))
+            )
+            self._touch(job_id)
+        return cursor.rowcount > 0
+
+    def get_info(self, job_id):
+        """
+        汇总任务的全部状态，结构与原全局 file_info 相同。
+        """
+        with self._lock:
+            items = self._connection.execute(
+                "SELECT name, value FROM job_items WHERE job_id = ?", (job_id,)
+            ).fetchall()
+            kinds = self._connection.execute(
+                "SELECT DISTINCT kind FROM sentences WHERE job_id = ?", (job_id,)
+            ).fetchall()
+        info = {row["name"]: json.loads(row["value"]) for row in items}
+        for row in kinds:
+            info[row["kind"]] = self.get_sentences(job_id, row["kind"])
+        return info
@@ -0,0 +1,180 @@
+import os
+
+import numpy as np
+import soundfile as sf
+
+from utils.oss_utils import upload_many_to_oss
+from utils.metrics import count
+from utils.transcription import cache_transcription, get_cached_transcription, recognize_audio_batch
+
+
+def frame_energies(audio_file, frame_ms=30, block_seconds=60):
+    """
+    分块读取音频并计算每帧的能量（dB），整段音频不必驻留内存。
+    :return: (energies_db, frame_length)
+    """
+    with sf.SoundFile(audio_file) as source:
+        frame_length = max(1, int(source.samplerate * frame_ms / 1000))
+        block_frames = max(1, int(block_seconds * source.samplerate) // frame_length) * frame_length
+        energies = []
+        for block in source.blocks(blocksize=block_frames, dtype="float32", always_2d=True):
+            mono = block.mean(axis=1)
+            frame_count = len(mono) // frame_length
+            if frame_count == 0:
+                continue
+            frames = mono[:frame_count * frame_length].reshape(frame_count, frame_length)
+            energies.append(np.mean(frames ** 2, axis=1))
+
+    if not energies:
+        return np.zeros(0, dtype=np.float32), frame_length
+    return 10 * np.log10(np.concatenate(energies) + 1e-10), frame_length
+
+
+def find_silence_cuts(energies_db, frame_length, sample_rate, chunk_seconds=300, search_seconds=30,
+                      min_silence_ms=300):
+    """
+    基于能量的静音检测：在每个目标切分点前后 search_seconds 范围内，选平滑后能量最低的位置作为切分点，
+    使切分尽量落在句间停顿处。最后一段短于半个 chunk_seconds 时并入前一段。
+
+    :param energies_db: 每帧能量（dB）
+    :param frame_length: 帧长（采样点）
+    :param sample_rate: 采样率
+    :param chunk_seconds: 目标分段时长（秒）
+    :param search_seconds: 切分点的搜索半径（秒）
+    :param min_silence_ms: 能量平滑窗口（毫秒），短于该时长的停顿不会被选中
+    :return: 切分点列表（采样点），不含首尾
+    """
+    frames_per_second = sample_rate / frame_length
+    chunk_frames = int(chunk_seconds * frames_per_second)
+    search_frames = int(search_seconds * frames_per_second)
+    total_frames = len(energies_db)
+    if chunk_frames <= 0 or total_frames < chunk_frames * 1.5:
+        return []
+
+    window = max(1, int(min_silence_ms / 1000 * frames_per_second))
+    smoothed = np.convolve(energies_db, np.ones(window) / window, mode="same")
+
+    cuts = []
+    previous = 0
+    while total_frames - previous >= chunk_frames * 1.5:
+        target = previous + chunk_frames
+        low = max(previous + chunk_frames // 2, target - search_frames)
+        high = min(total_frames - chunk_frames // 2, target + search_frames)
+        cut = low + int(np.argmin(smoothed[low:high])) if high > low else target
+        cuts.append(cut * frame_length + frame_length // 2)
+        previous = cut
+    return cuts
+
+
+def split_at_cuts(audio_file, cuts, output_folder):
+    """
+    按切分点把音频写成多个分段文件。
+    :return: [{"local_url", "offset_ms"}, ...]
+    """
+    os.makedirs(output_folder, exist_ok=True)
+    chunks = []
+    with sf.SoundFile(audio_file) as source:
+        bounds = [0] + list(cuts) + [source.frames]
+        for index, (start, end) in enumerate(zip(bounds[:-1], bounds[1:])):
+            source.seek(start)
+            chunk_path = os.path.join(output_folder, f"chunk_{index + 1}.wav")
+            sf.write(chunk_path, source.read(end - start, dtype="int16"), source.samplerate, subtype="PCM_16")
+            chunks.append({"local_url": chunk_path, "offset_ms": int(start * 1000 / source.samplerate)})
+    return chunks
+
+
+def _shift_times(item, offset_ms):
+    shifted = dict(item)
+    for field in ("begin_time", "end_time"):
+        if field in shifted:
+            shifted[field] = int(shifted[field]) + offset_ms
+    return shifted
+
+
+def stitch_transcriptions(results, offsets_ms, file_url=None):
+    """
+    将各分段的识别结果拼接为一份识别结果：句子和词的 begin_time / end_time 加上分段偏移，
+    sentence_id 按整体顺序重新编号，结构与单文件识别结果一致。
+    """
+    sentences = []
+    texts = []
+    content_duration = 0
+    for result, offset_ms in zip(results, offsets_ms):
+        transcript = (result.get("transcripts") or [{}])[0]
+        content_duration += int(transcript.get("content_duration_in_milliseconds", 0))
+        if transcript.get("text"):
+            texts.append(transcript["text"])
+        for sentence in transcript.get("sentences", []):
+            sentence = _shift_times(sentence, offset_ms)
+            if "words" in sentence:
+                sentence["words"] = [_shift_times(word, offset_ms) for word in sentence["words"]]
+            sentences.append(sentence)
+
+    sentences.sort(key=lambda sentence: int(sentence["begin_time"]))
+    for index, sentence in enumerate(sentences):
+        sentence["sentence_id"] = index + 1
+
+    properties = dict(results[0].get("properties", {})) if results else {}
+    return {
+        "file_url": file_url,
+        "properties": properties,
+        "transcripts": [{
+            "channel_id": 0,
+            "content_duration_in_milliseconds": content_duration,
+            "text": " ".join(texts),
+            "sentences": sentences,
+        }],
+    }
+
+
+def is_long_audio(audio_file, min_seconds):
+    """
+    判断音频时长是否达到长音频模式的阈值。
+    """
+    return min_seconds is not None and sf.info(audio_file).duration >= min_seconds
+
+
+def recognize_long_audio(audio_file, chunk_folder, audio_url=None, chunk_seconds=300, search_seconds=30):
+    """
+    长音频识别：在静音处把预处理后的音频切成若干段，各段并发上传并在同一批次中并行识别，
+    最后按偏移拼接时间戳。音频不足 1.5 个分段时长时不切分。
+    拼接结果按整段音频的内容缓存（与 recognize_audio 使用同一个缓存键），相同音频再次识别时不再切分和上传。
+
+    :param audio_file: 预处理后的本地音频文件
+    :param chunk_folder: 分段文件的输出目录
+    :param audio_url: 整段音频的 OSS URL，写入结果的 file_url
+    :param chunk_seconds: 目标分段时长（秒）
+    :param search_seconds: 切分点的搜索半径（秒）
+    :return: 与 recognize_audio 结构一致的识别结果，失败时返回 {"error": ...}
+    """
+    cached_result = get_cached_transcription(audio_file)
+    if cached_result is not None:
+        count("transcription_cache_hits")
+        print("[INFO] Transcription cache hit for the whole long audio.")
+        return cached_result
+
+    try:
+        sample_rate = sf.info(audio_file).samplerate
+        energies_db, frame_length = frame_energies(audio_file)
+        cuts = find_silence_cuts(energies_db, frame_length, sample_rate, chunk_seconds, search_seconds)
+        chunks = split_at_cuts(audio_file, cuts, chunk_folder)
+        print(f"[INFO] Long-audio mode: split into {len(chunks)} chunk(s) at silence points.")
+
+        uploads = upload_many_to_oss([chunk["local_url"] for chunk in chunks])
+        failed_upload = next((upload for upload in uploads if "error" in upload), None)
+        if failed_upload:
+            return {"error": f"Failed to upload audio chunk: {failed_upload['error']}"}
+
+        results = recognize_audio_batch([upload["oss_url"] for upload in uploads],
+                                        [chunk["local_url"] for chunk in chunks])
+        for chunk, result in zip(chunks, results):
+            if "error" in result:
+                return {"error": f"Failed to transcribe {os.path.basename(chunk['local_url'])}: {result['error']}"}
+
+        transcription = stitch_transcriptions(results, [chunk["offset_ms"] for chunk in chunks], file_url=audio_url)
+        cache_transcription(audio_file, transcription)
+        return transcription
+
+    except Exception as e:
+        print(f"[ERROR] An exception occurred: {e}")
+        return {"error": f"An unexpected error occurred: {str(e)}"}
@@ -0,0 +1,429 @@
+import json
+import os
+
+import numpy as np
+import soundfile as sf
+
+from utils.cache_utils import atomic_write_json
+from utils.metrics import timed
+from utils.time_stretch import fit_clip_to_slot
+
+
+def ms_to_samples(ms, sample_rate):
+    """
+    将毫秒时间戳换算为采样点下标。
+    """
+    return int(round(int(ms) * sample_rate / 1000))
+
+
+def decode_clip(file_path):
+    """
+    一次性解码音频文件为浮点数组，不再经过临时 WAV 文件。
+    :param file_path: 音频文件路径（WAV/FLAC 直接读取，其余格式经 pydub/ffmpeg 解码）
+    :return: (samples, sample_rate)，samples 形状为 [采样点数, 声道数]，取值范围 [-1, 1]
+    """
+    if os.path.splitext(file_path)[1].lower() in (".wav", ".flac"):
+        samples, sample_rate = sf.read(file_path, dtype="float32", always_2d=True)
+        return samples, sample_rate
+
+    from pydub import AudioSegment
+
+    segment = AudioSegment.from_file(file_path)
+    samples = np.array(segment.get_array_of_samples(), dtype=np.float32).reshape(-1, segment.channels)
+    samples /= float(1 << (8 * segment.sample_width - 1))
+    return samples, segment.frame_rate
+
+
+def conform_clip(samples, sample_rate, target_rate, target_channels):
+    """
+    将片段转换为目标采样率和声道数（线性插值重采样，仅在片段参数与时间轴不一致时发生）。
+    """
+    if samples.shape[1] != target_channels:
+        mono = samples.mean(axis=1, keepdims=True)
+        samples = np.repeat(mono, target_channels, axis=1)
+
+    if sample_rate != target_rate and len(samples):
+        target_length = int(round(len(samples) * target_rate / sample_rate))
+        source_positions = np.linspace(0, len(samples) - 1, num=target_length)
+        samples = np.stack(
+            [np.interp(source_positions, np.arange(len(samples)), samples[:, ch]) for ch in range(target_channels)],
+            axis=1
+        ).astype(np.float32)
+
+    return samples
+
+
+def _collect_clips(cloned_audio):
+    """
+    过滤掉本地文件不存在的片段，并按时间轴顺序排列。
+    """
+    clips = []
+    for audio_info in cloned_audio:
+        local_url = audio_info.get("local_url")
+        if not local_url or not os.path.exists(local_url):
+            print(f"[WARNING] 音频文件不存在: {local_url}")
+            continue
+        clips.append(audio_info)
+    return sorted(clips, key=lambda info: int(info["begin_time"]))
+
+
+def _next_begin_ms(clips, index):
+    """
+    下一个片段的开始时间；最后一个片段返回其自身的 end_time。
+    """
+    if index + 1 < len(clips):
+        return int(clips[index + 1]["begin_time"])
+    return int(clips[index]["end_time"])
+
+
+def _decode_clips(clips):
+    """
+    逐个解码片段，跳过解码失败的文件。
+    :return: 生成 (audio_info, next_begin_ms, samples, sample_rate) 的迭代器，
+             next_begin_ms 为下一个片段的开始时间（最后一个片段为其自身的 end_time）
+    """
+    for index, audio_info in enumerate(clips):
+        local_url = audio_info["local_url"]
+        try:
+            samples, clip_rate = decode_clip(local_url)
+        except Exception as e:
+            print(f"[ERROR] 加载音频文件失败: {local_url}. 错误: {e}")
+            continue
+        yield audio_info, _next_begin_ms(clips, index), samples, clip_rate
+
+
+def _fit_clip(audio_info, next_begin_ms, samples, sample_rate, stretcher, max_stretch_ratio, overflow):
+    """
+    计算片段的时间槽并调整片段长度。
+    :return: (slot_start, fitted_samples)
+    """
+    slot_start = ms_to_samples(audio_info["begin_time"], sample_rate)
+    slot_end = ms_to_samples(audio_info["end_time"], sample_rate)
+    overflow_length = 0
+    if overflow == "gap":
+        overflow_length = max(0, ms_to_samples(next_begin_ms, sample_rate) - slot_end)
+    fitted = fit_clip_to_slot(samples, slot_end - slot_start, sample_rate, stretcher=stretcher,
+                              max_ratio=max_stretch_ratio, overflow_length=overflow_length)
+    return slot_start, fitted
+
+
+def slot_index_path(output_file):
+    """
+    合并文件对应的时间槽索引（与合并文件同目录的 JSON 文件）。
+    """
+    return os.path.splitext(output_file)[0] + ".slots.json"
+
+
+def _file_signature(file_path):
+    """
+    用文件大小和修改时间判断文件是否发生变化，无需读取内容。
+    """
+    stat = os.stat(file_path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def _slot_entry(audio_info, next_begin_ms, start, end):
+    """
+    时间槽索引中的一项：记录片段来源文件的签名，以及它在合并文件中实际占用的采样点范围 [start, end)。
+    """
+    return {
+        "sentence_id": audio_info.get("sentence_id"),
+        "local_url": audio_info["local_url"],
+        "signature": _file_signature(audio_info["local_url"]),
+        "begin_time": int(audio_info["begin_time"]),
+        "end_time": int(audio_info["end_time"]),
+        "next_begin_ms": int(next_begin_ms),
+        "start": int(start),
+        "end": int(end),
+    }
+
+
+def write_slot_index(output_file, slots, sample_rate, channels, stretcher, max_stretch_ratio, overflow):
+    """
+    合并完成后写出时间槽索引，供增量合并只重写发生变化的片段。
+    自定义的伸缩函数无法记录到索引中，此时删除旧索引，下次合并改为完整合并。
+    """
+    if not isinstance(stretcher, str):
+        if os.path.exists(slot_index_path(output_file)):
+            os.remove(slot_index_path(output_file))
+        return
+    frames = sf.info(output_file).frames
+    signature = _file_signature(output_file)
+    atomic_write_json(slot_index_path(output_file), {
+        "sample_rate": sample_rate,
+        "channels": channels,
+        "frames": frames,
+        # PCM_16 数据区紧跟在文件头之后
+        "data_offset": signature["size"] - frames * channels * 2,
+        "signature": signature,
+        "fit_options": [stretcher, float(max_stretch_ratio), overflow],
+        "slots": slots,
+    })
+
+
+def _load_slot_index(output_file, cloned_audio, stretcher, max_stretch_ratio, overflow):
+    """
+    读取并校验时间槽索引；合并文件、参数或句子集合与索引不一致时返回 (None, None)，需要完整合并。
+    :return: (index, clips)，clips 为按时间轴排序的有效片段
+    """
+    index_path = slot_index_path(output_file)
+    if not os.path.exists(output_file) or not os.path.exists(index_path):
+        return None, None
+    try:
+        with open(index_path, 'r', encoding='utf-8') as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        return None, None
+
+    if index.get("signature") != _file_signature(output_file):
+        return None, None
+    if index.get("fit_options") != [stretcher, float(max_stretch_ratio), overflow]:
+        return None, None
+
+    clips = _collect_clips(cloned_audio)
+    slots = index["slots"]
+    if len(clips) != len(slots):
+        return None, None
+    for position, (audio_info, slot) in enumerate(zip(clips, slots)):
+        if (audio_info.get("sentence_id") != slot["sentence_id"]
+                or int(audio_info["begin_time"]) != slot["begin_time"]
+                or int(audio_info["end_time"]) != slot["end_time"]
+                or _next_begin_ms(clips, position) != slot["next_begin_ms"]):
+            return None, None
+    return index, clips
+
+
+@timed("merge_patch")
+def patch_merged_clips(cloned_audio, output_file, stretcher="wsola", max_stretch_ratio=2.0, overflow="gap"):
+    """
+    增量合并：根据时间槽索引找出来源文件发生变化的片段，只在原合并文件中就地重写这些片段的采样点范围
+    （包括新片段溢出或变短后需要清零的部分），其余部分不读不写。
+
+    :param cloned_audio: 包含音频信息的列表（local_url / begin_time / end_time / sentence_id）。
+    :param output_file: 已有的合并音频文件路径。
+    :param stretcher: 时间伸缩实现，必须与生成合并文件时一致。
+    :param max_stretch_ratio: 最大压缩倍率，必须与生成合并文件时一致。
+    :param overflow: 溢出处理方式，必须与生成合并文件时一致。
+    :return: 被改写的字节范围列表 [(start, end), ...]（左闭右开，无变化时为空列表）；
+             无法增量合并时返回 None，由调用方改为完整合并。
+    """
+    index, clips = _load_slot_index(output_file, cloned_audio, stretcher, max_stretch_ratio, overflow)
+    if index is None:
+        return None
+
+    slots = index["slots"]
+    changed = [
+        position for position, (audio_info, slot) in enumerate(zip(clips, slots))
+        if audio_info["local_url"] != slot["local_url"]
+        or _file_signature(audio_info["local_url"]) != slot["signature"]
+    ]
+    if not changed:
+        return []
+
+    sample_rate, channels, frames = index["sample_rate"], index["channels"], index["frames"]
+    frame_bytes = channels * 2
+    dirty_ranges = []
+
+    with sf.SoundFile(output_file, mode="r+") as output:
+        for position in changed:
+            audio_info, slot = clips[position], slots[position]
+            try:
+                samples, clip_rate = decode_clip(audio_info["local_url"])
+            except Exception as e:
+                print(f"[ERROR] 加载音频文件失败: {audio_info['local_url']}. 错误: {e}")
+                return None
+
+            samples = conform_clip(samples, clip_rate, sample_rate, channels)
+            slot_start, fitted = _fit_clip(audio_info, slot["next_begin_ms"], samples, sample_rate,
+                                           stretcher, max_stretch_ratio, overflow)
+
+            # 不覆盖相邻片段实际占用的范围
+            lower = max(slot_start, slots[position - 1]["end"] if position > 0 else 0)
+            upper = slots[position + 1]["start"] if position + 1 < len(slots) else frames
+            new_end = max(lower, min(slot_start + len(fitted), upper))
+            rewrite_end = max(new_end, slot["end"])
+
+            block = np.zeros((rewrite_end - lower, channels), dtype=np.float32)
+            block[:new_end - lower] = fitted[lower - slot_start:new_end - slot_start]
+            output.seek(lower)
+            output.write(block)
+
+            slots[position] = _slot_entry(audio_info, slot["next_begin_ms"], lower, new_end)
+            dirty_ranges.append((index["data_offset"] + lower * frame_bytes,
+                                 index["data_offset"] + rewrite_end * frame_bytes))
+
+    write_slot_index(output_file, slots, sample_rate, channels, stretcher, max_stretch_ratio, overflow)
+    print(f"[INFO] 增量合并完成，重写了 {len(changed)} 个片段: {output_file}")
+    return dirty_ranges
+
+
+def merge_clips_to_buffer(cloned_audio, output_file, stretcher="wsola", max_stretch_ratio=2.0, overflow="gap"):
+    """
+    NumPy 合并引擎：每个片段只解码一次，按最后一个 end_time 预先分配整条时间轴缓冲区，
+    按时间槽偏移写入片段后一次性写出 WAV 文件。
+
+    :param cloned_audio: 包含音频信息的列表（local_url / begin_time / end_time）。
+    :param output_file: 合并后音频的输出路径。
+    :param stretcher: 片段长于时间槽时使用的时间伸缩实现（见 utils.time_stretch.STRETCHERS）。
+    :param max_stretch_ratio: 最大压缩倍率。
+    :param overflow: 压缩后仍超长时的处理方式："gap" 溢出到下一句之前的空白，"trim" 截断到时间槽内。
+    :return: 合并后的音频文件路径，失败时返回 None。
+    """
+    os.makedirs(os.path.dirname(output_file) or ".", exist_ok=True)
+
+    clips = _collect_clips(cloned_audio)
+    if not clips:
+        print("[ERROR] 没有可合并的音频文件")
+        return None
+
+    total_ms = max(int(info["end_time"]) for info in clips)
+    buffer = None
+    sample_rate = channels = None
+    slots = []
+
+    for audio_info, next_begin_ms, samples, clip_rate in _decode_clips(clips):
+        # 以第一个成功解码的片段确定时间轴的采样率和声道数，并一次性分配缓冲区
+        if buffer is None:
+            sample_rate, channels = clip_rate, samples.shape[1]
+            buffer = np.zeros((ms_to_samples(total_ms, sample_rate), channels), dtype=np.float32)
+
+        samples = conform_clip(samples, clip_rate, sample_rate, channels)
+        slot_start, fitted = _fit_clip(audio_info, next_begin_ms, samples, sample_rate,
+                                       stretcher, max_stretch_ratio, overflow)
+        buffer[slot_start:slot_start + len(fitted)] = fitted
+        slots.append(_slot_entry(audio_info, next_begin_ms, slot_start, slot_start + len(fitted)))
+
+    if buffer is None:
+        print("[ERROR] 所有音频文件均解码失败")
+        return None
+
+    try:
+        sf.write(output_file, buffer, sample_rate, subtype="PCM_16")
+        write_slot_index(output_file, slots, sample_rate, channels, stretcher, max_stretch_ratio, overflow)
+        print(f"[INFO] 合并完成，输出文件为: {output_file}")
+        return output_file
+    except Exception as e:
+        print(f"[ERROR] 无法导出音频文件: {output_file}. 错误: {e}")
+        return None
+
+
+def _write_silence(output, frames, channels, block_frames):
+    """
+    分块写入静音，避免为长时间空白分配大数组。
+    """
+    block = np.zeros((min(frames, block_frames), channels), dtype=np.float32)
+    while frames > 0:
+        count = min(frames, block_frames)
+        output.write(block[:count])
+        frames -= count
+
+
+class StreamingMergeWriter:
+    """
+    流式合并写入器：按时间轴顺序逐个接收片段，把静音间隔和调整后的片段直接追加到输出文件。
+    片段可以边生成边写入（例如一键流水线中变声结果陆续到达时），峰值内存约为单个片段大小。
+    """
+
+    def __init__(self, output_file, stretcher="wsola", max_stretch_ratio=2.0, overflow="gap", block_seconds=10):
+        os.makedirs(os.path.dirname(output_file) or ".", exist_ok=True)
+        self.output_file = output_file
+        self.fit_options = (stretcher, max_stretch_ratio, overflow)
+        self.block_seconds = block_seconds
+        self.output = None
+        self.sample_rate = self.channels = None
+        self.position = 0
+        self.slots = []
+
+    @timed("merge_sentence")
+    def add(self, audio_info, next_begin_ms):
+        """
+        写入一个片段（必须按 begin_time 递增顺序调用）；文件缺失或解码失败时跳过。
+        :param audio_info: 片段信息（local_url / begin_time / end_time）
+        :param next_begin_ms: 下一个片段的开始时间，用于计算可溢出的空白
+        :return: 是否写入成功
+        """
+        local_url = audio_info.get("local_url")
+        if not local_url or not os.path.exists(local_url):
+            print(f"[WARNING] 音频文件不存在: {local_url}")
+            return False
+        try:
+            samples, clip_rate = decode_clip(local_url)
+        except Exception as e:
+            print(f"[ERROR] 加载音频文件失败: {local_url}. 错误: {e}")
+            return False
+
+        # 以第一个成功解码的片段确定输出文件的采样率和声道数
+        if self.output is None:
+            self.sample_rate, self.channels = clip_rate, samples.shape[1]
+            self.output = sf.SoundFile(self.output_file, mode="w", samplerate=self.sample_rate,
+                                       channels=self.channels, subtype="PCM_16", format="WAV")
+
+        samples = conform_clip(samples, clip_rate, self.sample_rate, self.channels)
+        slot_start, fitted = _fit_clip(audio_info, next_begin_ms, samples, self.sample_rate, *self.fit_options)
+
+        # 填充到时间槽起点的静音；时间槽与已写内容重叠时丢弃重叠部分
+        if slot_start > self.position:
+            self._write_silence(slot_start - self.position)
+            self.position = slot_start
+        fitted = fitted[self.position - slot_start:]
+
+        self.output.write(fitted)
+        self.slots.append(_slot_entry(audio_info, next_begin_ms, self.position, self.position + len(fitted)))
+        self.position += len(fitted)
+        return True
+
+    def _write_silence(self, frames):
+        _write_silence(self.output, frames, self.channels, int(self.block_seconds * self.sample_rate))
+
+    def close(self, total_ms):
+        """
+        补齐静音到 total_ms 并关闭文件。
+        :return: 是否写入过任何片段
+        """
+        if self.output is None:
+            return False
+        try:
+            total_frames = ms_to_samples(total_ms, self.sample_rate)
+            if total_frames > self.position:
+                self._write_silence(total_frames - self.position)
+        finally:
+            self.output.close()
+        write_slot_index(self.output_file, self.slots, self.sample_rate, self.channels, *self.fit_options)
+        return True
+
+
+def merge_clips_streaming(cloned_audio, output_file, stretcher="wsola", max_stretch_ratio=2.0, overflow="gap",
+                          block_seconds=10):
+    """
+    流式合并引擎：按时间轴顺序把静音间隔和调整后的片段直接写入输出文件，
+    峰值内存约为单个片段大小，与节目总时长无关。
+
+    :param cloned_audio: 包含音频信息的列表（local_url / begin_time / end_time）。
+    :param output_file: 合并后音频的输出路径。
+    :param stretcher: 片段长于时间槽时使用的时间伸缩实现（见 utils.time_stretch.STRETCHERS）。
+    :param max_stretch_ratio: 最大压缩倍率。
+    :param overflow: 压缩后仍超长时的处理方式："gap" 溢出到下一句之前的空白，"trim" 截断到时间槽内。
+    :param block_seconds: 写入静音时每个块的时长（秒）。
+    :return: 合并后的音频文件路径，失败时返回 None。
+    """
+    clips = _collect_clips(cloned_audio)
+    if not clips:
+        print("[ERROR] 没有可合并的音频文件")
+        return None
+
+    writer = StreamingMergeWriter(output_file, stretcher, max_stretch_ratio, overflow, block_seconds)
+    try:
+        for index, audio_info in enumerate(clips):
+            writer.add(audio_info, _next_begin_ms(clips, index))
+
+        if not writer.close(max(int(info["end_time"]) for info in clips)):
+            print("[ERROR] 所有音频文件均解码失败")
+            return None
+
+        print(f"[INFO] 合并完成，输出文件为: {output_file}")
+        return output_file
+    except Exception as e:
+        print(f"[ERROR] 无法导出音频文件: {output_file}. 错误: {e}")
+        if writer.output is not None and not writer.output.closed:
+            writer.output.close()
+        return None
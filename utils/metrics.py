@@ -0,0 +1,306 @@
+import bisect
+import contextvars
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import wraps
+
+# 指标名前缀
+NAMESPACE = "voiceclone"
+
+# 延迟直方图的桶上界（秒）
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# 已知指标的说明，未登记的指标使用通用说明
+DESCRIPTIONS = {
+    "stage_duration_seconds": "Wall time of a job stage (route or background task).",
+    "stages": "Finished job stages by outcome.",
+    "operation_duration_seconds": "Wall time of an instrumented operation.",
+    "operation_errors": "Instrumented operations that raised an exception.",
+    "oss_uploads": "Objects uploaded to OSS.",
+    "oss_upload_bytes": "Bytes sent to OSS.",
+    "oss_upload_skipped": "OSS uploads skipped because the content already exists.",
+    "ingested_bytes": "Bytes of uploaded files received by streaming ingestion.",
+    "transcription_files": "Audio files submitted for transcription.",
+    "transcription_cache_hits": "Transcriptions served from the local cache.",
+    "synthesized_sentences": "Sentences synthesized through DashScope.",
+    "synthesis_cache_hits": "Sentences served from the synthesis cache.",
+    "synthesis_audio_bytes": "PCM bytes received from streaming synthesis.",
+    "synthesis_ttfb_seconds": "Time to first audio byte of streaming synthesis.",
+    "enrolled_voices": "Voices enrolled through DashScope.",
+    "voice_cache_hits": "Cached voice IDs reused without enrolling again.",
+}
+
+
+class LatencyHistogram:
+    """
+    累积式延迟直方图，格式与 Prometheus histogram 一致。
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+
+    def snapshot(self):
+        cumulative = 0
+        buckets = {}
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            cumulative += count
+            buckets["+Inf" if bound == float("inf") else str(bound)] = cumulative
+        return {"count": self.count, "sum_seconds": round(self.total, 3), "buckets": buckets}
+
+
+def histogram_samples(labels, snapshot):
+    """
+    把 LatencyHistogram.snapshot() 展开为 Prometheus 样本 [(后缀, 标签, 值), ...]。
+    """
+    samples = [("_bucket", dict(labels, le=bound), count) for bound, count in snapshot["buckets"].items()]
+    samples.append(("_sum", labels, snapshot["sum_seconds"]))
+    samples.append(("_count", labels, snapshot["count"]))
+    return samples
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def format_family(name, metric_type, description, samples):
+    """
+    按 Prometheus 文本格式输出一个指标族。
+    :param samples: [(名称后缀, 标签字典, 值), ...]
+    """
+    lines = [f"# HELP {name} {description}", f"# TYPE {name} {metric_type}"]
+    for suffix, labels, value in samples:
+        label_text = ",".join(f'{key}="{_escape(label)}"' for key, label in labels.items())
+        lines.append(f"{name}{suffix}{{{label_text}}} {value}" if label_text else f"{name}{suffix} {value}")
+    return lines
+
+
+class MetricsRegistry:
+    """
+    进程内的计数器和延迟直方图，按 (指标名, 标签) 聚合，可输出 Prometheus 文本格式。
+    其他模块可通过 add_collector 注册自己的指标族（例如 DashScope 调度器的通道状态）。
+    """
+
+    def __init__(self, namespace=NAMESPACE):
+        self.namespace = namespace
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+        self._collectors = []
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted(labels.items()))
+
+    def inc(self, name, value=1, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, seconds, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = LatencyHistogram()
+            histogram.observe(seconds)
+
+    def add_collector(self, collector):
+        """
+        注册指标族生成函数，collector() 返回 [(指标名, 类型, 说明, 样本列表), ...]，指标名不含前缀。
+        """
+        self._collectors.append(collector)
+
+    def families(self):
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {key: histogram.snapshot() for key, histogram in self._histograms.items()}
+
+        families = {}
+        for (name, labels), value in sorted(counters.items()):
+            families.setdefault((f"{name}_total", "counter", DESCRIPTIONS.get(name, name)), []).append(
+                ("", dict(labels), value))
+        for (name, labels), snapshot in sorted(histograms.items()):
+            families.setdefault((name, "histogram", DESCRIPTIONS.get(name, name)), []).extend(
+                histogram_samples(dict(labels), snapshot))
+        result = [(name, metric_type, description, samples)
+                  for (name, metric_type, description), samples in families.items()]
+        for collector in self._collectors:
+            result.extend(collector())
+        return result
+
+    def render(self):
+        """
+        输出 Prometheus 文本格式（text/plain; version=0.0.4）。
+        """
+        lines = []
+        for name, metric_type, description, samples in self.families():
+            lines.extend(format_family(f"{self.namespace}_{name}", metric_type, description, samples))
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+
+class JobTimings:
+    """
+    单个任务阶段内的耗时汇总：各操作的次数、总耗时和最大耗时，以及计数器的累计值。
+    """
+
+    def __init__(self, stage=None):
+        self.stage = stage
+        self.started_at = time.perf_counter()
+        self.seconds = None
+        self.status = "running"
+        self._lock = threading.Lock()
+        self._operations = {}
+        self._counters = {}
+
+    def observe(self, operation, seconds):
+        with self._lock:
+            entry = self._operations.setdefault(operation, {"count": 0, "total_seconds": 0.0, "max_seconds": 0.0})
+            entry["count"] += 1
+            entry["total_seconds"] += seconds
+            entry["max_seconds"] = max(entry["max_seconds"], seconds)
+
+    def inc(self, name, value=1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def finish(self, status):
+        self.seconds = time.perf_counter() - self.started_at
+        self.status = status
+
+    def summary(self):
+        """
+        :return: 可 JSON 序列化的字典，操作按总耗时从高到低排列
+        """
+        with self._lock:
+            operations = sorted(self._operations.items(), key=lambda item: item[1]["total_seconds"], reverse=True)
+            counters = dict(self._counters)
+        seconds = self.seconds if self.seconds is not None else time.perf_counter() - self.started_at
+        return {
+            "stage": self.stage,
+            "status": self.status,
+            "seconds": round(seconds, 3),
+            "operations": {
+                operation: {
+                    "count": entry["count"],
+                    "total_seconds": round(entry["total_seconds"], 3),
+                    "max_seconds": round(entry["max_seconds"], 3),
+                }
+                for operation, entry in operations
+            },
+            "counters": counters,
+        }
+
+
+registry = MetricsRegistry()
+
+# 当前线程（或协程）所属的任务阶段，线程池中的函数需经 bind 包装才能继承
+_current_job = contextvars.ContextVar("metrics_current_job", default=None)
+
+
+def current_job():
+    return _current_job.get()
+
+
+@contextmanager
+def job_scope(timings):
+    """
+    在作用域内把计时和计数同时记入 timings（可为 None）。
+    """
+    token = _current_job.set(timings)
+    try:
+        yield timings
+    finally:
+        _current_job.reset(token)
+
+
+@contextmanager
+def stage_scope(stage):
+    """
+    记录一个任务阶段：阶段总耗时计入 stage_duration_seconds，阶段内的操作汇总到返回的 JobTimings。
+    """
+    timings = JobTimings(stage)
+    status = "failed"
+    try:
+        with job_scope(timings):
+            yield timings
+        status = "completed"
+    finally:
+        timings.finish(status)
+        registry.observe("stage_duration_seconds", timings.seconds, stage=stage)
+        registry.inc("stages", stage=stage, status=status)
+
+
+def bind(func):
+    """
+    包装提交到线程池的函数，使其在提交时所属的任务阶段中执行。
+    """
+    context = contextvars.copy_context()
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        return context.copy().run(func, *args, **kwargs)
+    return wrapper
+
+
+class ContextThreadPoolExecutor(ThreadPoolExecutor):
+    """
+    提交的函数在提交时所属的任务阶段中执行，线程池内的计时和计数也汇总到该阶段。
+    """
+
+    def submit(self, fn, /, *args, **kwargs):
+        return super().submit(bind(fn), *args, **kwargs)
+
+
+@contextmanager
+def timed(operation):
+    """
+    计时上下文管理器（也可用作函数装饰器）：耗时计入 operation_duration_seconds{operation=...}
+    和当前任务阶段；抛出异常时另计一次错误。
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        registry.inc("operation_errors", operation=operation)
+        raise
+    finally:
+        seconds = time.perf_counter() - start
+        registry.observe("operation_duration_seconds", seconds, operation=operation)
+        timings = _current_job.get()
+        if timings is not None:
+            timings.observe(operation, seconds)
+
+
+def count(name, value=1):
+    """
+    计数器加 value，同时计入当前任务阶段。
+    """
+    registry.inc(name, value)
+    timings = _current_job.get()
+    if timings is not None:
+        timings.inc(name, value)
+
+
+def observe(name, seconds):
+    """
+    记录一个不以 with 块计时的耗时（例如合成首包时间）。
+    """
+    registry.observe(name, seconds)
+    timings = _current_job.get()
+    if timings is not None:
+        timings.observe(name, seconds)
@@ -1,37 +1,402 @@
-import oss2
 import os
+import threading
+import uuid
 from decouple import config
 
-# 设置阿里云 OSS 参数
-OSS_ACCESS_KEY_ID = config('OSS_ACCESS_KEY_ID')
-OSS_ACCESS_KEY_SECRET = config('OSS_ACCESS_KEY_SECRET')
-OSS_BUCKET_NAME = 'voice-soa'
-OSS_ENDPOINT = 'oss-cn-shenzhen.aliyuncs.com'
+from utils.cache_utils import CACHE_FOLDER, hash_bytes, hash_file
+from utils.metrics import ContextThreadPoolExecutor, count, timed
 
+# 设置阿里云 OSS 参数（访问密钥在首次创建 Bucket 时读取）
+OSS_BUCKET_NAME = config('OSS_BUCKET_NAME', default='voice-soa')
+# 可指向本地替身服务，例如 http://127.0.0.1:9000
+OSS_ENDPOINT = config('OSS_ENDPOINT', default='oss-cn-shenzhen.aliyuncs.com')
 
-def upload_to_oss(file_path):
+# 连接池大小与分片上传参数
+OSS_CONNECTION_POOL_SIZE = config('OSS_CONNECTION_POOL_SIZE', default=32, cast=int)
+OSS_MULTIPART_THRESHOLD = config('OSS_MULTIPART_THRESHOLD', default=20 * 1024 * 1024, cast=int)
+OSS_PART_SIZE = config('OSS_PART_SIZE', default=5 * 1024 * 1024, cast=int)
+OSS_MULTIPART_THREADS = config('OSS_MULTIPART_THREADS', default=4, cast=int)
+
+# CopyObject 只支持 1GB 以内的对象，更大的对象按分片在服务端复制
+OSS_COPY_OBJECT_MAX_BYTES = 1024 * 1024 * 1024
+OSS_COPY_PART_SIZE = 100 * 1024 * 1024
+
+# 按内容摘要生成对象键，相同内容只上传一次，不同任务的同名文件互不覆盖
+OSS_CONTENT_ADDRESSED = config('OSS_CONTENT_ADDRESSED', default=True, cast=bool)
+OSS_UPLOAD_INDEX_FOLDER = os.path.join(CACHE_FOLDER, 'oss_index')
+
+# 模块级共享的 Bucket，复用底层 HTTP 连接
+_bucket = None
+_bucket_lock = threading.Lock()
+
+
+def get_bucket():
+    """
+    返回进程内共享的 OSS Bucket 客户端，首次调用时导入 oss2、读取访问密钥并创建；
+    oss2.Session 是线程安全的，可在线程池中复用。
     """
-    上传文件到阿里云 OSS。
+    global _bucket
+    if _bucket is None:
+        with _bucket_lock:
+            if _bucket is None:
+                import oss2
+                auth = oss2.Auth(config('OSS_ACCESS_KEY_ID'), config('OSS_ACCESS_KEY_SECRET'))
+                session = oss2.Session(pool_size=OSS_CONNECTION_POOL_SIZE)
+                _bucket = oss2.Bucket(auth, OSS_ENDPOINT, OSS_BUCKET_NAME, session=session)
+    return _bucket
+
+
+def get_object_url(oss_key):
+    """
+    根据对象键生成访问 URL；自定义带协议的 Endpoint（如本地替身）使用路径风格地址。
+    """
+    if OSS_ENDPOINT.startswith(("http://", "https://")):
+        return f"{OSS_ENDPOINT.rstrip('/')}/{OSS_BUCKET_NAME}/{oss_key}"
+    return f"https://{OSS_BUCKET_NAME}.{OSS_ENDPOINT}/{oss_key}"
+
+
+def object_key_from_url(url):
+    """
+    get_object_url 的逆操作：从本模块生成的 URL 中取出对象键，无法识别时返回 None。
+    """
+    for prefix in (get_object_url(""), f"https://{OSS_BUCKET_NAME}.{OSS_ENDPOINT}/"):
+        if url and url.startswith(prefix):
+            return url[len(prefix):]
+    return None
+
+
+def _index_marker_path(oss_key):
+    """
+    本地上传索引：每个已确认存在于 OSS 的对象对应一个空标记文件，按 Endpoint/Bucket/对象键的摘要存放。
+    """
+    marker = hash_bytes(f"{OSS_ENDPOINT}/{OSS_BUCKET_NAME}/{oss_key}".encode("utf-8"))
+    return os.path.join(OSS_UPLOAD_INDEX_FOLDER, marker[:2], marker)
+
+
+def _mark_uploaded(oss_key):
+    marker_path = _index_marker_path(oss_key)
+    os.makedirs(os.path.dirname(marker_path), exist_ok=True)
+    open(marker_path, 'a').close()
+
+
+def _unmark_uploaded(oss_key):
+    marker_path = _index_marker_path(oss_key)
+    if os.path.exists(marker_path):
+        os.remove(marker_path)
+
+
+def content_addressed_key(file_path, content_hash=None):
+    """
+    以文件内容的 SHA-256 摘要作为对象键，保留原扩展名。
+    :param content_hash: 已知的内容摘要，为空时读取文件计算
+    """
+    extension = os.path.splitext(file_path)[-1].lower()
+    return f"audio/{content_hash or hash_file(file_path)}{extension}"
+
+
+def _object_uploaded(bucket, oss_key):
+    """
+    按内容寻址的对象是否已上传：先查本地索引，再查 OSS。
+    """
+    if os.path.exists(_index_marker_path(oss_key)):
+        return True
+    if bucket.object_exists(oss_key):
+        _mark_uploaded(oss_key)
+        print(f"[INFO] Object already exists in OSS, skipping upload: {oss_key}")
+        return True
+    return False
+
+
+def upload_to_oss(file_path, content_addressed=None):
+    """
+    上传文件到阿里云 OSS。大文件使用可断点续传的分片上传。
+    按内容寻址时，本地索引或 OSS 上已存在相同内容的对象会直接返回 URL，不再重复上传。
     :param file_path: 本地文件路径
+    :param content_addressed: 是否以内容摘要作为对象键，默认取 OSS_CONTENT_ADDRESSED
     :return: 文件在 OSS 上的 URL
     """
-    # 创建 OSS 客户端
-    auth = oss2.Auth(OSS_ACCESS_KEY_ID, OSS_ACCESS_KEY_SECRET)
-    bucket = oss2.Bucket(auth, OSS_ENDPOINT, OSS_BUCKET_NAME)
+    import oss2
 
-    # 获取文件的扩展名
-    filename = os.path.basename(file_path)
-    file_extension = os.path.splitext(filename)[-1]  # 获取文件扩展名，例如 ".mp3"
+    bucket = get_bucket()
+    if content_addressed is None:
+        content_addressed = OSS_CONTENT_ADDRESSED
 
-    # 生成文件在 OSS 上的路径，假设是上传到 "audio" 目录下
-    oss_key = f"audio/{filename}"
+    if content_addressed:
+        oss_key = content_addressed_key(file_path)
+
+        # 先查本地索引，再查 OSS，已存在则跳过上传
+        if _object_uploaded(bucket, oss_key):
+            count("oss_upload_skipped")
+            return get_object_url(oss_key)
+    else:
+        # 生成文件在 OSS 上的路径，假设是上传到 "audio" 目录下
+        oss_key = f"audio/{os.path.basename(file_path)}"
 
     # 上传文件
-    with open(file_path, 'rb') as file:
-        bucket.put_object(oss_key, file)
+    file_size = os.path.getsize(file_path)
+    with timed("oss_upload"):
+        if file_size >= OSS_MULTIPART_THRESHOLD:
+            print(f"[INFO] Uploading large file with multipart upload: {file_path}")
+            oss2.resumable_upload(
+                bucket, oss_key, file_path,
+                store=oss2.ResumableStore(root=os.path.join(CACHE_FOLDER, 'oss')),
+                multipart_threshold=OSS_MULTIPART_THRESHOLD,
+                part_size=OSS_PART_SIZE,
+                num_threads=OSS_MULTIPART_THREADS
+            )
+        else:
+            with open(file_path, 'rb') as file:
+                bucket.put_object(oss_key, file)
+    count("oss_uploads")
+    count("oss_upload_bytes", file_size)
+
+    if content_addressed:
+        _mark_uploaded(oss_key)
 
     # 返回文件的 URL
-    return f"https://{OSS_BUCKET_NAME}.{OSS_ENDPOINT}/{oss_key}"
+    return get_object_url(oss_key)
+
+
+def _overlaps(start, end, ranges):
+    return any(start < range_end and range_start < end for range_start, range_end in ranges)
+
+
+def upload_patched_to_oss(file_path, source_url, dirty_ranges, target_key):
+    """
+    重新上传一个只修改了局部字节的文件（例如增量合并后的音频）：未修改的分片直接在 OSS 服务端
+    从原对象复制（UploadPartCopy），只有包含修改字节的分片从本地上传。
+    文件小于分片上传阈值、原对象无法识别或服务端复制失败时，退回普通上传。
+
+    结果写入调用方给定的固定对象键（例如按任务区分的键），不按内容寻址：
+    计算内容摘要需要读取整个文件，本机的读取量将与文件大小而不是修改范围成正比。
+
+    :param file_path: 本地文件路径（大小与原对象一致）
+    :param source_url: 原对象的 URL
+    :param dirty_ranges: 修改过的字节范围列表 [(start, end), ...]，左闭右开
+    :param target_key: 目标对象键，可以与原对象相同（原地更新）
+    :return: 文件在 OSS 上的 URL
+    """
+    import oss2
+
+    if not dirty_ranges:
+        return source_url
+
+    source_key = object_key_from_url(source_url)
+    file_size = os.path.getsize(file_path)
+    if source_key is None or file_size < OSS_MULTIPART_THRESHOLD:
+        return upload_to_oss(file_path)
+
+    bucket = get_bucket()
+    part_count = (file_size + OSS_PART_SIZE - 1) // OSS_PART_SIZE
+    dirty_parts = {
+        part_number for part_number in range(1, part_count + 1)
+        if _overlaps((part_number - 1) * OSS_PART_SIZE, part_number * OSS_PART_SIZE, dirty_ranges)
+    }
+    upload_id = bucket.init_multipart_upload(target_key).upload_id
+
+    def upload_part(part_number):
+        start = (part_number - 1) * OSS_PART_SIZE
+        end = min(start + OSS_PART_SIZE, file_size)
+        if part_number in dirty_parts:
+            with open(file_path, 'rb') as file:
+                file.seek(start)
+                result = bucket.upload_part(target_key, upload_id, part_number, file.read(end - start))
+        else:
+            result = bucket.upload_part_copy(OSS_BUCKET_NAME, source_key, (start, end - 1),
+                                             target_key, upload_id, part_number)
+        return oss2.models.PartInfo(part_number, result.etag)
+
+    try:
+        with timed("oss_patched_upload"):
+            with ContextThreadPoolExecutor(max_workers=OSS_MULTIPART_THREADS,
+                                           thread_name_prefix="oss-part") as executor:
+                parts = list(executor.map(upload_part, range(1, part_count + 1)))
+            bucket.complete_multipart_upload(target_key, upload_id, parts)
+    except oss2.exceptions.OssError as e:
+        print(f"[WARNING] Server-side part copy failed, falling back to full upload: {e}")
+        bucket.abort_multipart_upload(target_key, upload_id)
+        return upload_to_oss(file_path)
+
+    count("oss_uploads")
+    count("oss_upload_bytes", sum(min(OSS_PART_SIZE, file_size - (part_number - 1) * OSS_PART_SIZE)
+                                  for part_number in dirty_parts))
+    print(f"[INFO] Patched upload finished, {len(dirty_parts)}/{part_count} parts re-sent: {target_key}")
+    return get_object_url(target_key)
+
+
+def copy_object(source_key, target_key, size):
+    """
+    在 OSS 服务端复制对象，数据不经过本机；超过 CopyObject 上限的对象按分片复制。
+    """
+    import oss2
+
+    bucket = get_bucket()
+    if size <= OSS_COPY_OBJECT_MAX_BYTES:
+        bucket.copy_object(OSS_BUCKET_NAME, source_key, target_key)
+        return
+
+    upload_id = bucket.init_multipart_upload(target_key).upload_id
+    try:
+        parts = []
+        for part_number, start in enumerate(range(0, size, OSS_COPY_PART_SIZE), start=1):
+            end = min(start + OSS_COPY_PART_SIZE, size) - 1
+            result = bucket.upload_part_copy(OSS_BUCKET_NAME, source_key, (start, end),
+                                             target_key, upload_id, part_number)
+            parts.append(oss2.models.PartInfo(part_number, result.etag))
+        bucket.complete_multipart_upload(target_key, upload_id, parts)
+    except oss2.exceptions.OssError:
+        bucket.abort_multipart_upload(target_key, upload_id)
+        raise
+
+
+class StreamingUpload:
+    """
+    边接收边上传：write 写入的数据按 OSS_PART_SIZE 缓冲，超过一个分片后才初始化分片上传，
+    之后每个分片提交到线程池上传，在途分片不超过 OSS_MULTIPART_THREADS 个（写满时 write 阻塞），
+    内存占用与文件大小无关；不足一个分片的文件在 finish 时一次性上传。
+
+    按内容寻址时，对象键要等全部数据写入、得到内容摘要后才能确定：分片先上传到临时对象，
+    finish 时在服务端复制到最终对象键；最终对象已存在时放弃本次分片上传。
+    """
+
+    def __init__(self, filename, content_addressed=None):
+        self.filename = os.path.basename(filename)
+        self.extension = os.path.splitext(self.filename)[-1].lower()
+        self.content_addressed = OSS_CONTENT_ADDRESSED if content_addressed is None else content_addressed
+        self.bucket = get_bucket()
+        self.size = 0
+        self._buffer = bytearray()
+        self._upload_key = None
+        self._upload_id = None
+        self._executor = None
+        self._futures = []
+        self._slots = threading.BoundedSemaphore(OSS_MULTIPART_THREADS)
+        # finish 实际写入的对象键；对象已存在而跳过上传时为 None
+        self.created_key = None
+
+    def write(self, data):
+        self._buffer += data
+        self.size += len(data)
+        # 至少留下一个字节作为最后一个分片，恰好一个分片大小的文件仍可一次性上传
+        while len(self._buffer) > OSS_PART_SIZE:
+            part = bytes(self._buffer[:OSS_PART_SIZE])
+            del self._buffer[:OSS_PART_SIZE]
+            self._submit_part(part)
+
+    def _submit_part(self, data):
+        if self._upload_id is None:
+            if self.content_addressed:
+                self._upload_key = f"audio/staging/{uuid.uuid4().hex}{self.extension}"
+            else:
+                self._upload_key = f"audio/{self.filename}"
+            self._upload_id = self.bucket.init_multipart_upload(self._upload_key).upload_id
+            self._executor = ContextThreadPoolExecutor(max_workers=OSS_MULTIPART_THREADS,
+                                                       thread_name_prefix="oss-stream")
+
+        # 已有分片失败时尽早报错，不再继续接收
+        for future in self._futures:
+            if future.done() and future.exception() is not None:
+                raise future.exception()
+
+        self._slots.acquire()
+        future = self._executor.submit(self._upload_part, len(self._futures) + 1, data)
+        future.add_done_callback(lambda _: self._slots.release())
+        self._futures.append(future)
+
+    def _upload_part(self, part_number, data):
+        import oss2
+
+        result = self.bucket.upload_part(self._upload_key, self._upload_id, part_number, data)
+        return oss2.models.PartInfo(part_number, result.etag)
+
+    def finish(self, content_hash=None):
+        """
+        上传剩余数据并完成上传。
+        :param content_hash: 内容的 SHA-256 摘要，按内容寻址时必填
+        :return: 文件在 OSS 上的 URL
+        """
+        if self.content_addressed:
+            target_key = f"audio/{content_hash}{self.extension}"
+        else:
+            target_key = f"audio/{self.filename}"
+
+        with timed("oss_stream_finish"):
+            if self._upload_id is None:
+                if self.content_addressed and _object_uploaded(self.bucket, target_key):
+                    count("oss_upload_skipped")
+                    return get_object_url(target_key)
+                self.bucket.put_object(target_key, bytes(self._buffer))
+            else:
+                if self._buffer:
+                    self._submit_part(bytes(self._buffer))
+                    self._buffer = bytearray()
+                parts = [future.result() for future in self._futures]
+                self._executor.shutdown()
+                if self.content_addressed and _object_uploaded(self.bucket, target_key):
+                    self.abort()
+                    count("oss_upload_skipped")
+                    return get_object_url(target_key)
+                self.bucket.complete_multipart_upload(self._upload_key, self._upload_id, parts)
+                self._upload_id = None
+                if self._upload_key != target_key:
+                    copy_object(self._upload_key, target_key, self.size)
+                    self.bucket.delete_object(self._upload_key)
+
+        self.created_key = target_key
+        count("oss_uploads")
+        count("oss_upload_bytes", self.size)
+        if self.content_addressed:
+            _mark_uploaded(target_key)
+        return get_object_url(target_key)
+
+    def abort(self):
+        """
+        放弃上传：取消未开始的分片并中止分片上传。
+        """
+        import oss2
+
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+        if self._upload_id is not None:
+            try:
+                self.bucket.abort_multipart_upload(self._upload_key, self._upload_id)
+            except oss2.exceptions.OssError as e:
+                print(f"[WARNING] Failed to abort multipart upload {self._upload_id}: {e}")
+            self._upload_id = None
+
+    def delete(self):
+        """
+        撤销已完成的上传：删除本次写入的对象（跳过上传时复用的已有对象不删除）。
+        """
+        import oss2
+
+        if self.created_key is None:
+            return
+        try:
+            self.bucket.delete_object(self.created_key)
+            if self.content_addressed:
+                _unmark_uploaded(self.created_key)
+        except oss2.exceptions.OssError as e:
+            print(f"[WARNING] Failed to delete uploaded object {self.created_key}: {e}")
+        self.created_key = None
+
+
+def upload_many_to_oss(file_paths, max_workers=8):
+    """
+    并发上传多个文件，并发数受 max_workers 限制。
+    :param file_paths: 本地文件路径列表
+    :param max_workers: 最大并发上传数
+    :return: 与 file_paths 顺序一致的列表，每项为 {"local_url", "oss_url"}，失败时为 {"local_url", "error"}
+    """
+    def upload_one(file_path):
+        try:
+            return {"local_url": file_path, "oss_url": upload_to_oss(file_path)}
+        except Exception as e:
+            print(f"[ERROR] Failed to upload {file_path}: {e}")
+            return {"local_url": file_path, "error": str(e)}
+
+    with ContextThreadPoolExecutor(max_workers=max(1, int(max_workers)), thread_name_prefix="oss-upload") as executor:
+        return list(executor.map(upload_one, file_paths))
 
 
 # 示例调用
@@ -0,0 +1,215 @@
+import json
+import os
+import time
+
+from utils.audio_utils import export_sentence, preprocess_audio, read_audio_for_split
+from utils.long_audio import is_long_audio, recognize_long_audio
+from utils.merge_utils import StreamingMergeWriter
+from utils.metrics import ContextThreadPoolExecutor
+from utils.oss_utils import upload_to_oss
+from utils.subtitle_utils import generate_srt
+from utils.transcription import recognize_audio
+from utils.voice_util import TARGET_MODEL, CloneManifest, clone_single_sentence, get_or_create_voice
+
+
+class StageTimer:
+    """
+    记录流水线各阶段的起止时间（相对流水线开始的秒数），用于观察各阶段的重叠情况。
+    """
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.stages = {}
+
+    def run(self, name, func, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            self.mark(name, start, time.perf_counter())
+
+    def mark(self, name, start, end):
+        self.stages[name] = {
+            "start": round(start - self.started_at, 3),
+            "end": round(end - self.started_at, 3),
+            "seconds": round(end - start, 3),
+        }
+
+    def track_futures(self, name, futures):
+        """
+        记录一组并发任务的整体耗时：从调用时刻到最后一个任务完成。
+        """
+        start = time.perf_counter()
+        pending = [len(futures)]
+        if not futures:
+            self.mark(name, start, start)
+
+        def on_done(_):
+            pending[0] -= 1
+            if pending[0] == 0:
+                self.mark(name, start, time.perf_counter())
+
+        for future in futures:
+            future.add_done_callback(on_done)
+
+    def summary(self):
+        return {"total_seconds": round(time.perf_counter() - self.started_at, 3), "stages": self.stages}
+
+
+def _upload_record(file_path):
+    return {"local_url": file_path, "oss_url": upload_to_oss(file_path)}
+
+
+def run_pipeline(job_id, job_store, input_filepath, reference_audio_path, reference_text, folders, options,
+                 progress_callback=None):
+    """
+    一键流水线：把上传、预处理、识别、切割、变声、合并和字幕生成组织成流式 DAG。
+
+    - 参考音频上传与音色注册和预处理、识别并行执行；
+    - 识别完成后，切割与变声同时开始（变声只依赖句子文本，无需等待切割结果），字幕在另一线程生成；
+    - 合并按时间轴顺序消费陆续完成的变声结果，边合成边写入，最后一句完成后很快即可得到合并音频。
+    端到端耗时接近最慢阶段的耗时，而不是各阶段耗时之和。
+
+    :param job_id: 任务 ID
+    :param job_store: 任务状态存储，各阶段结果按与分步接口相同的条目名写入
+    :param input_filepath: 已保存到本地的待处理音频
+    :param reference_audio_path: 已保存到本地的参考音频
+    :param reference_text: 参考音频对应的文本
+    :param folders: 输出目录字典，键为 processed / json / sentences / cloned_audio / merge / subtitle
+    :param options: 运行参数字典，键为 preprocess_mode / preprocess_workers / split_max_workers /
+                    clone_max_workers / merge_options（传给 StreamingMergeWriter 的 stretcher 等参数），
+                    可选 long_audio_min_seconds / long_audio_chunk_seconds（达到阈值时按长音频模式识别）、
+                    upload_original（是否上传原始音频到 OSS，默认上传）
+    :param progress_callback: 每合并一个变声句子调用一次；若带 start(total) 方法，识别完成后先调用它
+    :return: 流水线结果字典（各阶段产物与耗时）
+    """
+    timer = StageTimer()
+
+    with ContextThreadPoolExecutor(max_workers=4, thread_name_prefix="pipeline-stage") as stage_pool:
+        # 与预处理、识别并行：上传原始音频（可选）、上传参考音频并注册音色
+        if options.get("upload_original", True):
+            original_future = stage_pool.submit(timer.run, "upload_original", _upload_record, input_filepath)
+        else:
+            original_future = stage_pool.submit(lambda: {"local_url": input_filepath, "oss_url": None})
+        reference_future = stage_pool.submit(timer.run, "upload_reference", _upload_record, reference_audio_path)
+        voice_future = stage_pool.submit(
+            lambda: timer.run("enrollment", get_or_create_voice, reference_future.result()["oss_url"],
+                              TARGET_MODEL, reference_audio_path)
+        )
+
+        # 预处理 -> 上传 -> 识别
+        preprocessed_filepath = timer.run("preprocess", preprocess_audio, input_filepath, folders["processed"],
+                                          mode=options["preprocess_mode"], workers=options["preprocess_workers"])
+        preprocessed_audio = timer.run("upload_preprocessed", _upload_record, preprocessed_filepath)
+        job_store.set(job_id, "preprocessed_audio", preprocessed_audio)
+
+        if is_long_audio(preprocessed_filepath, options.get("long_audio_min_seconds")):
+            transcription_json = timer.run("recognize", recognize_long_audio, preprocessed_filepath,
+                                           os.path.join(folders["processed"], "chunks"),
+                                           audio_url=preprocessed_audio["oss_url"],
+                                           chunk_seconds=options.get("long_audio_chunk_seconds", 300))
+        else:
+            transcription_json = timer.run("recognize", recognize_audio, preprocessed_audio["oss_url"],
+                                           preprocessed_filepath)
+        if "error" in transcription_json:
+            raise RuntimeError(transcription_json["error"])
+
+        json_filepath = os.path.join(
+            folders["json"], f"{os.path.basename(preprocessed_filepath).split('.')[0]}_transcription.json"
+        )
+        with open(json_filepath, 'w', encoding='utf-8') as f:
+            json.dump(transcription_json, f, ensure_ascii=False, indent=4)
+        transcription_future = stage_pool.submit(timer.run, "upload_transcription", _upload_record, json_filepath)
+
+        sentences = transcription_json.get("transcripts", [])[0].get("sentences", [])
+        if hasattr(progress_callback, "start"):
+            progress_callback.start(len(sentences))
+
+        # 字幕只依赖识别结果，单独生成
+        def make_subtitles():
+            srt_filepath = os.path.join(folders["subtitle"], 'generated_subtitles.srt')
+            generate_srt(sentences, srt_filepath)
+            return _upload_record(srt_filepath)
+
+        srt_future = stage_pool.submit(timer.run, "subtitle", make_subtitles)
+
+        audio, sample_rate, subtype = read_audio_for_split(preprocessed_filepath)
+        merged_filepath = os.path.join(folders["merge"], 'merged_audio.wav')
+        writer = StreamingMergeWriter(merged_filepath, **options["merge_options"])
+
+        split_pool = ContextThreadPoolExecutor(max_workers=options["split_max_workers"],
+                                               thread_name_prefix="pipeline-split")
+        clone_pool = ContextThreadPoolExecutor(max_workers=options["clone_max_workers"],
+                                               thread_name_prefix="pipeline-clone")
+        try:
+            split_futures = [
+                split_pool.submit(export_sentence, sentence, audio, sample_rate, subtype, folders["sentences"])
+                for sentence in sentences
+            ]
+            timer.track_futures("split", split_futures)
+
+            voice_id = voice_future.result()
+            manifest = CloneManifest(folders["cloned_audio"])
+            checkpoints = manifest.load()
+            clone_futures = [
+                clone_pool.submit(clone_single_sentence, index, sentence, voice_id, TARGET_MODEL,
+                                  folders["cloned_audio"], None,
+                                  manifest=manifest, checkpoint=checkpoints.get(index + 1))
+                for index, sentence in enumerate(sentences)
+            ]
+            timer.track_futures("clone", clone_futures)
+
+            # 按时间轴顺序消费变声结果并流式写入合并文件
+            def merge_as_completed():
+                order = sorted(range(len(sentences)), key=lambda i: int(sentences[i]["begin_time"]))
+                for position, index in enumerate(order):
+                    audio_info = clone_futures[index].result()
+                    if position + 1 < len(order):
+                        next_begin_ms = int(sentences[order[position + 1]]["begin_time"])
+                    else:
+                        next_begin_ms = int(audio_info["end_time"])
+                    writer.add(audio_info, next_begin_ms)
+                    if progress_callback:
+                        progress_callback(audio_info["sentence_id"])
+                total_ms = max((int(sentence["end_time"]) for sentence in sentences), default=0)
+                if not writer.close(total_ms):
+                    raise RuntimeError("No cloned audio could be merged")
+
+            timer.run("merge", merge_as_completed)
+            sentence_audio_info = [future.result() for future in split_futures]
+            cloned_audio_info = [future.result() for future in clone_futures]
+        finally:
+            split_pool.shutdown(cancel_futures=True)
+            clone_pool.shutdown(cancel_futures=True)
+
+        merged_audio = timer.run("upload_merged", _upload_record, merged_filepath)
+
+        reference_audio = dict(reference_future.result(), text=reference_text)
+        transcription = transcription_future.result()
+        generated_srt = srt_future.result()
+        original_audio = original_future.result()
+
+    job_store.set(job_id, "original_audio", original_audio)
+    job_store.set(job_id, "reference_audio", reference_audio)
+    job_store.set(job_id, "transcription", transcription)
+    job_store.set_sentences(job_id, "sentence_audio", sentence_audio_info)
+    job_store.set_sentences(job_id, "cloned_audio", cloned_audio_info)
+    job_store.set(job_id, "merged_audio", merged_audio)
+    job_store.set(job_id, "generated_srt", generated_srt)
+
+    failed_sentences = [
+        {"sentence_id": info["sentence_id"], "error": info["error"]}
+        for info in sentence_audio_info + cloned_audio_info if "error" in info
+    ]
+
+    return {
+        "message": "Pipeline completed successfully!" if not failed_sentences
+        else f"Pipeline completed with {len(failed_sentences)} failed sentence step(s).",
+        "job_id": job_id,
+        "voice_id": voice_id,
+        "merged_audio": merged_audio,
+        "generated_srt": generated_srt,
+        "transcription": transcription,
+        "failed_sentences": failed_sentences,
+        "timings": timer.summary()
+    }
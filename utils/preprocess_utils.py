@@ -0,0 +1,218 @@
+import math
+import os
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
+
+import librosa  # librosa 的子模块在首次访问时才加载
+import numpy as np
+import soundfile as sf
+
+TARGET_SAMPLE_RATE = 16000
+
+
+def decode_stream(input_filepath, sample_rate=TARGET_SAMPLE_RATE, block_frames=TARGET_SAMPLE_RATE * 10):
+    """
+    通过 ffmpeg 一次性解码并重采样为单声道浮点 PCM，按块产出，避免整段音频驻留内存。
+    :param input_filepath: 输入音频文件路径（任意 ffmpeg 支持的格式）
+    :param sample_rate: 输出采样率
+    :param block_frames: 每块的采样点数
+    :return: 生成 float32 一维数组的迭代器
+    """
+    from pydub import AudioSegment
+
+    command = [
+        AudioSegment.converter, "-v", "error", "-nostdin", "-i", input_filepath,
+        "-f", "f32le", "-acodec", "pcm_f32le", "-ac", "1", "-ar", str(sample_rate), "-"
+    ]
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    try:
+        while True:
+            data = process.stdout.read(block_frames * 4)
+            if not data:
+                break
+            yield np.frombuffer(data[:len(data) // 4 * 4], dtype=np.float32)
+        process.wait()
+        if process.returncode != 0:
+            raise RuntimeError(f"ffmpeg failed to decode {input_filepath}: "
+                               f"{process.stderr.read().decode(errors='ignore').strip()}")
+    finally:
+        if process.poll() is None:
+            process.kill()
+        process.stdout.close()
+        process.stderr.close()
+
+
+def estimate_noise_profile(audio, sample_rate, frame_ms=50, quantile=0.1, max_seconds=2.0):
+    """
+    从音频中挑选能量最低的若干帧拼成噪声样本，作为平稳降噪的噪声特征。
+    :param audio: 单声道浮点数组
+    :param sample_rate: 采样率
+    :param frame_ms: 帧长（毫秒）
+    :param quantile: 选取能量最低的帧所占比例
+    :param max_seconds: 噪声样本的最大时长（秒）
+    :return: 噪声样本数组
+    """
+    frame_length = int(sample_rate * frame_ms / 1000)
+    frame_count = len(audio) // frame_length
+    if frame_count == 0:
+        return audio
+
+    frames = audio[:frame_count * frame_length].reshape(frame_count, frame_length)
+    energy = np.mean(frames ** 2, axis=1)
+    selected = max(1, min(int(frame_count * quantile), int(max_seconds * 1000 / frame_ms)))
+    quietest = np.sort(np.argsort(energy)[:selected])
+    return frames[quietest].ravel()
+
+
+def _reduce_block(block, sample_rate, noise_profile):
+    """
+    使用固定的噪声特征对单个块做平稳降噪；块过短无法做 STFT 时原样返回。
+    """
+    import noisereduce as nr  # 降噪库导入较慢，首次降噪时加载
+
+    if len(block) < 2048:
+        return block
+    return nr.reduce_noise(y=block, sr=sample_rate, stationary=True, y_noise=noise_profile)
+
+
+def preprocess_audio_streaming(input_filepath, output_filepath, block_seconds=30, overlap_seconds=0.5,
+                               sample_rate=TARGET_SAMPLE_RATE):
+    """
+    流式预处理：解码一次并逐块重采样为 16kHz 单声道，用首块估计的噪声特征对重叠块降噪，
+    只保留每块中间部分并增量写入输出文件。峰值内存只与块大小有关，与输入时长无关。
+
+    :param input_filepath: 输入音频文件路径
+    :param output_filepath: 输出 WAV 文件路径
+    :param block_seconds: 每个降噪块的时长（秒）
+    :param overlap_seconds: 块两侧参与降噪但不写出的上下文时长（秒）
+    :param sample_rate: 输出采样率
+    :return: 输出文件路径
+    """
+    block = int(block_seconds * sample_rate)
+    context = int(overlap_seconds * sample_rate)
+
+    buffer = np.empty(0, dtype=np.float32)
+    left = 0  # buffer 开头属于上一块的上下文长度
+    noise_profile = None
+
+    with sf.SoundFile(output_filepath, mode="w", samplerate=sample_rate, channels=1,
+                      subtype="PCM_16", format="WAV") as output:
+        for chunk in decode_stream(input_filepath, sample_rate):
+            buffer = np.concatenate([buffer, chunk])
+
+            while len(buffer) >= left + block + context:
+                if noise_profile is None:
+                    # 噪声特征只在首块上估计一次，后续块共用
+                    noise_profile = estimate_noise_profile(buffer[:block], sample_rate)
+                    print(f"[INFO] Noise profile estimated from {len(noise_profile) / sample_rate:.2f}s of audio.")
+
+                segment = buffer[:left + block + context]
+                output.write(_reduce_block(segment, sample_rate, noise_profile)[left:left + block])
+
+                # 保留本块末尾作为下一块的左侧上下文
+                buffer = buffer[left + block - context:]
+                left = context
+
+        if len(buffer) > left:
+            if noise_profile is None:
+                noise_profile = estimate_noise_profile(buffer, sample_rate)
+            output.write(_reduce_block(buffer, sample_rate, noise_profile)[left:])
+
+    return output_filepath
+
+
+def _resample_and_denoise_segment(segment, orig_sr, target_sr, keep_start, keep_length):
+    """
+    进程池任务：重采样并降噪一个带上下文的片段，只返回需要保留的目标采样范围。
+    """
+    import noisereduce as nr
+
+    resampled = librosa.resample(segment, orig_sr=orig_sr, target_sr=target_sr)
+    reduced = nr.reduce_noise(y=resampled, sr=target_sr)
+    return reduced[keep_start:keep_start + keep_length]
+
+
+def plan_segments(source_length, orig_sr, target_sr, segment_seconds, padding_seconds, crossfade_seconds):
+    """
+    规划并行处理的分段：分段边界取在源/目标采样点恰好对齐的位置（源采样率与目标采样率之比的整数倍），
+    保证拼接后的输出与整段重采样逐点对齐。
+
+    :return: [(source_start, source_end, target_start, target_length)]，
+             source 为含上下文的源采样范围，target 为该段需要输出的目标采样范围（含交叉淡化区）
+    """
+    divisor = math.gcd(orig_sr, target_sr)
+    source_unit, target_unit = orig_sr // divisor, target_sr // divisor
+    total_target = math.ceil(source_length * target_sr / orig_sr)
+
+    units_per_segment = max(1, round(segment_seconds * orig_sr / source_unit))
+    padding_units = max(1, math.ceil(padding_seconds * orig_sr / source_unit))
+    crossfade = int(crossfade_seconds * target_sr)
+
+    segments = []
+    core_start = 0
+    while core_start * source_unit < source_length:
+        core_end = core_start + units_per_segment
+        # 剩余不足半段时并入当前段，避免末段过短
+        if (core_end + units_per_segment // 2) * source_unit >= source_length:
+            core_end = math.ceil(source_length / source_unit)
+        target_start = max(0, core_start * target_unit - crossfade)
+        target_end = min(total_target, core_end * target_unit + crossfade)
+
+        source_start = max(0, core_start - padding_units) * source_unit
+        source_end = min(source_length, (core_end + padding_units) * source_unit)
+        segments.append((source_start, source_end, target_start, target_end - target_start))
+        core_start = core_end
+
+    return segments, total_target, crossfade
+
+
+def preprocess_audio_parallel(input_filepath, output_filepath, workers=None, segment_seconds=30,
+                              padding_seconds=1.0, crossfade_seconds=0.05, sample_rate=TARGET_SAMPLE_RATE):
+    """
+    多进程预处理：将信号切分为带重叠上下文的片段，在进程池中并行重采样和降噪，再对接缝做线性交叉淡化。
+    输出长度与采样位置与整段 librosa.load(sr=16000) 的串行路径一致。
+
+    :param input_filepath: 输入音频文件路径
+    :param output_filepath: 输出 WAV 文件路径
+    :param workers: 进程数，默认使用全部 CPU 核心
+    :param segment_seconds: 每个片段的核心时长（秒）
+    :param padding_seconds: 片段两侧参与处理但不输出的上下文时长（秒）
+    :param crossfade_seconds: 相邻片段接缝处交叉淡化的半长（秒）
+    :param sample_rate: 输出采样率
+    :return: 输出文件路径
+    """
+    workers = workers or os.cpu_count() or 1
+    audio, orig_sr = librosa.load(input_filepath, sr=None, mono=True)
+
+    segments, total_target, crossfade = plan_segments(
+        len(audio), orig_sr, sample_rate, segment_seconds, padding_seconds, crossfade_seconds
+    )
+    print(f"[INFO] Preprocessing {len(segments)} segments with {workers} worker process(es)...")
+
+    output = np.zeros(total_target, dtype=np.float32)
+    fade = np.linspace(0.0, 1.0, 2 * crossfade, dtype=np.float32) if crossfade else None
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(
+                _resample_and_denoise_segment,
+                audio[source_start:source_end], orig_sr, sample_rate,
+                target_start - source_start * sample_rate // orig_sr, target_length
+            )
+            for source_start, source_end, target_start, target_length in segments
+        ]
+
+        for index, (future, segment) in enumerate(zip(futures, segments)):
+            target_start = segment[2]
+            processed = future.result().astype(np.float32)
+
+            # 接缝处线性交叉淡化：首段不淡入，末段不淡出，相邻两段的权重之和为 1
+            if fade is not None and len(segments) > 1:
+                if index > 0:
+                    processed[:len(fade)] *= fade
+                if index < len(segments) - 1:
+                    processed[-len(fade):] *= fade[::-1]
+            output[target_start:target_start + len(processed)] += processed
+
+    sf.write(output_filepath, output, sample_rate)
+    return output_filepath
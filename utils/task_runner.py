@@ -0,0 +1,150 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.metrics import stage_scope
+
+
+class ProgressTracker:
+    """
+    记录单个阶段的进度，按已完成数量估算吞吐量和剩余时间（ETA），并通过 emit 回调推送进度事件。
+    可作为 progress_callback 传给逐句处理的工具函数，线程安全。
+    """
+
+    def __init__(self, job_id, stage, emit=None):
+        self.job_id = job_id
+        self.stage = stage
+        self.total = None
+        self.completed = 0
+        self.started_at = time.perf_counter()
+        self._emit = emit
+        self._lock = threading.Lock()
+        self.latest = {"job_id": job_id, "stage": stage, "completed": 0, "total": None}
+
+    def start(self, total):
+        with self._lock:
+            self.total = total
+            self.completed = 0
+            self.started_at = time.perf_counter()
+        self._publish(None)
+
+    def __call__(self, sentence_id=None):
+        with self._lock:
+            self.completed += 1
+        self._publish(sentence_id)
+
+    def _publish(self, sentence_id):
+        with self._lock:
+            elapsed = time.perf_counter() - self.started_at
+            throughput = self.completed / elapsed if elapsed > 0 and self.completed else None
+            remaining = (self.total - self.completed) if self.total is not None else None
+            self.latest = {
+                "job_id": self.job_id,
+                "stage": self.stage,
+                "sentence_id": sentence_id,
+                "completed": self.completed,
+                "total": self.total,
+                "elapsed_seconds": round(elapsed, 3),
+                "throughput": round(throughput, 3) if throughput else None,
+                "eta_seconds": round(remaining / throughput, 1) if throughput and remaining is not None else None,
+            }
+            event = dict(self.latest)
+        if self._emit:
+            self._emit("progress", event)
+
+
+class TaskRunner:
+    """
+    在有界线程池中执行耗时阶段（识别、切割、变声），状态写入任务存储以便轮询，进度通过 emit 推送。
+
+    任务函数签名为 func(job_id, tracker)，返回值（可 JSON 序列化的字典）作为该阶段的结果保存，
+    阶段内各操作的耗时汇总随状态一起保存在 timings 字段中。
+
+    阶段是否正在执行只看本进程是否持有未完成的 future；上次进程退出时遗留的 queued / running 状态
+    在启动时改为 interrupted，该阶段可以重新提交（变声阶段从检查点继续）。
+    """
+
+    def __init__(self, job_store, max_workers=4, emit=None):
+        self.job_store = job_store
+        self._emit = emit
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job-task")
+        self._trackers = {}
+        self._futures = {}
+        self._lock = threading.Lock()
+        self._mark_interrupted()
+
+    @staticmethod
+    def _item_name(stage):
+        return f"task_{stage}"
+
+    def _set_state(self, job_id, stage, status, **fields):
+        state = {"stage": stage, "status": status, "updated_at": time.time(), **fields}
+        self.job_store.set(job_id, self._item_name(stage), state)
+        if self._emit:
+            # 结果可能很大，推送时省略，客户端通过状态接口获取
+            self._emit("task_status", {"job_id": job_id, **{k: v for k, v in state.items() if k != "result"}})
+        return state
+
+    def _mark_interrupted(self):
+        """
+        将存储中遗留的 queued / running 状态标记为 interrupted（执行它们的进程已经退出）。
+        """
+        for job_id, name, state in self.job_store.find_items(self._item_name("")):
+            if state.get("status") in ("queued", "running"):
+                stage = state.get("stage") or name[len(self._item_name("")):]
+                print(f"[WARNING] Task {stage} of job {job_id} was interrupted by a restart")
+                self._set_state(job_id, stage, "interrupted", error="Interrupted by a server restart",
+                                progress=state.get("progress"))
+
+    def is_active(self, job_id, stage):
+        future = self._futures.get((job_id, stage))
+        return future is not None and not future.done()
+
+    def submit(self, job_id, stage, func):
+        """
+        提交阶段任务，立即返回排队状态。
+        :return: 任务状态字典；同一任务的同一阶段正在执行时返回 None
+        """
+        with self._lock:
+            if self.is_active(job_id, stage):
+                return None
+            state = self._set_state(job_id, stage, "queued")
+            tracker = ProgressTracker(job_id, stage, emit=self._emit)
+            self._trackers[(job_id, stage)] = tracker
+            self._futures[(job_id, stage)] = self._executor.submit(self._run, job_id, stage, func, tracker)
+        return state
+
+    def _run(self, job_id, stage, func, tracker):
+        self._set_state(job_id, stage, "running")
+        timings = None
+        try:
+            with stage_scope(stage) as timings:
+                result = func(job_id, tracker)
+            summary = timings.summary()
+            self.job_store.set_timings(job_id, stage, summary)
+            self._set_state(job_id, stage, "completed", result=result, progress=tracker.latest, timings=summary)
+        except Exception as e:
+            print(f"[ERROR] Task {stage} of job {job_id} failed: {e}")
+            summary = timings.summary() if timings is not None else None
+            if summary is not None:
+                self.job_store.set_timings(job_id, stage, summary)
+            self._set_state(job_id, stage, "failed", error=str(e), progress=tracker.latest, timings=summary)
+        finally:
+            with self._lock:
+                self._trackers.pop((job_id, stage), None)
+                self._futures.pop((job_id, stage), None)
+
+    def status(self, job_id, stages):
+        """
+        汇总任务各阶段的状态；执行中的阶段附带最新进度。
+        """
+        result = {}
+        for stage in stages:
+            state = self.job_store.get(job_id, self._item_name(stage))
+            if state is None:
+                continue
+            tracker = self._trackers.get((job_id, stage))
+            if tracker is not None:
+                state["progress"] = tracker.latest
+            result[stage] = state
+        return result
@@ -0,0 +1,123 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+def speedup_stretch(samples, sample_rate, ratio):
+    """
+    使用 AudioSegment.speedup 压缩片段（纯 Python 分块交叉淡化，较大倍率下有明显瑕疵）。
+    :param samples: 形状为 [采样点数, 声道数] 的浮点数组
+    :param sample_rate: 采样率
+    :param ratio: 加速倍率，大于 1 表示压缩
+    :return: 压缩后的浮点数组
+    """
+    from pydub import AudioSegment
+
+    pcm = (np.clip(samples, -1.0, 1.0) * 32767).astype(np.int16)
+    segment = AudioSegment(pcm.tobytes(), frame_rate=sample_rate, sample_width=2, channels=samples.shape[1])
+    segment = segment.speedup(playback_speed=ratio)
+    stretched = np.array(segment.get_array_of_samples(), dtype=np.float32).reshape(-1, samples.shape[1])
+    return stretched / 32768.0
+
+
+def wsola_stretch(samples, sample_rate, ratio, frame_ms=40, tolerance_ms=10):
+    """
+    WSOLA（波形相似叠加）时间伸缩：保持音高不变地改变时长。
+    帧位置的搜索使用 np.correlate 向量化完成，叠加阶段一次性用索引数组累加所有帧。
+
+    :param samples: 形状为 [采样点数, 声道数] 的浮点数组
+    :param sample_rate: 采样率
+    :param ratio: 加速倍率，大于 1 表示压缩，小于 1 表示拉伸
+    :param frame_ms: 分析帧长（毫秒）
+    :param tolerance_ms: 帧位置的最大搜索偏移（毫秒）
+    :return: 长度约为 len(samples) / ratio 的浮点数组
+    """
+    frame_length = max(64, int(sample_rate * frame_ms / 1000)) // 2 * 2
+    synthesis_hop = frame_length // 2
+    analysis_hop = synthesis_hop * ratio
+    tolerance = max(1, int(sample_rate * tolerance_ms / 1000))
+
+    target_length = int(round(len(samples) / ratio))
+    if len(samples) < frame_length or target_length < frame_length:
+        # 片段过短时无法分帧，退化为截断
+        return samples[:target_length]
+
+    # 首尾填充，保证每一帧的搜索窗口都在数组范围内
+    padded = np.pad(samples, ((tolerance, frame_length + tolerance), (0, 0)))
+    mono = padded.mean(axis=1)
+
+    frame_count = target_length // synthesis_hop + 1
+    positions = np.empty(frame_count, dtype=np.int64)
+    positions[0] = tolerance
+    max_position = len(padded) - frame_length - tolerance
+
+    for k in range(1, frame_count):
+        # 上一帧的自然延续作为模板，在名义位置附近寻找最相似的波形
+        natural = min(positions[k - 1] + synthesis_hop, len(padded) - frame_length)
+        template = mono[natural:natural + frame_length]
+        nominal = min(int(round(k * analysis_hop)) + tolerance, max_position)
+        search = mono[nominal - tolerance:nominal + tolerance + frame_length]
+        correlation = np.correlate(search, template, mode="valid")
+        positions[k] = nominal - tolerance + int(np.argmax(correlation))
+
+    # 向量化叠加：frames 形状为 [帧数, 帧长, 声道数]
+    window = np.hanning(frame_length + 1)[:frame_length].astype(np.float32)
+    frames = sliding_window_view(padded, frame_length, axis=0)[positions]
+    frames = np.moveaxis(frames, -1, 1) * window[None, :, None]
+
+    output_length = (frame_count - 1) * synthesis_hop + frame_length
+    output_index = (np.arange(frame_count)[:, None] * synthesis_hop + np.arange(frame_length)[None, :]).ravel()
+    output = np.zeros((output_length, samples.shape[1]), dtype=np.float32)
+    norm = np.zeros(output_length, dtype=np.float32)
+    np.add.at(output, output_index, frames.reshape(-1, samples.shape[1]))
+    np.add.at(norm, output_index, np.tile(window, frame_count))
+
+    output /= np.maximum(norm, 1e-3)[:, None]
+    return output[:target_length]
+
+
+# 可插拔的时间伸缩实现
+STRETCHERS = {
+    "wsola": wsola_stretch,
+    "speedup": speedup_stretch,
+}
+
+
+def _fade_out(samples, sample_rate, fade_ms=10):
+    """
+    截断后在末尾加短淡出，避免爆音。
+    """
+    fade_length = min(len(samples), int(sample_rate * fade_ms / 1000))
+    if fade_length:
+        samples = samples.copy()
+        samples[-fade_length:] *= np.linspace(1.0, 0.0, fade_length, dtype=np.float32)[:, None]
+    return samples
+
+
+def fit_clip_to_slot(samples, slot_length, sample_rate, stretcher="wsola", max_ratio=2.0, overflow_length=0):
+    """
+    将片段调整到时间槽内：短于时间槽时原样返回（由调用方补静音）；
+    长于时间槽时按不超过 max_ratio 的倍率压缩，仍放不下的部分可溢出到后续空白（最多 overflow_length
+    个采样点），超出部分截断并淡出。
+
+    :param samples: 形状为 [采样点数, 声道数] 的浮点数组
+    :param slot_length: 时间槽长度（采样点）
+    :param sample_rate: 采样率
+    :param stretcher: 时间伸缩实现名称（见 STRETCHERS），或签名为 (samples, sample_rate, ratio) 的可调用对象
+    :param max_ratio: 允许的最大压缩倍率，1 表示不压缩
+    :param overflow_length: 允许占用的时间槽之后的空白长度（采样点）
+    :return: 调整后的浮点数组，长度不超过 slot_length + overflow_length
+    """
+    if slot_length <= 0:
+        return samples[:0]
+    if len(samples) <= slot_length:
+        return samples
+
+    stretch = STRETCHERS[stretcher] if isinstance(stretcher, str) else stretcher
+    ratio = min(len(samples) / slot_length, max_ratio)
+    if ratio > 1.0:
+        samples = stretch(samples, sample_rate, ratio)
+
+    limit = slot_length + max(0, overflow_length)
+    if len(samples) > limit:
+        samples = _fade_out(samples[:limit], sample_rate)
+    return samples
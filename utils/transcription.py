@@ -1,48 +1,302 @@
-import dashscope
-import requests
+import asyncio
+import atexit
+import json
+import os
+import threading
+
+import aiohttp
 from decouple import config
 
-# 设置 DashScope API key
-dashscope.api_key = config('DASHSCOPE_API_KEY')
+from utils.cache_utils import CACHE_FOLDER, DiskLRUCache, hash_bytes, hash_file
+from utils.dashscope_scheduler import scheduler
+from utils.metrics import count, current_job, job_scope, timed
+
+# DashScope HTTP 接口地址，可指向本地替身服务，例如 http://127.0.0.1:8080/api/v1
+DASHSCOPE_HTTP_BASE_URL = config('DASHSCOPE_HTTP_BASE_URL', default='https://dashscope.aliyuncs.com/api/v1')
+
+TRANSCRIPTION_MODEL = 'paraformer-v2'
+LANGUAGE_HINTS = ('zh', 'en')
+
+# 单个转录任务最多携带的文件数（接口上限为 100）
+TRANSCRIPTION_MAX_FILES_PER_TASK = config('TRANSCRIPTION_MAX_FILES_PER_TASK', default=100, cast=int)
+# 连接池大小，同时决定可并发进行的请求数
+TRANSCRIPTION_CONNECTION_LIMIT = config('TRANSCRIPTION_CONNECTION_LIMIT', default=64, cast=int)
 
-def recognize_audio(audio_url):
+# 识别结果缓存：同一段预处理音频在相同模型和语种设置下只识别一次
+TRANSCRIPTION_CACHE_MAX_BYTES = config('TRANSCRIPTION_CACHE_MAX_BYTES', default=256 * 1024 * 1024, cast=int)
+transcription_cache = DiskLRUCache(
+    os.path.join(CACHE_FOLDER, 'transcription'), max_bytes=TRANSCRIPTION_CACHE_MAX_BYTES, suffix=".json"
+)
+
+
+def transcription_cache_key(content_hash, model=TRANSCRIPTION_MODEL, language_hints=LANGUAGE_HINTS):
     """
-    通过 Paraformer 语音识别模型进行音频转录，并返回转录的 JSON 数据。
+    识别结果缓存键：预处理音频的内容摘要 + 模型 + 语种提示。
+    """
+    payload = json.dumps([content_hash, model, list(language_hints)])
+    return hash_bytes(payload.encode("utf-8"))
+
+
+def get_cached_transcription(audio_path):
+    """
+    按本地音频文件内容查找缓存的识别结果，未命中或文件不存在时返回 None。
+    """
+    if not audio_path or not os.path.exists(audio_path):
+        return None
+    return transcription_cache.get_json(transcription_cache_key(hash_file(audio_path)))
+
+
+def cache_transcription(audio_path, result):
+    """
+    按本地音频文件内容缓存识别结果（例如长音频模式拼接后的整段结果），失败的结果不缓存。
+    """
+    if audio_path and os.path.exists(audio_path) and "error" not in result:
+        transcription_cache.put_json(transcription_cache_key(hash_file(audio_path)), result)
+
+
+class TranscriptionError(Exception):
+    def __init__(self, message, status_code=None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class AsyncTranscriptionClient:
+    """
+    基于 asyncio 的 Paraformer 录音文件识别客户端：
+    一个任务提交多个文件 URL，按指数退避轮询任务状态，并通过共享连接池下载识别结果 JSON。
+    所有方法都是协程，一个事件循环中可以同时进行数十个转录任务。
+    """
+
+    def __init__(self, api_key=None, base_url=None, model=TRANSCRIPTION_MODEL, language_hints=LANGUAGE_HINTS,
+                 max_files_per_task=TRANSCRIPTION_MAX_FILES_PER_TASK, connection_limit=TRANSCRIPTION_CONNECTION_LIMIT,
+                 poll_interval=0.5, max_poll_interval=8.0, poll_backoff=1.5, timeout_seconds=3600):
+        # API key 在创建客户端时读取，导入本模块时不要求已配置
+        self.api_key = api_key or config('DASHSCOPE_API_KEY')
+        self.base_url = (base_url or DASHSCOPE_HTTP_BASE_URL).rstrip('/')
+        self.model = model
+        self.language_hints = list(language_hints)
+        self.max_files_per_task = max(1, int(max_files_per_task))
+        self.connection_limit = connection_limit
+        self.poll_interval = poll_interval
+        self.max_poll_interval = max_poll_interval
+        self.poll_backoff = poll_backoff
+        self.timeout_seconds = timeout_seconds
+        self._session = None
+
+    @property
+    def session(self):
+        # 首次使用时在当前事件循环中创建连接池
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.connection_limit),
+                timeout=aiohttp.ClientTimeout(total=60)
+            )
+        return self._session
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    def _headers(self, asynchronous=False):
+        headers = {"Authorization": f"Bearer {self.api_key}", "Content-Type": "application/json"}
+        if asynchronous:
+            headers["X-DashScope-Async"] = "enable"
+        return headers
+
+    async def _request_json(self, method, url, **kwargs):
+        """
+        发送一次 DashScope 请求并解析 JSON，非 200 响应抛出带状态码的 TranscriptionError。
+        """
+        async with self.session.request(method, url, **kwargs) as response:
+            body = await response.json(content_type=None)
+            if response.status != 200:
+                raise TranscriptionError(f"DashScope request failed ({response.status}): {body}",
+                                         status_code=response.status)
+            return body
+
+    async def _call(self, method, url, **kwargs):
+        # 经共享调度器限速，限流和瞬时错误自动重试
+        return await scheduler.call_async("transcription", lambda: self._request_json(method, url, **kwargs))
+
+    async def submit(self, file_urls):
+        """
+        提交转录任务。
+        :param file_urls: 音频文件 URL 列表（不超过 max_files_per_task 个）
+        :return: task_id
+        """
+        payload = {
+            "model": self.model,
+            "input": {"file_urls": list(file_urls)},
+            "parameters": {"language_hints": self.language_hints},
+        }
+        with timed("asr_submit"):
+            body = await self._call("POST", f"{self.base_url}/services/audio/asr/transcription", json=payload,
+                                    headers=self._headers(asynchronous=True))
+        count("transcription_files", len(payload["input"]["file_urls"]))
+        return body["output"]["task_id"]
+
+    async def wait(self, task_id):
+        """
+        按指数退避轮询任务状态，直到任务结束。
+        :return: 任务的 results 列表，每项包含 file_url / subtask_status / transcription_url
+        """
+        with timed("asr_wait"):
+            return await self._poll(task_id)
+
+    async def _poll(self, task_id):
+        interval = self.poll_interval
+        deadline = asyncio.get_running_loop().time() + self.timeout_seconds
+        while True:
+            body = await self._call("GET", f"{self.base_url}/tasks/{task_id}", headers=self._headers())
+            output = body["output"]
+            status = output.get("task_status")
+            if status in ("SUCCEEDED", "FAILED") and output.get("results") is not None:
+                return output["results"]
+            if status in ("FAILED", "CANCELED", "UNKNOWN"):
+                raise TranscriptionError(f"Transcription task {task_id} {status}: {output.get('message')}")
+            if asyncio.get_running_loop().time() + interval > deadline:
+                raise TranscriptionError(f"Transcription task {task_id} timed out")
+
+            await asyncio.sleep(interval)
+            interval = min(interval * self.poll_backoff, self.max_poll_interval)
+
+    async def fetch_result(self, transcription_url):
+        """
+        下载识别结果 JSON。
+        """
+        with timed("asr_download"):
+            async with self.session.get(transcription_url) as response:
+                if response.status != 200:
+                    raise TranscriptionError(f"Failed to download transcription JSON file ({response.status}).")
+                return await response.json(content_type=None)
+
+    async def _transcribe_batch(self, file_urls):
+        task_id = await self.submit(file_urls)
+        results = {result.get("file_url"): result for result in await self.wait(task_id)}
+
+        async def fetch_one(file_url):
+            result = results.get(file_url)
+            if result is None:
+                return {"error": f"No transcription result returned for {file_url}"}
+            if result.get("subtask_status") != "SUCCEEDED":
+                return {"error": f"Unable to process the audio: {result.get('message') or result.get('subtask_status')}"}
+            try:
+                return await self.fetch_result(result["transcription_url"])
+            except (TranscriptionError, aiohttp.ClientError) as e:
+                return {"error": str(e)}
+
+        return await asyncio.gather(*(fetch_one(file_url) for file_url in file_urls))
+
+    async def transcribe_many(self, file_urls):
+        """
+        转录多个文件：按 max_files_per_task 分批，各批任务同时提交、轮询和下载。
+        :return: 与 file_urls 顺序一致的列表，每项为转录 JSON，失败时为 {"error": ...}
+        """
+        file_urls = list(file_urls)
+        batches = [file_urls[i:i + self.max_files_per_task]
+                   for i in range(0, len(file_urls), self.max_files_per_task)]
+
+        async def run_batch(batch):
+            try:
+                return await self._transcribe_batch(batch)
+            except (TranscriptionError, aiohttp.ClientError, asyncio.TimeoutError) as e:
+                print(f"[ERROR] Transcription batch failed: {e}")
+                return [{"error": str(e)} for _ in batch]
+
+        results = []
+        for batch_results in await asyncio.gather(*(run_batch(batch) for batch in batches)):
+            results.extend(batch_results)
+        return results
+
+    async def transcribe(self, file_url):
+        return (await self.transcribe_many([file_url]))[0]
+
+
+# 同步调用方（Flask 请求线程、后台任务线程）共享一个后台事件循环和一个客户端，复用同一个连接池
+_loop = None
+_client = None
+_loop_lock = threading.Lock()
+
+
+def get_client():
+    """
+    返回共享的 (事件循环, 客户端)，首次调用时启动事件循环线程并创建客户端。
     """
+    global _loop, _client
+    if _loop is None:
+        with _loop_lock:
+            if _loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="transcription-loop", daemon=True).start()
+                _client = AsyncTranscriptionClient()
+                _loop = loop
+                atexit.register(_close_client)
+    return _loop, _client
+
+
+def _close_client():
     try:
-        print("[INFO] Submitting audio transcription task...")
-        # 提交音频转录任务
-        task_response = dashscope.audio.asr.Transcription.async_call(
-            model='paraformer-v2',
-            file_urls=[audio_url],
-            language_hints=['zh', 'en']  # 设置语种
-        )
-
-        # 查询任务的转录结果
-        print("[INFO] Waiting for transcription result...")
-        transcribe_response = dashscope.audio.asr.Transcription.wait(task=task_response.output.task_id)
-        if transcribe_response.status_code == 200:
-            print("[INFO] Transcription task succeeded, fetching result JSON...")
-            # 获取转录结果的 JSON URL
-            transcription_url = transcribe_response.output.results[0]['transcription_url']
-
-            # 下载 JSON 数据
-            json_response = requests.get(transcription_url)
-
-            # 检查请求是否成功
-            if json_response.status_code == 200:
-                print("[INFO] Transcription JSON downloaded successfully.")
-                # 返回 JSON 内容
-                return json_response.json()
-            else:
-                print("[ERROR] Failed to download transcription JSON file.")
-                # 如果 JSON 文件下载失败，返回错误
-                return {"error": "Failed to download transcription JSON file."}
-        else:
-            print(f"[ERROR] Transcription task failed with status code: {transcribe_response.status_code}")
-            # 如果转录任务失败，返回错误
-            return {"error": "Unable to process the audio."}
+        asyncio.run_coroutine_threadsafe(_client.close(), _loop).result(timeout=5)
+    except Exception:
+        pass
+
+
+def recognize_audio_batch(audio_urls, audio_paths=None):
+    """
+    同步接口：批量转录多个音频，在共享事件循环中执行，调用线程只等待结果。
+    提供本地文件路径时先查识别结果缓存，只提交未命中的文件，成功的结果写入缓存。
+    :param audio_urls: 音频 URL 列表
+    :param audio_paths: 与 audio_urls 对应的本地文件路径列表（可选，用于缓存）
+    :return: 与 audio_urls 顺序一致的转录 JSON 列表，失败项为 {"error": ...}
+    """
+    audio_paths = audio_paths or [None] * len(audio_urls)
+    results = [None] * len(audio_urls)
+    cache_keys = [None] * len(audio_urls)
+    for i, audio_path in enumerate(audio_paths):
+        if audio_path and os.path.exists(audio_path):
+            cache_keys[i] = transcription_cache_key(hash_file(audio_path))
+            results[i] = transcription_cache.get_json(cache_keys[i])
+
+    misses = [i for i, result in enumerate(results) if result is None]
+    if len(misses) < len(audio_urls):
+        count("transcription_cache_hits", len(audio_urls) - len(misses))
+        print(f"[INFO] Transcription cache hit for {len(audio_urls) - len(misses)} file(s).")
+    if misses:
+        loop, client = get_client()
+        print(f"[INFO] Submitting transcription for {len(misses)} file(s)...")
+
+        # 协程在事件循环线程中执行，显式带上调用方所属的任务阶段
+        job = current_job()
 
+        async def transcribe():
+            with job_scope(job):
+                return await client.transcribe_many([audio_urls[i] for i in misses])
+
+        fresh = asyncio.run_coroutine_threadsafe(transcribe(), loop).result()
+        for i, result in zip(misses, fresh):
+            results[i] = result
+            if cache_keys[i] and "error" not in result:
+                transcription_cache.put_json(cache_keys[i], result)
+    return results
+
+
+def recognize_audio(audio_url, audio_path=None):
+    """
+    通过 Paraformer 语音识别模型进行音频转录，并返回转录的 JSON 数据。
+    :param audio_url: 音频的 OSS URL
+    :param audio_path: 音频的本地路径（可选），提供时按内容摘要缓存识别结果
+    """
+    try:
+        result = recognize_audio_batch([audio_url], [audio_path])[0]
+        if "error" not in result:
+            print("[INFO] Transcription JSON downloaded successfully.")
+        return result
     except Exception as e:
         print(f"[ERROR] An exception occurred: {e}")
         # 返回捕获的异常信息
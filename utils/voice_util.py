@@ -1,112 +1,513 @@
+import json
 import os
+import re
+import statistics
+import threading
+import time
+import unicodedata
 
-import dashscope
-from dashscope.audio.tts_v2 import VoiceEnrollmentService, SpeechSynthesizer, AudioFormat
+import soundfile as sf
 from decouple import config
 
+from utils.cache_utils import CACHE_FOLDER, DiskLRUCache, VoiceCache, hash_bytes, hash_file
+from utils.dashscope_scheduler import scheduler
+from utils.metrics import ContextThreadPoolExecutor, count, observe, timed
 from utils.oss_utils import upload_to_oss
-import pickle
 
-dashscope.api_key = config('DASHSCOPE_API_KEY')
+# 声音复刻使用的目标模型
+TARGET_MODEL = "cosyvoice-v1"
 
+# 合成输出格式（dashscope AudioFormat 的成员名）：16 位单声道 PCM 流，边接收边写入 WAV 文件，合并时无需再解码
+SYNTHESIS_FORMAT = "PCM_22050HZ_MONO_16BIT"
+SYNTHESIS_SAMPLE_RATE = 22050
+SYNTHESIS_TIMEOUT_SECONDS = config('SYNTHESIS_TIMEOUT_SECONDS', default=120, cast=int)
 
-def process_sentences_with_voice_cloning(sentences, reference_audio_url, output_folder="voice_cloning_output"):
+# 音色 ID 缓存，跨请求、跨重启复用已注册的音色
+voice_cache = VoiceCache()
+# 音色在此时间内确认过可用时直接复用，不再查询服务端
+VOICE_REVALIDATE_SECONDS = config('VOICE_REVALIDATE_SECONDS', default=3600, cast=int)
+# 服务端明确表示音色不存在的错误特征
+VOICE_NOT_FOUND_MARKERS = ("not found", "notfound", "not exist", "notexist")
+# 需要重新注册的音色状态（NOT_FOUND 表示查询时服务端返回音色不存在）
+VOICE_UNAVAILABLE_STATUSES = ("NOT_FOUND", "UNDEPLOYED", "FAILED")
+# create_voice 的 prefix 只能包含小写字母和数字，且少于 10 个字符
+VOICE_PREFIX_MAX_LENGTH = 9
+VOICE_PREFIX_DEFAULT = "clone"
+
+# 合成结果缓存，按 (音色, 模型, 输出格式, 规范化文本) 内容寻址，未修改的句子无需重新合成
+synthesis_cache = DiskLRUCache(
+    os.path.join(CACHE_FOLDER, 'synthesis'),
+    max_bytes=config('SYNTHESIS_CACHE_MAX_BYTES', default=1024 * 1024 * 1024, cast=int),
+    suffix=".wav"
+)
+
+
+# DashScope 语音合成 SDK 导入较慢，首次合成或注册音色时才加载
+_tts = None
+_tts_lock = threading.Lock()
+
+
+def load_tts():
     """
-    批量变声处理分割的句子文本，结合参考音频生成变声音频。
+    返回 dashscope.audio.tts_v2 模块，首次调用时导入 SDK 并设置 API key。
+    """
+    global _tts
+    if _tts is None:
+        with _tts_lock:
+            if _tts is None:
+                import dashscope
+                from dashscope.audio import tts_v2
+                dashscope.api_key = config('DASHSCOPE_API_KEY')
+                _tts = tts_v2
+    return _tts
+
+
+def normalize_text(text):
+    """
+    规范化句子文本（全半角统一、去除首尾及多余空白），使仅有空白差异的句子命中同一缓存。
+    """
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFKC", text)).strip()
 
-    :param sentences: 包含句子文本的列表，每个元素为 {"text": 句子文本, "begin_time": 开始时间戳, "end_time": 结束时间戳}
-    :param reference_audio_url: 参考音频的 URL
-    :param output_folder: 保存变声音频文件的本地目录
-    :return: 包含每个句子变声音频的本地路径和 OSS URL 的列表
+
+def synthesis_cache_key(voice_id, target_model, text, audio_format=SYNTHESIS_FORMAT):
+    return hash_bytes(f"{voice_id}\n{target_model}\n{audio_format}\n{normalize_text(text)}".encode("utf-8"))
+
+
+class StreamingWavWriter:
     """
-    # 声音复刻服务
-    target_model = "cosyvoice-v1"
-    prefix = reference_audio_url.split("/")[-1].split(".")[0]
+    流式合成回调：收到的 PCM 数据块直接追加写入 WAV 文件，并记录首包时间（TTFB）。
+    实现了 ResultCallback 的全部回调方法，但不继承该类，导入本模块时无需加载 SDK。
+    """
+
+    def __init__(self, output_file, sample_rate):
+        self.output = sf.SoundFile(output_file, mode="w", samplerate=sample_rate, channels=1,
+                                   subtype="PCM_16", format="WAV")
+        self.started_at = time.perf_counter()
+        self.first_byte_at = None
+        self.bytes_received = 0
+        self.error = None
+        self.completed = False
+        self.finished = threading.Event()
+        # 数据块可能在采样点中间断开，剩余的奇数字节留到下一块
+        self._remainder = b""
+
+    def on_open(self):
+        pass
+
+    def on_event(self, message):
+        pass
+
+    def on_data(self, data):
+        if self.first_byte_at is None:
+            self.first_byte_at = time.perf_counter()
+        self.bytes_received += len(data)
+        data = self._remainder + data
+        usable = len(data) // 2 * 2
+        self._remainder = data[usable:]
+        if usable:
+            self.output.buffer_write(data[:usable], dtype="int16")
+
+    def on_complete(self):
+        self.completed = True
+        self.finished.set()
+
+    def on_error(self, message):
+        self.error = message
+        self.finished.set()
+
+    def on_close(self):
+        self.finished.set()
+
+    @property
+    def ttfb_ms(self):
+        if self.first_byte_at is None:
+            return None
+        return round((self.first_byte_at - self.started_at) * 1000, 1)
+
+    def wait(self, timeout):
+        """
+        等待合成结束并关闭文件；失败、超时或没有收到音频时抛出异常。
+        """
+        try:
+            if not self.finished.wait(timeout):
+                raise TimeoutError(f"Speech synthesis timed out after {timeout} seconds")
+            if self.error is not None:
+                raise RuntimeError(f"Speech synthesis failed: {self.error}")
+            if not self.completed or self.bytes_received == 0:
+                raise RuntimeError("Speech synthesis finished without audio data")
+        finally:
+            self.output.close()
+
+
+def _synthesize_to_file(text, voice_id, target_model, output_file, synthesizer_factory):
+    """
+    流式合成单句音频并写入 WAV 文件 output_file，优先使用合成结果缓存。
+    :return: (是否命中缓存, 首包时间毫秒数)；命中缓存时首包时间为 None
+    """
+    cache_key = synthesis_cache_key(voice_id, target_model, text)
+    if synthesis_cache.copy_to(cache_key, output_file):
+        count("synthesis_cache_hits")
+        print(f"[INFO] Synthesis cache hit for: {text}")
+        return True, None
+
+    tts = load_tts()
+    synthesizer_factory = synthesizer_factory or tts.SpeechSynthesizer
+    audio_format = tts.AudioFormat[SYNTHESIS_FORMAT]
+
+    def synthesize_once():
+        # 先写入临时文件，合成失败时不会留下不完整的音频
+        temp_file = f"{output_file}.{threading.get_ident()}.part"
+        writer = StreamingWavWriter(temp_file, SYNTHESIS_SAMPLE_RATE)
+        try:
+            # 每个句子使用独立的合成器实例，避免多线程共享连接
+            synthesizer = synthesizer_factory(model=target_model, voice=voice_id, format=audio_format,
+                                              callback=writer)
+            synthesizer.call(text)
+            writer.wait(SYNTHESIS_TIMEOUT_SECONDS)
+            os.replace(temp_file, output_file)
+            count("synthesis_audio_bytes", writer.bytes_received)
+        except Exception:
+            if not writer.output.closed:
+                writer.output.close()
+            if os.path.exists(temp_file):
+                os.remove(temp_file)
+            raise
+        return writer.ttfb_ms
+
+    # 经共享调度器限速，限流或瞬时错误时自动重试
+    with timed("synthesis"):
+        ttfb_ms = scheduler.call("synthesis", synthesize_once)
+    count("synthesized_sentences")
+    if ttfb_ms is not None:
+        observe("synthesis_ttfb_seconds", ttfb_ms / 1000)
+    print(f"Generated audio for: {text} (TTFB {ttfb_ms} ms)")
+
+    synthesis_cache.put_file(cache_key, output_file)
+    return False, ttfb_ms
+
+
+class CloneManifest:
+    """
+    变声检查点：输出目录下的只追加 manifest.jsonl，每合成并上传成功一个句子追加一行。
+    进程中途退出后重新运行时，内容与文件都校验通过的句子直接复用，不再合成和上传。
+    """
+
+    FILENAME = "manifest.jsonl"
+
+    def __init__(self, output_folder):
+        self.path = os.path.join(output_folder, self.FILENAME)
+        self._lock = threading.Lock()
+
+    def load(self):
+        """
+        读取检查点，同一句子以最后一条记录为准；忽略进程崩溃时写了一半的末行。
+        :return: {sentence_id: record}
+        """
+        records = {}
+        if not os.path.exists(self.path):
+            return records
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                records[record["sentence_id"]] = record
+        return records
+
+    def append(self, result, synthesis_key):
+        """
+        记录一个已完成的句子（本地文件的大小和摘要用于恢复时校验）。
+        """
+        local_url = result["local_url"]
+        record = {
+            "sentence_id": result["sentence_id"],
+            "synthesis_key": synthesis_key,
+            "begin_time": result.get("begin_time"),
+            "end_time": result.get("end_time"),
+            "local_url": local_url,
+            "oss_url": result["oss_url"],
+            "size": os.path.getsize(local_url),
+            "sha256": hash_file(local_url),
+        }
+        line = (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+        with self._lock:
+            with open(self.path, 'ab+') as f:
+                # 上次崩溃留下不完整的末行时先换行，避免新记录与其粘连
+                if f.seek(0, os.SEEK_END) > 0:
+                    f.seek(-1, os.SEEK_END)
+                    if f.read(1) != b"\n":
+                        line = b"\n" + line
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+
+    @staticmethod
+    def is_valid(record, synthesis_key):
+        """
+        检查点记录仍然有效：对应同一音色/模型/格式/文本，且本地文件未被修改。
+        """
+        local_url = record.get("local_url")
+        return (record.get("synthesis_key") == synthesis_key
+                and local_url and os.path.exists(local_url)
+                and os.path.getsize(local_url) == record.get("size")
+                and hash_file(local_url) == record.get("sha256"))
+
+
+def voice_prefix(reference_audio_url):
+    """
+    由参考音频文件名生成符合 create_voice 要求的音色前缀：只保留小写字母和数字并截断到 9 个字符；
+    按内容寻址的对象名为 SHA-256 摘要，取其前 9 位。文件名中没有可用字符时使用 "clone"。
+    """
+    stem = os.path.splitext(reference_audio_url.split("/")[-1].split("?")[0])[0]
+    prefix = re.sub(r"[^a-z0-9]", "", stem.lower())[:VOICE_PREFIX_MAX_LENGTH]
+    return prefix or VOICE_PREFIX_DEFAULT
+
+
+def _query_voice_status(service, voice_id):
+    """
+    查询服务端音色状态。
+    :return: 服务端返回的状态（如 "OK"、"DEPLOYING"、"UNDEPLOYED"）；音色不存在时为 "NOT_FOUND"；
+             查询失败（如网络错误、限流重试用尽）时为 None
+    """
+    try:
+        with timed("enrollment_query"):
+            voice = scheduler.call("enrollment", service.query_voice, voice_id=voice_id)
+    except Exception as e:
+        if any(marker in str(e).lower() for marker in VOICE_NOT_FOUND_MARKERS):
+            return "NOT_FOUND"
+        print(f"[WARNING] Failed to query voice {voice_id}: {e}")
+        return None
+    return voice.get("status") if isinstance(voice, dict) else None
+
+
+def _delete_voice(service, voice_id, reason):
+    """
+    在服务端删除不再使用的音色，避免占用音色配额；失败时只记录警告。
+    """
+    try:
+        scheduler.call("enrollment", service.delete_voice, voice_id=voice_id)
+        print(f"[INFO] {reason} voice deleted: {voice_id}")
+    except Exception as e:
+        print(f"[WARNING] Failed to delete {reason.lower()} voice {voice_id}: {e}")
+
+
+def get_or_create_voice(reference_audio_url, target_model=TARGET_MODEL, reference_audio_path=None, service=None):
+    """
+    获取参考音频对应的音色 ID：优先使用缓存中仍然有效的音色，否则注册新音色并写入缓存。
+
+    缓存的音色在 VOICE_REVALIDATE_SECONDS 内确认过可用时直接复用；否则查询服务端状态，
+    只有服务端明确返回音色不存在或已失效时才重新注册。查询失败或音色仍在部署时继续使用缓存的音色。
 
-    # 创建语音注册服务实例
-    service = VoiceEnrollmentService()
-    voice_id = service.create_voice(target_model=target_model, prefix=prefix, url=reference_audio_url)
+    :param reference_audio_url: 参考音频的 OSS URL，注册音色时使用
+    :param target_model: 目标合成模型
+    :param reference_audio_path: 参考音频的本地路径，提供时以文件内容摘要作为缓存键，否则退化为 URL 摘要
+    :param service: VoiceEnrollmentService 实例，为空时新建
+    :return: 音色 ID
+    """
+    if reference_audio_path and os.path.exists(reference_audio_path):
+        content_hash = hash_file(reference_audio_path)
+    else:
+        content_hash = hash_bytes(reference_audio_url.encode("utf-8"))
+    cache_key = VoiceCache.make_key(target_model, content_hash)
+
+    entry = voice_cache.get_entry(cache_key)
+    if entry and time.time() - entry.get("validated_at", 0) < VOICE_REVALIDATE_SECONDS:
+        count("voice_cache_hits")
+        print(f"[INFO] Reusing cached voice ID: {entry['voice_id']}")
+        return entry["voice_id"]
+
+    service = service or load_tts().VoiceEnrollmentService()
+    if entry:
+        voice_id = entry["voice_id"]
+        status = _query_voice_status(service, voice_id)
+        if status == "OK":
+            voice_cache.mark_validated(cache_key, voice_id)
+        if status not in VOICE_UNAVAILABLE_STATUSES:
+            count("voice_cache_hits")
+            print(f"[INFO] Reusing cached voice ID: {voice_id} (status {status})")
+            return voice_id
+        print(f"[INFO] Cached voice {voice_id} is {status}, enrolling again...")
+
+    prefix = voice_prefix(reference_audio_url)
+    with timed("enrollment"):
+        voice_id = scheduler.call("enrollment", service.create_voice, target_model=target_model, prefix=prefix,
+                                  url=reference_audio_url)
+    count("enrolled_voices")
     print(f"Voice ID created: {voice_id}")
 
-    # 创建输出文件夹
-    os.makedirs(output_folder, exist_ok=True)
+    # 被替换和被淘汰的音色同时在服务端删除（已确认不存在的除外）
+    for old_voice_id in voice_cache.put(cache_key, voice_id):
+        if entry and old_voice_id == entry["voice_id"]:
+            if status != "NOT_FOUND":
+                _delete_voice(service, old_voice_id, "Replaced")
+        else:
+            _delete_voice(service, old_voice_id, "Evicted")
 
-    sentence_audio_info = []
+    return voice_id
 
-    for i, sentence in enumerate(sentences):
-        # 创建语音合成器
-        synthesizer = SpeechSynthesizer(model=target_model, voice=voice_id)
 
-        text = sentence["text"]
-        print(f"Processing sentence {i + 1}: {text}")
+@timed("clone_sentence")
+def clone_single_sentence(index, sentence, voice_id, target_model, output_folder, synthesizer_factory,
+                          manifest=None, checkpoint=None):
+    """
+    合成、保存并上传单个句子的变声音频，失败时返回带 error 字段的结果而不是抛出异常。
+    :param manifest: CloneManifest，成功后追加检查点
+    :param checkpoint: 该句子已有的检查点记录，校验通过时直接复用
+    """
+    text = sentence["text"]
+    result = {
+        "sentence_id": index + 1,
+        "text": text,
+        "begin_time": sentence["begin_time"],
+        "end_time": sentence["end_time"],
+    }
+
+    synthesis_key = synthesis_cache_key(voice_id, target_model, text)
+    if checkpoint and CloneManifest.is_valid(checkpoint, synthesis_key):
+        print(f"[INFO] Sentence {index + 1} restored from checkpoint")
+        result.update(local_url=checkpoint["local_url"], oss_url=checkpoint["oss_url"], resumed=True)
+        return result
 
-        # 生成音频
-        audio = synthesizer.call(text)
-        print("Generated audio for:", text)
+    try:
+        print(f"Processing sentence {index + 1}: {text}")
 
-        # 保存到本地
-        output_file = os.path.join(output_folder, f"cloned_sentence_{i + 1}.mp3")
-        with open(output_file, "wb") as f:
-            pickle.dump(audio, f)
+        # 生成音频并保存到本地
+        output_file = os.path.join(output_folder, f"cloned_sentence_{index + 1}.wav")
+        result["cache_hit"], result["ttfb_ms"] = _synthesize_to_file(text, voice_id, target_model, output_file,
+                                                                     synthesizer_factory)
         print(f"Audio saved to {output_file}")
 
         # 上传到 OSS
         oss_url = upload_to_oss(output_file)
         print(f"Audio uploaded to OSS: {oss_url}")
 
-        # 保存音频信息
-        sentence_audio_info.append({
-            "sentence_id": i + 1,
-            "text": text,
-            "begin_time": sentence["begin_time"],
-            "end_time": sentence["end_time"],
-            "local_url": output_file,
-            "oss_url": oss_url
-        })
+        result["local_url"] = output_file
+        result["oss_url"] = oss_url
+        if manifest is not None:
+            manifest.append(result, synthesis_key)
+    except Exception as e:
+        print(f"[ERROR] Failed to clone sentence {index + 1}: {e}")
+        result["error"] = str(e)
 
-    return sentence_audio_info
+    return result
 
 
-def regenerate_sentence_audio(sentence, reference_audio_url, output_file):
+def process_sentences_with_voice_cloning(sentences, reference_audio_url, output_folder="voice_cloning_output",
+                                         max_workers=1, synthesizer_factory=None, voice_id=None,
+                                         reference_audio_path=None, progress_callback=None, resume=True):
+    """
+    批量变声处理分割的句子文本，结合参考音频生成变声音频。
+
+    :param sentences: 包含句子文本的列表，每个元素为 {"text": 句子文本, "begin_time": 开始时间戳, "end_time": 结束时间戳}
+    :param reference_audio_url: 参考音频的 URL
+    :param output_folder: 保存变声音频文件的本地目录
+    :param max_workers: 并发合成的线程数，1 表示逐句串行处理
+    :param synthesizer_factory: 创建语音合成器的可调用对象，签名同 SpeechSynthesizer(model=..., voice=..., format=...,
+                                callback=...)，便于替换为本地替身；为空时使用 SpeechSynthesizer
+    :param voice_id: 已注册的音色 ID，为空时从音色缓存获取或根据参考音频注册新音色
+    :param reference_audio_path: 参考音频的本地路径，用于计算音色缓存键
+    :param progress_callback: 每完成一个句子调用一次，参数为 sentence_id（可能在工作线程中调用）
+    :param resume: 是否根据输出目录中的检查点跳过已完成且校验通过的句子
+    :return: (sentence_audio_info, stats) 二元组；sentence_audio_info 按句子顺序排列，
+             失败的句子带有 error 字段；stats 包含成功/失败数量、缓存命中数、耗时、吞吐量（句/秒）
+             以及未命中缓存句子的首包时间（TTFB）统计
+    """
+    # 声音复刻服务
+    target_model = TARGET_MODEL
+
+    if voice_id is None:
+        voice_id = get_or_create_voice(reference_audio_url, target_model, reference_audio_path)
+
+    # 创建输出文件夹
+    os.makedirs(output_folder, exist_ok=True)
+
+    # 逐句检查点，进程中途退出后可从断点继续
+    manifest = CloneManifest(output_folder)
+    checkpoints = manifest.load() if resume else {}
+
+    start = time.perf_counter()
+    max_workers = max(1, int(max_workers))
+
+    def clone(item):
+        result = clone_single_sentence(item[0], item[1], voice_id, target_model, output_folder, synthesizer_factory,
+                                       manifest=manifest, checkpoint=checkpoints.get(item[0] + 1))
+        if progress_callback:
+            progress_callback(result["sentence_id"])
+        return result
+
+    if max_workers == 1:
+        sentence_audio_info = [clone(item) for item in enumerate(sentences)]
+    else:
+        # 线程池并发合成；executor.map 按提交顺序返回结果，保证句子顺序不变
+        with ContextThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="voice-clone") as executor:
+            sentence_audio_info = list(executor.map(clone, enumerate(sentences)))
+
+    elapsed = time.perf_counter() - start
+    failed = sum(1 for info in sentence_audio_info if "error" in info)
+    cache_hits = sum(1 for info in sentence_audio_info if info.get("cache_hit"))
+    resumed = sum(1 for info in sentence_audio_info if info.get("resumed"))
+    ttfbs = [info["ttfb_ms"] for info in sentence_audio_info if info.get("ttfb_ms") is not None]
+    stats = {
+        "voice_id": voice_id,
+        "total": len(sentence_audio_info),
+        "succeeded": len(sentence_audio_info) - failed,
+        "failed": failed,
+        "cache_hits": cache_hits,
+        "cache_misses": len(sentence_audio_info) - failed - cache_hits - resumed,
+        "resumed": resumed,
+        "max_workers": max_workers,
+        "elapsed_seconds": round(elapsed, 3),
+        "sentences_per_second": round(len(sentence_audio_info) / elapsed, 3) if elapsed > 0 else None,
+        "ttfb_ms_median": round(statistics.median(ttfbs), 1) if ttfbs else None,
+        "ttfb_ms_max": max(ttfbs) if ttfbs else None,
+        "scheduler": scheduler.snapshot("synthesis"),
+    }
+    print(f"[INFO] Voice cloning finished: {stats['succeeded']}/{stats['total']} sentences "
+          f"({cache_hits} cached, {resumed} resumed), {stats['sentences_per_second']} sentences/s with {max_workers} workers")
+
+    return sentence_audio_info, stats
+
+
+def regenerate_sentence_audio(sentence, reference_audio_url, output_file, reference_audio_path=None, voice_id=None):
     """
     重新生成单句变声音频。
     :param sentence: 包含句子文本和时间信息的字典，如 {"text": 句子文本, "sentence_id": 1}
     :param reference_audio_url: 参考音频的 OSS URL。
     :param output_file: 保存变声音频文件的本地路径。
+    :param reference_audio_path: 参考音频的本地路径，用于命中音色缓存。
+    :param voice_id: 已注册的音色 ID，为空时从音色缓存获取。
     :return: 包含音频的本地路径和 OSS URL。
     """
-    # 声音复刻服务
-    target_model = "cosyvoice-v1"
-    prefix = reference_audio_url.split("/")[-1].split(".")[0]
+    # 声音复刻服务（命中缓存时不再重新注册音色）
+    target_model = TARGET_MODEL
+    if voice_id is None:
+        voice_id = get_or_create_voice(reference_audio_url, target_model, reference_audio_path)
 
-    # 创建语音注册服务实例
-    service = VoiceEnrollmentService()
-    voice_id = service.create_voice(target_model=target_model, prefix=prefix, url=reference_audio_url)
-
-    # 创建语音合成器
-    synthesizer = SpeechSynthesizer(model=target_model, voice=voice_id)
-
-    # 生成音频
+    # 生成音频并保存到本地（文本未变化时直接使用合成缓存）
     text = sentence["text"]
     print(f"Regenerating audio for sentence {sentence['sentence_id']}: {text}")
-    audio = synthesizer.call(text)
-
-    # 保存音频到本地
-    with open(output_file, "wb") as f:
-        pickle.dump(audio, f)
+    _, ttfb_ms = _synthesize_to_file(text, voice_id, target_model, output_file, None)
     print(f"Audio regenerated and saved to {output_file}")
 
     # 上传到 OSS
     oss_url = upload_to_oss(output_file)
     print(f"Audio re-uploaded to OSS: {oss_url}")
 
-    return {
+    result = {
         "sentence_id": sentence["sentence_id"],
         "text": text,
+        "begin_time": sentence.get("begin_time"),
+        "end_time": sentence.get("end_time"),
         "local_url": output_file,
         "oss_url": oss_url,
+        "ttfb_ms": ttfb_ms,
     }
 
+    # 更新检查点，之后的批量续跑会复用重新生成的音频
+    CloneManifest(os.path.dirname(output_file)).append(result, synthesis_cache_key(voice_id, target_model, text))
+    return result
+
 
 
 def test_process_sentences_with_voice_cloning():
@@ -124,7 +525,9 @@ def test_process_sentences_with_voice_cloning():
     output_folder = "./output/cloned_sentences"
 
     # 调用变声处理函数
-    sentence_audio_info = process_sentences_with_voice_cloning(sentences, reference_audio_url, output_folder)
+    sentence_audio_info, stats = process_sentences_with_voice_cloning(sentences, reference_audio_url, output_folder,
+                                                                      max_workers=3)
+    print("Stats:", stats)
 
     # 输出处理结果
     for info in sentence_audio_info:
@@ -133,7 +536,9 @@ def test_process_sentences_with_voice_cloning():
         print("Begin Time:", info["begin_time"])
         print("End Time:", info["end_time"])
         print("Local URL:", info["local_url"])
-        print("OSS URL:", info["oss_url"])
+        print("OSS URL:", info.get("oss_url"))
+        if "error" in info:
+            print("Error:", info["error"])
         print("-" * 50)
 
 
@@ -0,0 +1,74 @@
+import importlib
+import threading
+import time
+
+from utils.oss_utils import get_bucket
+from utils.transcription import get_client, transcription_cache
+from utils.voice_util import load_tts, synthesis_cache, voice_cache
+
+
+# 预处理和切割用到的音频库，首次使用时才导入
+AUDIO_MODULES = (
+    # 降噪，导入时加载 scipy.signal
+    "noisereduce",
+    # 切割和格式转换（AudioSegment）
+    "pydub",
+    # librosa 的各级包都按需加载子模块，直接导入 load / resample 所在的模块（同时加载 numba、soxr）
+    "librosa.core.audio",
+)
+
+
+def load_audio_libraries():
+    """
+    导入预处理和切割用到的音频库。
+    """
+    for name in AUDIO_MODULES:
+        importlib.import_module(name)
+
+
+def load_caches():
+    """
+    读取音色缓存文件，扫描合成结果和识别结果的本地缓存目录建立 LRU 索引。
+    """
+    voice_cache.load()
+    synthesis_cache.load()
+    transcription_cache.load()
+
+
+# 预热项：各阶段首次使用时才加载的依赖、客户端和缓存索引
+WARM_UP_STEPS = {
+    "audio": load_audio_libraries,
+    "caches": load_caches,
+    "oss": get_bucket,
+    "synthesis": load_tts,
+    "transcription": get_client,
+}
+
+
+def warm_up(steps=None):
+    """
+    提前加载各阶段的依赖并创建客户端，避免首个请求承担导入开销。
+    :param steps: 预热项名称列表，默认全部
+    :return: {预热项: 耗时秒数}，失败的项为 None
+    """
+    timings = {}
+    for name in steps or WARM_UP_STEPS:
+        start = time.perf_counter()
+        try:
+            WARM_UP_STEPS[name]()
+        except Exception as e:
+            print(f"[WARNING] Warm-up step {name} failed: {e}")
+            timings[name] = None
+            continue
+        timings[name] = round(time.perf_counter() - start, 3)
+    print(f"[INFO] Warm-up finished: {timings}")
+    return timings
+
+
+def warm_up_in_background(steps=None):
+    """
+    在后台线程中预热，服务启动后立即可以接收请求。
+    """
+    thread = threading.Thread(target=warm_up, args=(steps,), name="warm-up", daemon=True)
+    thread.start()
+    return thread